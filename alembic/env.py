@@ -1,5 +1,6 @@
 from __future__ import with_statement
 import os
+import sys
 from alembic import context
 from sqlalchemy import engine_from_config, pool, create_engine
 from logging.config import fileConfig
@@ -12,6 +13,9 @@ config = context.config
 # This line sets up loggers basically.
 fileConfig(config.config_file_name)
 
+# lets migrations import migration_helpers from the root of the repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -65,7 +69,10 @@ def run_migrations_online():
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
-            target_metadata=target_metadata
+            target_metadata=target_metadata,
+            # each migration commits before the next one starts, so a migration can work on the tables the ones
+            # before it made from other connections, like the media partitioning backfill does
+            transaction_per_migration=True
         )
 
         with context.begin_transaction():
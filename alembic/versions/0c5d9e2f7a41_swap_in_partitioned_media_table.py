@@ -0,0 +1,173 @@
+"""copy media into the hash partitioned table and swap it in
+
+The second step of the online move of media to a hash partitioned table, it does nothing unless the previous migration
+created media_partitioned:
+    alembic upgrade head
+1. the existing rows are copied to media_partitioned in batches of ids, each batch committed on its own connection, so
+   the copy holds no long lived locks and the app keeps reading and writing media while it runs. Rows being copied
+   are locked FOR SHARE, so a concurrent update waits for its batch and the trigger then copies the new values over.
+   The copy can be stopped and started again, it picks up after the last batch it finished.
+2. media is locked for the swap, waiting at most lock_timeout for running queries, then renamed to
+   media_unpartitioned, media_partitioned is renamed to media, and the trigger is dropped. Only the renames happen
+   under the lock. If lock_timeout is hit the migration fails without changing anything, and can be run again.
+3. once the app runs fine on the partitioned media, drop the old table yourself:
+    DROP TABLE media_unpartitioned;
+
+The downgrade swaps the tables back the same way, while media_unpartitioned hasn't been dropped yet:
+1. a trigger on the partitioned media copies every write to media_unpartitioned, then the rows written since the
+   upgrade are copied back, and the rows deleted since are deleted, in batches of ids on their own connection
+2. both tables are locked for the swap, waiting at most lock_timeout, the reverse trigger is dropped, the tables and
+   their indexes get their old names back, and media_partitioned_sync is created again on media, leaving things as
+   6a1f3c8e5b27 made them
+Once media_unpartitioned has been dropped the downgrade does nothing, and media stays partitioned, which the app works
+with the same. Downgrading 6a1f3c8e5b27 after that has nothing left to drop either.
+
+Revision ID: 0c5d9e2f7a41
+Revises: 6a1f3c8e5b27
+Create Date: 2026-10-19 19:20:03.551862
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0c5d9e2f7a41'
+down_revision = '6a1f3c8e5b27'
+branch_labels = None
+depends_on = None
+
+copied_columns = 'id, medianame, "user", medium, consumed_state, description, "order"'
+updated_columns = ', '.join('{0} = excluded.{0}'.format(column) for column in copied_columns.split(', ')[1:])
+# (old name, name on the partitioned table) of the renamed indexes
+index_names = [
+    ('media_pkey', 'media_partitioned_pkey'),
+    ('ix_media_user_order', 'ix_media_partitioned_user_order'),
+    ('ix_media_search_vector', 'ix_media_partitioned_search_vector'),
+    ('ix_media_medianame_trigram', 'ix_media_partitioned_medianame_trigram'),
+    ('uq_media_user_medianame', 'uq_media_partitioned_user_medianame')
+]
+
+
+def upgrade():
+    # imported here since env.py puts the repo root on sys.path, and commands like alembic history don't run env.py
+    from migration_helpers import backfill, set_lock_timeout
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # the copy runs on its own connection, before the migration's transaction has done anything, so the transaction
+    # doesn't sit open through the whole copy
+    with bind.engine.connect() as connection:
+        if not has_table(connection, 'media_partitioned'):
+            return
+
+    backfill('0c5d9e2f7a41_media_partitioned',
+             """
+             INSERT INTO media_partitioned ({0})
+             SELECT {0} FROM media WHERE id >= :start AND id < :end AND "user" IS NOT NULL FOR SHARE
+             ON CONFLICT (id, "user") DO NOTHING
+             """.format(copied_columns))
+
+    set_lock_timeout()
+    op.execute('LOCK TABLE media IN ACCESS EXCLUSIVE MODE;')
+    op.execute('DROP TRIGGER media_partitioned_sync ON media;')
+    op.execute('DROP FUNCTION media_partitioned_sync();')
+
+    op.execute('ALTER TABLE media RENAME TO media_unpartitioned;')
+    for name, partitioned_name in index_names:
+        op.execute('ALTER INDEX IF EXISTS {0} RENAME TO {0}_unpartitioned;'.format(name))
+    op.execute('ALTER TABLE media_partitioned RENAME TO media;')
+    for name, partitioned_name in index_names:
+        op.execute('ALTER INDEX IF EXISTS {} RENAME TO {};'.format(partitioned_name, name))
+
+    op.execute('ALTER SEQUENCE media_id_seq OWNED BY media.id;')
+
+
+def downgrade():
+    from migration_helpers import backfill, run_with_lock_timeout, set_lock_timeout
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    with bind.engine.connect() as connection:
+        if not has_table(connection, 'media_unpartitioned'):
+            return
+
+    # from here on writes to media are copied to media_unpartitioned as well, the backfills below catch up on the
+    # writes made before
+    run_with_lock_timeout([
+        """
+        CREATE OR REPLACE FUNCTION media_unpartitioned_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM media_unpartitioned WHERE id = OLD.id;
+            ELSE
+                INSERT INTO media_unpartitioned ({0})
+                VALUES (NEW.id, NEW.medianame, NEW."user", NEW.medium, NEW.consumed_state, NEW.description, NEW."order")
+                ON CONFLICT (id) DO UPDATE SET {1};
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """.format(copied_columns, updated_columns),
+        'DROP TRIGGER IF EXISTS media_unpartitioned_sync ON media;',
+        'CREATE TRIGGER media_unpartitioned_sync AFTER INSERT OR UPDATE OR DELETE ON media '
+        'FOR EACH ROW EXECUTE PROCEDURE media_unpartitioned_sync();'
+    ])
+
+    # media without a user was never copied to the partitioned table, and is left as it is
+    backfill('0c5d9e2f7a41_downgrade_deleted_media',
+             """
+             DELETE FROM media_unpartitioned WHERE id >= :start AND id < :end AND "user" IS NOT NULL
+             AND NOT EXISTS (SELECT 1 FROM media WHERE media.id = media_unpartitioned.id)
+             """,
+             table='media_unpartitioned')
+    backfill('0c5d9e2f7a41_downgrade_media_unpartitioned',
+             """
+             INSERT INTO media_unpartitioned ({0})
+             SELECT {0} FROM media WHERE id >= :start AND id < :end FOR SHARE
+             ON CONFLICT (id) DO UPDATE SET {1}
+             """.format(copied_columns, updated_columns))
+
+    set_lock_timeout()
+    op.execute('LOCK TABLE media, media_unpartitioned IN ACCESS EXCLUSIVE MODE;')
+    op.execute('DROP TRIGGER media_unpartitioned_sync ON media;')
+    op.execute('DROP FUNCTION media_unpartitioned_sync();')
+
+    op.execute('ALTER TABLE media RENAME TO media_partitioned;')
+    for name, partitioned_name in index_names:
+        op.execute('ALTER INDEX IF EXISTS {} RENAME TO {};'.format(name, partitioned_name))
+    op.execute('ALTER TABLE media_unpartitioned RENAME TO media;')
+    for name, partitioned_name in index_names:
+        op.execute('ALTER INDEX IF EXISTS {0}_unpartitioned RENAME TO {0};'.format(name))
+
+    op.execute('ALTER SEQUENCE media_id_seq OWNED BY media.id;')
+
+    # the same trigger 6a1f3c8e5b27 creates, so the partitioned table keeps up with media until it's swapped in again
+    op.execute(
+        """
+        CREATE FUNCTION media_partitioned_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD."user" IS DISTINCT FROM NEW."user") THEN
+                DELETE FROM media_partitioned WHERE id = OLD.id AND "user" = OLD."user";
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW."user" IS NOT NULL THEN
+                INSERT INTO media_partitioned ({0})
+                VALUES (NEW.id, NEW.medianame, NEW."user", NEW.medium, NEW.consumed_state, NEW.description, NEW."order")
+                ON CONFLICT (id, "user") DO UPDATE SET {1};
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """.format(copied_columns, updated_columns)
+    )
+    op.execute('CREATE TRIGGER media_partitioned_sync AFTER INSERT OR UPDATE OR DELETE ON media '
+               'FOR EACH ROW EXECUTE PROCEDURE media_partitioned_sync();')
+
+    # so upgrading again copies media from the start, and downgrading again catches up from the start
+    op.execute("DELETE FROM migration_progress WHERE name LIKE '0c5d9e2f7a41\\_%';")
+
+
+def has_table(connection, name):
+    return connection.execute("SELECT to_regclass('{}') IS NOT NULL".format(name)).scalar()
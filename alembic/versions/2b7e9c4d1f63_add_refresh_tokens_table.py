@@ -0,0 +1,36 @@
+"""add refresh_tokens table
+
+Revision ID: 2b7e9c4d1f63
+Revises: 9d3e6f1a2b58
+Create Date: 2026-10-19 18:02:37.514920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7e9c4d1f63'
+down_revision = '9d3e6f1a2b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'refresh_tokens',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('user', sa.Integer, sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('family', sa.String(32), nullable=False),
+        sa.Column('token_hash', sa.String(64), unique=True, nullable=False),
+        sa.Column('created_on', sa.DateTime, nullable=False),
+        sa.Column('expires_on', sa.DateTime, nullable=False),
+        sa.Column('used_on', sa.DateTime),
+        sa.Column('revoked', sa.Boolean, nullable=False, server_default=sa.false())
+    )
+    op.create_index('ix_refresh_tokens_family', 'refresh_tokens', ['family'])
+    op.create_index('ix_refresh_tokens_expires_on', 'refresh_tokens', ['expires_on'])
+
+
+def downgrade():
+    op.drop_table('refresh_tokens')
@@ -0,0 +1,34 @@
+"""add search_vector column to media
+
+Revision ID: 5f2d8c1b9e47
+Revises: a3c51e0f7d92
+Create Date: 2026-10-19 14:02:37.906115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2d8c1b9e47'
+down_revision = 'a3c51e0f7d92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # generated columns need PostgreSQL 12 or later
+    op.execute(
+        """
+        ALTER TABLE media ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(medianame, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        ) STORED;
+        """
+    )
+    op.execute('CREATE INDEX ix_media_search_vector ON media USING gin (search_vector);')
+
+
+def downgrade():
+    op.drop_index('ix_media_search_vector', 'media')
+    op.drop_column('media', 'search_vector')
@@ -0,0 +1,101 @@
+"""add a hash partitioned copy of media, kept in sync with media by a trigger
+
+This is the first step of the online move of media to a table hash partitioned on "user", and only runs when opted in
+with the number of partitions, on PostgreSQL 12 or later:
+    alembic -x media_partitions=16 upgrade 6a1f3c8e5b27
+It creates media_partitioned, with the same columns and indexes as media, and a trigger on media that copies every
+insert, update, and delete to it, so from here on new writes land in both tables. The app keeps using media, and
+nothing is locked for longer than creating the empty table takes.
+The next migration, 0c5d9e2f7a41, copies the existing rows over and swaps the tables.
+
+A partitioned table's primary key and unique indexes have to include the partition key, so the primary key becomes
+(id, "user"), and ids still come from media_id_seq. Media without a user can't be partitioned and isn't copied.
+Pick the number of partitions up front, it can't be changed without another copy, e.g. enough to keep each partition
+to tens of millions of rows.
+
+Revision ID: 6a1f3c8e5b27
+Revises: 2b7e9c4d1f63
+Create Date: 2026-10-19 19:12:44.318207
+
+"""
+from alembic import op, context
+
+
+# revision identifiers, used by Alembic.
+revision = '6a1f3c8e5b27'
+down_revision = '2b7e9c4d1f63'
+branch_labels = None
+depends_on = None
+
+copied_columns = ['id', 'medianame', '"user"', 'medium', 'consumed_state', 'description', '"order"']
+
+
+def upgrade():
+    partitions = context.get_x_argument(as_dictionary=True).get('media_partitions')
+    if partitions is None or op.get_bind().dialect.name != 'postgresql':
+        return
+    partitions = int(partitions)
+
+    op.execute(
+        """
+        CREATE TABLE media_partitioned (
+            id integer NOT NULL DEFAULT nextval('media_id_seq'),
+            medianame varchar(80),
+            "user" integer NOT NULL REFERENCES users (id),
+            medium medium_type,
+            consumed_state consumed_state_type,
+            description varchar(500),
+            "order" integer,
+            search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(medianame, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+            ) STORED,
+            CONSTRAINT media_partitioned_pkey PRIMARY KEY (id, "user")
+        ) PARTITION BY HASH ("user");
+        """
+    )
+    for remainder in range(partitions):
+        op.execute('CREATE TABLE media_p{0} PARTITION OF media_partitioned '
+                   'FOR VALUES WITH (MODULUS {1}, REMAINDER {0});'.format(remainder, partitions))
+
+    # indexes on a partitioned table are created on every partition, each partition's index only covers its own users
+    op.execute('CREATE INDEX ix_media_partitioned_user_order ON media_partitioned ("user", "order");')
+    op.execute('CREATE INDEX ix_media_partitioned_search_vector ON media_partitioned USING gin (search_vector);')
+    op.execute('CREATE INDEX ix_media_partitioned_medianame_trigram ON media_partitioned '
+               'USING gin (medianame gin_trgm_ops);')
+    if has_index('uq_media_user_medianame'):
+        op.execute('CREATE UNIQUE INDEX uq_media_partitioned_user_medianame ON media_partitioned ("user", medianame);')
+
+    op.execute(
+        """
+        CREATE FUNCTION media_partitioned_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD."user" IS DISTINCT FROM NEW."user") THEN
+                DELETE FROM media_partitioned WHERE id = OLD.id AND "user" = OLD."user";
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW."user" IS NOT NULL THEN
+                INSERT INTO media_partitioned ({columns})
+                VALUES (NEW.id, NEW.medianame, NEW."user", NEW.medium, NEW.consumed_state, NEW.description, NEW."order")
+                ON CONFLICT (id, "user") DO UPDATE SET {updates};
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """.format(columns=', '.join(copied_columns),
+                   updates=', '.join('{0} = excluded.{0}'.format(column) for column in copied_columns[1:]))
+    )
+    op.execute('CREATE TRIGGER media_partitioned_sync AFTER INSERT OR UPDATE OR DELETE ON media '
+               'FOR EACH ROW EXECUTE PROCEDURE media_partitioned_sync();')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS media_partitioned_sync ON media;')
+    op.execute('DROP FUNCTION IF EXISTS media_partitioned_sync();')
+    op.execute('DROP TABLE IF EXISTS media_partitioned;')
+
+
+def has_index(name):
+    return op.get_bind().execute("SELECT to_regclass('{}') IS NOT NULL".format(name)).scalar()
@@ -0,0 +1,35 @@
+"""add idempotency_keys table
+
+Revision ID: 7f4b2d9e6c13
+Revises: 0c5d9e2f7a41
+Create Date: 2026-10-19 21:04:52.117930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f4b2d9e6c13'
+down_revision = '0c5d9e2f7a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('user', sa.Integer, sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('key', sa.String(255), nullable=False),
+        sa.Column('request_hash', sa.String(64), nullable=False),
+        sa.Column('status_code', sa.Integer),
+        sa.Column('response', sa.Text),
+        sa.Column('created_on', sa.DateTime, nullable=False),
+        sa.UniqueConstraint('user', 'key', name='uq_idempotency_keys_user_key')
+    )
+    op.create_index('ix_idempotency_keys_created_on', 'idempotency_keys', ['created_on'])
+
+
+def downgrade():
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,43 @@
+"""add jobs table
+
+Revision ID: 9d3e6f1a2b58
+Revises: e4b7a92c06f1
+Create Date: 2026-10-19 16:41:05.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3e6f1a2b58'
+down_revision = 'e4b7a92c06f1'
+branch_labels = None
+depends_on = None
+
+job_status_type = sa.Enum('queued', 'running', 'finished', 'failed', name='job_status_type', validate_strings=True)
+
+
+def upgrade():
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('user', sa.Integer, sa.ForeignKey('users.id')),
+        sa.Column('kind', sa.String(50), nullable=False),
+        sa.Column('payload', sa.Text, nullable=False),
+        sa.Column('status', job_status_type, nullable=False),
+        sa.Column('result', sa.Text),
+        sa.Column('error', sa.String(500)),
+        sa.Column('created_on', sa.DateTime, nullable=False),
+        sa.Column('started_on', sa.DateTime),
+        sa.Column('finished_on', sa.DateTime)
+    )
+    op.create_index('ix_jobs_status_id', 'jobs', ['status', 'id'])
+    # blacklist purge jobs delete by blacklisted_on
+    op.create_index('ix_blacklisted_tokens_blacklisted_on', 'blacklisted_tokens', ['blacklisted_on'])
+
+
+def downgrade():
+    op.drop_index('ix_blacklisted_tokens_blacklisted_on', 'blacklisted_tokens')
+    op.drop_table('jobs')
+    job_status_type.drop(op.get_bind())
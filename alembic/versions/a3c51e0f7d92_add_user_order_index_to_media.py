@@ -0,0 +1,24 @@
+"""add user/order index to media
+
+Revision ID: a3c51e0f7d92
+Revises: bdc68ba685c5
+Create Date: 2026-10-19 13:41:02.518364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c51e0f7d92'
+down_revision = 'bdc68ba685c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_media_user_order', 'media', ['user', 'order'])
+
+
+def downgrade():
+    op.drop_index('ix_media_user_order', 'media')
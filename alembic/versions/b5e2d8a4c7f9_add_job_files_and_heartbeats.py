@@ -0,0 +1,37 @@
+"""add job_files table, job heartbeats and checkpoints
+
+Revision ID: b5e2d8a4c7f9
+Revises: 7f4b2d9e6c13
+Create Date: 2026-10-19 23:12:37.480215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2d8a4c7f9'
+down_revision = '7f4b2d9e6c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job_files',
+        sa.Column('job', sa.Integer, sa.ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('position', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('data', sa.LargeBinary, nullable=False)
+    )
+    op.add_column('jobs', sa.Column('heartbeat_on', sa.DateTime))
+    op.add_column('jobs', sa.Column('attempts', sa.Integer, nullable=False, server_default='0'))
+    op.add_column('jobs', sa.Column('checkpoint', sa.Text))
+    # jobs that were running when the columns were added are timed from when they started
+    op.execute("UPDATE jobs SET heartbeat_on = started_on, attempts = 1 WHERE status = 'running'")
+
+
+def downgrade():
+    op.drop_column('jobs', 'checkpoint')
+    op.drop_column('jobs', 'attempts')
+    op.drop_column('jobs', 'heartbeat_on')
+    op.drop_table('job_files')
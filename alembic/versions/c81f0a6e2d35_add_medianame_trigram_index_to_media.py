@@ -0,0 +1,25 @@
+"""add medianame trigram index to media
+
+Revision ID: c81f0a6e2d35
+Revises: 5f2d8c1b9e47
+Create Date: 2026-10-19 14:31:54.220871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81f0a6e2d35'
+down_revision = '5f2d8c1b9e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    op.execute('CREATE INDEX ix_media_medianame_trigram ON media USING gin (medianame gin_trgm_ops);')
+
+
+def downgrade():
+    op.drop_index('ix_media_medianame_trigram', 'media')
@@ -0,0 +1,31 @@
+"""add optional user/medianame natural key to media
+
+The unique index is only created when opted in with
+    alembic -x media_natural_key=true upgrade head
+which is needed before enabling MEDIA_UPSERT_NATURAL_KEY. Users can't have two media elements with the same name once
+it exists, so any existing duplicates have to be renamed or removed first, this lists them:
+    SELECT "user", medianame, count(*) FROM media GROUP BY "user", medianame HAVING count(*) > 1;
+
+Revision ID: e4b7a92c06f1
+Revises: c81f0a6e2d35
+Create Date: 2026-10-19 15:48:12.730452
+
+"""
+from alembic import op, context
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7a92c06f1'
+down_revision = 'c81f0a6e2d35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if context.get_x_argument(as_dictionary=True).get('media_natural_key') == 'true':
+        op.create_index('uq_media_user_medianame', 'media', ['user', 'medianame'], unique=True)
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS uq_media_user_medianame;')
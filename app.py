@@ -1,21 +1,36 @@
 import os
+import datetime
+import tempfile
 from flask import Flask
 from flask_cors import CORS
-from database import db
+from database import db, route_reads, issue_consistency_token
 import configparser
 
 from routes import add_routes
+from request_limits import check_content_length
+from compression import compress_response
+# registers the slow query log's engine events
+import slow_query_log  # noqa: F401
+from auth_keys import read_keys_dir
+from profiler import install_profile_signal, start_request_profile, finish_request_profile
 
 
 def create_app(test=False):
     app = Flask(__name__)
     CORS(app)
 
-    # TODO user urandom to generate this
-    app.secret_key = 'super secret key'
-
     config = configparser.ConfigParser()
     config.read('config.ini')
+
+    # signs HS256 auth tokens when no AUTH_KEY_ID is set, every worker has to share it, so it can't be random
+    if os.environ.get('SECRET_KEY') is not None:
+        app.secret_key = os.environ.get('SECRET_KEY')
+    elif config.has_option('auth', 'secret_key'):
+        app.secret_key = config['auth']['secret_key']
+    elif test:
+        app.secret_key = 'test secret key'
+    else:
+        raise ValueError('SECRET_KEY must be set, in the environment or as secret_key in config.ini, outside of tests')
     if test:
         if os.environ.get('TEST_DATABASE_URL') is None:
             database_uri = config['database']['sqlalchemy.test.url']
@@ -28,12 +43,85 @@ def create_app(test=False):
             database_uri = os.environ.get('DATABASE_URL')
 
     app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    # read replicas of the database, the reads of read_only logic functions are spread over them
+    replica_uris = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+    app.config['SQLALCHEMY_BINDS'] = {'replica_{}'.format(n): uri for n, uri in enumerate(replica_uris)}
+    app.config['SQLALCHEMY_REPLICA_BIND_KEYS'] = sorted(app.config['SQLALCHEMY_BINDS'])
+    # seconds after a user's write that their reads go to the primary, longer than the replicas usually lag
+    app.config['CONSISTENCY_WINDOW'] = 5
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['TESTING'] = test
     app.config['LOGIN_DISABLED'] = test
     app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    # PEM keys (kid -> key) that sign and verify auth tokens, read from the *.pem files in AUTH_KEYS_DIR, and the kid of
+    # the private key that signs new tokens. Without AUTH_KEY_ID tokens are signed with HS256 and the secret key.
+    app.config['AUTH_KEYS'] = read_keys_dir(os.environ['AUTH_KEYS_DIR']) if 'AUTH_KEYS_DIR' in os.environ else {}
+    app.config['AUTH_KEY_ID'] = os.environ.get('AUTH_KEY_ID')
+    # while moving from HS256 to AUTH_KEY_ID, HS256 tokens are still accepted until this UTC time, after which (or when
+    # it isn't set) only tokens signed by the keyring's keys are
+    app.config['AUTH_HS256_ACCEPTED_UNTIL'] = \
+        datetime.datetime.strptime(os.environ['AUTH_HS256_ACCEPTED_UNTIL'], '%Y-%m-%dT%H:%M:%S') \
+        if 'AUTH_HS256_ACCEPTED_UNTIL' in os.environ else None
+    # how long an access token can be used, and how long the refresh token that gets the next one can be used
+    app.config['AUTH_TOKEN_LIFETIME'] = datetime.timedelta(minutes=5)
+    app.config['REFRESH_TOKEN_LIFETIME'] = datetime.timedelta(days=30)
+    # keep an in-process index of media names for typeahead suggestions, reloaded after MEDIA_NAME_INDEX_MAX_AGE seconds
+    app.config['MEDIA_NAME_INDEX'] = False
+    app.config['MEDIA_NAME_INDEX_MAX_AGE'] = 60
+    # have the database build the JSON for media list responses with json_agg
+    app.config['MEDIA_JSON_AGG'] = False
+    # upsert PUT bodies without an id on the user's medianame, needs the optional media natural key migration
+    app.config['MEDIA_UPSERT_NATURAL_KEY'] = False
+    # seconds the worker waits before polling again when the job queue is empty
+    app.config['JOB_POLL_INTERVAL'] = 1
+    # seconds between the heartbeats of a running job, a running job whose last heartbeat is older than JOB_TIMEOUT is
+    # requeued, up to JOB_MAX_ATTEMPTS runs, since the worker running it stopped
+    app.config['JOB_HEARTBEAT_INTERVAL'] = 30
+    app.config['JOB_TIMEOUT'] = datetime.timedelta(minutes=5)
+    app.config['JOB_MAX_ATTEMPTS'] = 3
+    # seconds between the blacklist and expired refresh token purge jobs the worker queues
+    app.config['BLACKLIST_PURGE_INTERVAL'] = 60 * 60
+    # largest request body in bytes, checked before the body is read
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+    # largest request body in bytes for the endpoints that parse their body as it is read, imports and streamed PUTs
+    app.config['MEDIA_STREAM_MAX_CONTENT_LENGTH'] = 512 * 1024 * 1024
+    # compress responses of at least COMPRESS_MIN_SIZE bytes with gzip (or brotli when installed) at COMPRESS_LEVEL,
+    # keeping the compressed bytes of the last COMPRESS_CACHE_SIZE bodies so unchanged responses aren't compressed again
+    app.config['COMPRESS'] = True
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    app.config['COMPRESS_LEVEL'] = 6
+    app.config['COMPRESS_CACHE_SIZE'] = 128
+    # run the hot user, blacklist and media queries as server side prepared statements on PostgreSQL, leave this off
+    # behind PgBouncer in transaction or statement pooling mode, which doesn't keep a client on one server connection
+    app.config['PREPARED_STATEMENTS'] = os.environ.get('PREPARED_STATEMENTS') == 'true'
+    # log statements taking at least SLOW_QUERY_THRESHOLD seconds to SLOW_QUERY_LOG, None turns the log off, and
+    # capture the EXPLAIN (ANALYZE, BUFFERS) plan of a SLOW_QUERY_EXPLAIN_RATE fraction of the slow SELECTs
+    app.config['SLOW_QUERY_THRESHOLD'] = float(os.environ['SLOW_QUERY_THRESHOLD']) \
+        if 'SLOW_QUERY_THRESHOLD' in os.environ else None
+    app.config['SLOW_QUERY_EXPLAIN_RATE'] = float(os.environ.get('SLOW_QUERY_EXPLAIN_RATE', 0))
+    app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG', 'slow_queries.log')
+    app.config['SLOW_QUERY_LOG_MAX_BYTES'] = 10 * 1024 * 1024
+    app.config['SLOW_QUERY_LOG_BACKUP_COUNT'] = 5
+    # the X-Admin-Token of admin endpoints like /admin/profile, which are turned off while it isn't set
+    app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+    # where profiles are written, and how long each worker samples itself for when sent SIGPROF
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', tempfile.gettempdir())
+    app.config['PROFILE_SECONDS'] = 10
+    # let requests with the admin token and an 'X-Profile: cprofile' header be profiled with cProfile
+    app.config['PROFILE_REQUESTS'] = os.environ.get('PROFILE_REQUESTS') == 'true'
+    # how long the responses of writes sent with an Idempotency-Key are replayed to retries, and how long a request can
+    # run before its retries are told it didn't finish (because its worker stopped), rather than that it's in progress
+    app.config['IDEMPOTENCY_KEY_TTL'] = datetime.timedelta(hours=24)
+    app.config['IDEMPOTENCY_KEY_TIMEOUT'] = datetime.timedelta(minutes=1)
 
     add_routes(app)
+    app.before_request(check_content_length)
+    app.before_request(route_reads)
+    app.before_request(start_request_profile)
+    app.after_request(issue_consistency_token)
+    app.after_request(compress_response)
+    app.after_request(finish_request_profile)
+    install_profile_signal(app)
 
     db.init_app(app)
     db.create_all(app=app)
@@ -41,7 +129,5 @@ def create_app(test=False):
     return app
 
 
-app = create_app()
-
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
@@ -0,0 +1,153 @@
+import base64
+import datetime
+import glob
+import os
+import threading
+
+import jwt
+from flask import current_app
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa, ec
+from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+
+
+class Keyring:
+    """
+    Keyring signs and verifies auth tokens. Tokens are signed with the private key named by active_kid, RS256 for an
+    RSA key or ES256 for an EC P-256 key, and carry that key's id in their 'kid' header, so keys can be rotated by
+    adding a new key, making it active, and removing the old key once the tokens it signed have expired. Other
+    services can verify tokens with the public keys from jwks, without calling this app.
+    Tokens without a 'kid' are HS256 tokens signed with the app's secret key, which is how tokens are signed when
+    there is no active key. Once there is an active key they are rejected, unless hs256_accepted_until is still in the
+    future, so tokens signed before the move to the keyring can be used until they expire.
+    PEM keys are parsed once, when the keyring is made, since parsing a key costs more than verifying a signature.
+    """
+    def __init__(self, keys, active_kid, secret_key, hs256_accepted_until=None):
+        """
+        @param keys: a dict mapping key ids to PEM encoded keys, private keys can sign and verify tokens, public keys
+            (like a retired key's) can only verify them
+        @param active_kid: the id of the private key to sign new tokens with, or None to sign them with HS256
+        @param hs256_accepted_until: a naive UTC datetime until which HS256 tokens are still accepted while there is an
+            active key, or None to reject them
+        """
+        self.secret_key = secret_key
+        self.hs256_accepted_until = hs256_accepted_until
+        self.active_kid = active_kid
+        # kid -> (algorithm, private key or None, public key)
+        self.keys = {}
+        for kid, pem in keys.items():
+            self.keys[kid] = parse_pem_key(pem)
+
+        if active_kid is not None and (active_kid not in self.keys or self.keys[active_kid][1] is None):
+            raise ValueError('active auth key {} is not a private key in the keyring'.format(active_kid))
+
+    def sign(self, payload):
+        """
+        sign returns an auth token for the given payload
+        """
+        if self.active_kid is None:
+            return jwt.encode(payload, self.secret_key, algorithm='HS256').decode('utf-8')
+
+        algorithm, private_key, public_key = self.keys[self.active_kid]
+        return jwt.encode(payload, private_key, algorithm=algorithm, headers={'kid': self.active_kid}).decode('utf-8')
+
+    def verify(self, auth_token):
+        """
+        verify returns the payload of a valid auth token
+        @raise jwt.InvalidTokenError: if the token's signature, key id or expiry is invalid
+        """
+        kid = jwt.get_unverified_header(auth_token).get('kid')
+        if kid is None:
+            if self.active_kid is not None and (self.hs256_accepted_until is None or
+                                                datetime.datetime.utcnow() >= self.hs256_accepted_until):
+                raise jwt.InvalidTokenError('tokens signed with the secret key are no longer accepted')
+            return jwt.decode(auth_token, self.secret_key, algorithms=['HS256'])
+
+        if kid not in self.keys:
+            raise jwt.InvalidTokenError('unknown key id')
+
+        # only the algorithm of the token's key is allowed, so a token can't pick a weaker one
+        algorithm, private_key, public_key = self.keys[kid]
+        return jwt.decode(auth_token, public_key, algorithms=[algorithm])
+
+    def jwks(self):
+        """
+        jwks returns the public keys of the keyring as a JSON Web Key Set dict
+        """
+        jwk_keys = []
+        for kid, (algorithm, private_key, public_key) in sorted(self.keys.items()):
+            numbers = public_key.public_numbers()
+            if algorithm == 'RS256':
+                jwk = {'kty': 'RSA', 'n': base64url_uint(numbers.n), 'e': base64url_uint(numbers.e)}
+            else:
+                jwk = {'kty': 'EC', 'crv': 'P-256',
+                       'x': base64url_uint(numbers.x, 32), 'y': base64url_uint(numbers.y, 32)}
+            jwk.update({'kid': kid, 'alg': algorithm, 'use': 'sig'})
+            jwk_keys.append(jwk)
+
+        return {'keys': jwk_keys}
+
+
+def base64url_uint(value, length=None):
+    """
+    base64url_uint encodes a positive integer as unpadded base64url big endian bytes, like JSON Web Keys use
+    @param length: the number of bytes to pad the integer to, or None for as few as it needs
+    """
+    if length is None:
+        length = max(1, (value.bit_length() + 7) // 8)
+
+    return base64.urlsafe_b64encode(value.to_bytes(length, 'big')).rstrip(b'=').decode('ascii')
+
+
+def parse_pem_key(pem):
+    """
+    parse_pem_key parses a PEM encoded RSA or EC P-256 key, private or public
+    @return: a (algorithm, private key or None, public key) tuple
+    @raise ValueError: if the key isn't an RSA or EC P-256 key
+    """
+    pem = pem.encode('utf-8') if isinstance(pem, str) else pem
+    if b'PRIVATE KEY' in pem:
+        private_key = load_pem_private_key(pem, password=None, backend=default_backend())
+        public_key = private_key.public_key()
+    else:
+        private_key = None
+        public_key = load_pem_public_key(pem, backend=default_backend())
+
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return 'RS256', private_key, public_key
+    if isinstance(public_key, ec.EllipticCurvePublicKey) and public_key.curve.name == 'secp256r1':
+        return 'ES256', private_key, public_key
+
+    raise ValueError('auth keys must be RSA or EC P-256 keys')
+
+
+def read_keys_dir(path):
+    """
+    read_keys_dir reads the PEM files in a directory into a dict for AUTH_KEYS, each key's id is its file name without
+    the .pem extension
+    """
+    keys = {}
+    for key_path in glob.glob(os.path.join(path, '*.pem')):
+        with open(key_path) as key_file:
+            keys[os.path.splitext(os.path.basename(key_path))[0]] = key_file.read()
+
+    return keys
+
+
+keyring_lock = threading.Lock()
+
+
+def get_keyring():
+    """
+    get_keyring returns the current app's Keyring, made from AUTH_KEYS, AUTH_KEY_ID, SECRET_KEY, and
+    AUTH_HS256_ACCEPTED_UNTIL the first time it is needed in each worker process
+    """
+    if 'keyring' not in current_app.extensions:
+        with keyring_lock:
+            if 'keyring' not in current_app.extensions:
+                current_app.extensions['keyring'] = Keyring(current_app.config['AUTH_KEYS'],
+                                                            current_app.config['AUTH_KEY_ID'],
+                                                            current_app.config['SECRET_KEY'],
+                                                            current_app.config['AUTH_HS256_ACCEPTED_UNTIL'])
+
+    return current_app.extensions['keyring']
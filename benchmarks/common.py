@@ -0,0 +1,84 @@
+"""
+helpers shared by the benchmark scripts in this directory.
+The benchmarks run against the test database (TEST_DATABASE_URL or sqlalchemy.test.url in config.ini), and drop
+every table when they finish, so never point them at a database with data you want to keep.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from database import db  # noqa: E402
+
+from models.media import Media  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+@contextmanager
+def benchmark_app():
+    """
+    benchmark_app creates a test app with empty tables, and drops the tables when the benchmark is done
+    """
+    app = create_app(test=True)
+    with app.app_context():
+        db.create_all()
+        try:
+            yield app
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+def add_benchmark_user(username='benchuser'):
+    """
+    add_benchmark_user creates a user to own the benchmark media, and returns it
+    """
+    user = User(username, 'P@ssw0rd')
+    db.session.add(user)
+    db.session.commit()
+
+    return user
+
+
+def seed_media(userid, count, batch_size=10000, **columns):
+    """
+    seed_media inserts count media elements for the given user using multi-row inserts. The media names are
+    'media <n>' and the order column counts up from 0, any other column values can be passed as keyword arguments
+    """
+    for start in range(0, count, batch_size):
+        db.session.execute(Media.__table__.insert(), [
+            dict({
+                'medianame': 'media {}'.format(n),
+                'user': userid,
+                'medium': 'other',
+                'consumed_state': 'not started',
+                'description': '',
+                'order': n
+            }, **columns)
+            for n in range(start, min(start + batch_size, count))
+        ])
+    db.session.commit()
+
+
+def timed(label, function, repeat=1, clock=time.perf_counter):
+    """
+    timed runs function repeat times, prints the average time of a run, and returns it in seconds. The time is wall
+    clock time unless another clock, like time.process_time for CPU time, is given
+    """
+    start = clock()
+    for _ in range(repeat):
+        function()
+    elapsed = (clock() - start) / repeat
+
+    print('{:<50} {:>10.3f} ms'.format(label, elapsed * 1000))
+    return elapsed
+
+
+def benchmark_size(default):
+    """
+    benchmark_size returns the number of rows to benchmark with, taken from the first command line argument
+    """
+    return int(sys.argv[1]) if len(sys.argv) > 1 else default
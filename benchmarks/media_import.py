@@ -0,0 +1,55 @@
+"""
+measures the throughput and peak memory of importing a large ndjson file and exporting it again as csv
+usage: python benchmarks/media_import.py [number of rows, default 1000000]
+"""
+import json
+import resource
+import tempfile
+import time
+
+from common import benchmark_app, add_benchmark_user, benchmark_size
+
+from database import db
+
+
+def main():
+    size = benchmark_size(1000000)
+
+    with benchmark_app() as app, tempfile.TemporaryFile() as upload:
+        user = add_benchmark_user()
+        username = user.username
+        client = app.test_client()
+
+        for n in range(size):
+            upload.write(json.dumps({
+                'name': 'media {}'.format(n),
+                'medium': 'film',
+                'consumed_state': 'finished',
+                'description': 'imported from another tracker',
+                'order': n
+            }).encode('utf-8') + b'\n')
+        size_on_disk = upload.tell()
+        upload.seek(0)
+
+        print('{} rows ({:.1f} MB) on {}'.format(size, size_on_disk / 1024 / 1024, db.engine.dialect.name))
+
+        start = time.perf_counter()
+        response = client.post('/user/{}/media/import'.format(username), data=upload,
+                               content_type='application/x-ndjson')
+        elapsed = time.perf_counter() - start
+        print('{:<50} {:>10.0f} rows/s ({})'.format('import', size / elapsed, response.status))
+
+        start = time.perf_counter()
+        exported = 0
+        response = client.get('/user/{}/media/export?format=csv'.format(username), buffered=False)
+        for chunk in response.response:
+            exported += len(chunk)
+        elapsed = time.perf_counter() - start
+        print('{:<50} {:>10.0f} rows/s ({:.1f} MB)'.format('export', size / elapsed, exported / 1024 / 1024))
+
+        print('{:<50} {:>10.1f} MB'.format('peak resident memory of the process',
+                                           resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+if __name__ == '__main__':
+    main()
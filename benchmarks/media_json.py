@@ -0,0 +1,48 @@
+"""
+compares full media list GETs serialized in python (ORM + jsonify, and MediaRecords + jsonify) against the database
+building the JSON with MEDIA_JSON_AGG
+usage: python benchmarks/media_json.py [number of media elements, default 50000]
+"""
+from flask import jsonify
+
+from common import benchmark_app, add_benchmark_user, seed_media, timed, benchmark_size
+
+from database import db
+
+from logic.media import get_media
+
+
+def main():
+    size = benchmark_size(50000)
+
+    with benchmark_app() as app:
+        user = add_benchmark_user()
+        username = user.username
+        seed_media(user.id, size, description='x' * 200)
+        client = app.test_client()
+
+        def orm_jsonify():
+            with app.test_request_context():
+                jsonify({
+                    'success': True,
+                    'message': 'successfully got media for the logged in user',
+                    'data': [media.as_dict() for media in get_media(username)]
+                }).get_data()
+                db.session.expunge_all()
+
+        def media_records_get():
+            app.config['MEDIA_JSON_AGG'] = False
+            client.get('/user/{}/media'.format(username)).get_data()
+
+        def json_agg_get():
+            app.config['MEDIA_JSON_AGG'] = True
+            client.get('/user/{}/media'.format(username)).get_data()
+
+        print('full list GET of {} media elements on {}'.format(size, db.engine.dialect.name))
+        timed('ORM + jsonify', orm_jsonify, repeat=5)
+        timed('GET with MediaRecords + jsonify', media_records_get, repeat=5)
+        timed('GET with MEDIA_JSON_AGG', json_agg_get, repeat=5)
+
+
+if __name__ == '__main__':
+    main()
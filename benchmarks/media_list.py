@@ -0,0 +1,36 @@
+"""
+compares the CPU time of reading a user's media list for a response through the ORM (get_media and as_dict) against
+the Core select in get_media_dicts
+usage: python benchmarks/media_list.py [number of media elements, default 10000]
+"""
+import time
+
+from common import benchmark_app, add_benchmark_user, seed_media, timed, benchmark_size
+
+from database import db
+
+from logic.media import get_media, get_media_dicts
+
+
+def main():
+    size = benchmark_size(10000)
+
+    with benchmark_app():
+        user = add_benchmark_user()
+        username = user.username
+        seed_media(user.id, size, description='x' * 200)
+
+        def orm_path():
+            [media.as_dict() for media in get_media(username)]
+            db.session.expunge_all()
+
+        def core_path():
+            get_media_dicts(username)
+
+        print('CPU time to read {} media elements on {}'.format(size, db.engine.dialect.name))
+        timed('get_media + as_dict', orm_path, repeat=10, clock=time.process_time)
+        timed('get_media_dicts', core_path, repeat=10, clock=time.process_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+compares the memory used by cached media elements stored as as_dict dicts against MediaRecords
+usage: python benchmarks/media_record_memory.py [number of media elements, default 100000]
+"""
+import tracemalloc
+
+from common import benchmark_app, add_benchmark_user, seed_media, benchmark_size
+
+from logic.media import get_media_records
+
+
+def measure(build):
+    """
+    measure returns the bytes still allocated by the object build returns, and the object
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    cached = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return after - before, cached
+
+
+def main():
+    size = benchmark_size(100000)
+
+    with benchmark_app():
+        user = add_benchmark_user()
+        seed_media(user.id, size, description='x' * 100)
+
+        # both caches hold the same name and description strings, so only the per element overhead is measured
+        records = get_media_records(user.username)
+
+        dict_bytes, dicts = measure(lambda: [record.as_dict() for record in records])
+        record_bytes, copied_records = measure(lambda: [record._replace() for record in records])
+
+        print('memory per {} cached media elements'.format(size))
+        print('{:<50} {:>10.1f} MB'.format('as_dict dicts', dict_bytes / 1024 / 1024))
+        print('{:<50} {:>10.1f} MB'.format('MediaRecords', record_bytes / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+compares the media table against the same media hash partitioned on user, like the media partitioning migrations make
+it: the size of the indexes, and the time to list one user's media with get_media_records and get_media_stats. Needs
+PostgreSQL 12 or later.
+usage: python benchmarks/partitioning.py [number of media elements, default 2000000]
+"""
+import random
+
+from common import benchmark_app, add_benchmark_user, seed_media, timed, benchmark_size
+
+from database import db
+
+from logic.media import get_media_records, get_media_stats
+
+user_count = 1000
+partitions = 16
+sampled_users = 100
+
+
+def index_sizes(table):
+    """
+    index_sizes returns the total size of a table's indexes, and the size of the largest partition's indexes (or the
+    table's if it isn't partitioned), in bytes
+    """
+    return db.session.execute(
+        'SELECT sum(pg_indexes_size(relid)), max(pg_indexes_size(relid)) FROM pg_partition_tree(:table)',
+        {'table': table}).first()
+
+
+def partition_media():
+    """
+    partition_media copies media into a table hash partitioned on user, with the same indexes, and swaps it in
+    """
+    db.session.execute('CREATE TABLE media_partitioned (LIKE media INCLUDING DEFAULTS INCLUDING GENERATED) '
+                       'PARTITION BY HASH ("user")')
+    db.session.execute('ALTER TABLE media_partitioned ADD PRIMARY KEY (id, "user")')
+    for remainder in range(partitions):
+        db.session.execute('CREATE TABLE media_p{0} PARTITION OF media_partitioned '
+                           'FOR VALUES WITH (MODULUS {1}, REMAINDER {0})'.format(remainder, partitions))
+    db.session.execute('INSERT INTO media_partitioned SELECT id, medianame, "user", medium, consumed_state, '
+                       'description, "order" FROM media')
+    db.session.execute('CREATE INDEX ON media_partitioned ("user", "order")')
+    db.session.execute('CREATE INDEX ON media_partitioned USING gin (search_vector)')
+    db.session.execute('CREATE INDEX ON media_partitioned USING gin (medianame gin_trgm_ops)')
+    db.session.execute('ALTER TABLE media RENAME TO media_unpartitioned')
+    db.session.execute('ALTER TABLE media_partitioned RENAME TO media')
+    db.session.execute('ANALYZE media')
+    db.session.commit()
+
+
+def main():
+    size = benchmark_size(2000000)
+    rng = random.Random(0)
+
+    with benchmark_app():
+        if db.engine.dialect.name != 'postgresql':
+            print('the partitioning benchmark needs PostgreSQL')
+            return
+
+        users = [add_benchmark_user('benchuser{}'.format(n)) for n in range(user_count)]
+        for user in users:
+            seed_media(user.id, size // user_count)
+        db.session.execute('ANALYZE media')
+        db.session.commit()
+
+        sample = [(user.id, user.username) for user in rng.sample(users, sampled_users)]
+
+        def list_media():
+            for userid, username in sample:
+                get_media_records(username)
+
+        def media_stats():
+            for userid, username in sample:
+                get_media_stats(userid)
+
+        print('{} media elements of {} users, {} partitions, times are for {} users'.format(
+            size, user_count, partitions, sampled_users))
+        total, largest = index_sizes('media')
+        print('{:<50} {:>10.1f} MB'.format('unpartitioned index size', total / 2 ** 20))
+        timed('unpartitioned get_media_records', list_media)
+        timed('unpartitioned get_media_stats', media_stats)
+
+        partition_media()
+        try:
+            total, largest = index_sizes('media')
+            print('{:<50} {:>10.1f} MB'.format('partitioned index size', total / 2 ** 20))
+            print('{:<50} {:>10.1f} MB'.format('largest partition index size', largest / 2 ** 20))
+            timed('partitioned get_media_records', list_media)
+            timed('partitioned get_media_stats', media_stats)
+
+            # the plan should scan a single partition, the rest are pruned when the user's id is known
+            username = sample[0][1]
+            plan = db.session.execute(
+                'EXPLAIN ANALYZE SELECT * FROM media WHERE "user" = '
+                '(SELECT id FROM users WHERE username = :username) ORDER BY "order", id', {'username': username})
+            print('\n'.join(row[0] for row in plan))
+        finally:
+            db.session.rollback()
+            db.session.execute('DROP TABLE media_unpartitioned')
+            db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+compares the hot user, blacklist and media queries run as usual against running them as prepared statements
+(PREPARED_STATEMENTS), and shows the server's planning time of each query both ways. Needs PostgreSQL.
+usage: python benchmarks/prepared_statements.py [number of calls of each query, default 10000]
+"""
+import re
+
+from common import benchmark_app, add_benchmark_user, seed_media, timed, benchmark_size
+
+from database import db
+
+from models.blacklisted_token import BlacklistedToken, blacklisted_token_exists
+from logic.user import get_user, get_user_by_id, user_by_username
+from logic.media import get_media_by_id, get_media_records, get_media_stats, media_by_id, media_records_by_username
+
+
+def planning_time(sql, params):
+    """
+    planning_time returns the planning time in ms the server reports for a statement in EXPLAIN ANALYZE
+    """
+    plan = '\n'.join(row[0] for row in db.session.execute('EXPLAIN ANALYZE ' + sql, params))
+    return float(re.search(r'Planning Time: ([\d.]+) ms', plan).group(1))
+
+
+def main():
+    size = benchmark_size(10000)
+
+    with benchmark_app() as app:
+        if db.engine.dialect.name != 'postgresql':
+            print('the prepared statements benchmark needs PostgreSQL')
+            return
+
+        user = add_benchmark_user()
+        userid, username = user.id, user.username
+        seed_media(userid, 100)
+        media_id = get_media_records(username)[0].id
+        db.session.add(BlacklistedToken('benchmark token'))
+        db.session.commit()
+
+        queries = [
+            ('get_user', lambda: get_user(username)),
+            ('get_user_by_id', lambda: get_user_by_id(userid)),
+            ('check_blacklist', lambda: BlacklistedToken.check_blacklist('benchmark token')),
+            ('get_media_by_id', lambda: get_media_by_id(media_id, userid)),
+            ('get_media_records (100 media)', lambda: get_media_records(username)),
+            ('get_media_stats (100 media)', lambda: get_media_stats(userid))
+        ]
+
+        print('{} calls of each query'.format(size))
+        for prepared in [False, True]:
+            app.config['PREPARED_STATEMENTS'] = prepared
+            for label, query in queries:
+                def run():
+                    for _ in range(size):
+                        # a fresh session each time, so instances aren't found in the identity map
+                        db.session.remove()
+                        query()
+                timed('{} {}'.format('prepared' if prepared else 'unprepared', label), run)
+
+        # EXPLAIN ANALYZE EXECUTE reports the planning time of the cached plan the prepared statement runs with
+        db.session.remove()
+        statements = [
+            (user_by_username, 'SELECT id, username, passhash FROM users WHERE username = :username',
+             {'username': username}),
+            (blacklisted_token_exists, 'SELECT 1 FROM blacklisted_tokens WHERE token = :token',
+             {'token': 'benchmark token'}),
+            (media_by_id, 'SELECT * FROM media WHERE id = :id AND "user" = :userid',
+             {'id': media_id, 'userid': userid}),
+            (media_records_by_username, 'SELECT * FROM media WHERE "user" = (SELECT id FROM users WHERE username = '
+                                        ':username) ORDER BY "order", id', {'username': username})
+        ]
+        connection = db.session.connection()
+        for statement, sql, params in statements:
+            statement.prepare(connection)
+            for _ in range(10):
+                # the server switches to a generic plan, which isn't planned again, after 5 executions
+                connection.execute(statement.execute_text, **params)
+            print('{:<50} {:>7.3f} ms planning, prepared {:.3f} ms'.format(
+                statement.name, planning_time(sql, params),
+                planning_time(statement.execute_text.text, params)))
+
+
+if __name__ == '__main__':
+    main()
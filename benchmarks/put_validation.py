@@ -0,0 +1,57 @@
+"""
+times validating an array PUT body of media elements, both all valid and with an error in every element, against
+running the previous chain of checks twice per element as the array PUT used to
+usage: python benchmarks/put_validation.py [number of media elements, default 10000]
+"""
+from common import benchmark_app, timed, benchmark_size
+
+from models.media import mediums, consumed_states
+
+from views.media import put_body_list_errors
+
+
+def chained_validation(body):
+    # the checks validate_put_body_parameters made before put_body_errors, stopping at the first error
+    if 'id' not in body and 'name' not in body:
+        return 'missing parameter'
+    if 'id' in body and not isinstance(body['id'], int):
+        return 'id'
+    if 'name' in body and not isinstance(body['name'], str):
+        return 'name'
+    if 'medium' in body and body['medium'] not in mediums:
+        return 'medium'
+    if 'consumed_state' in body and body['consumed_state'] not in consumed_states:
+        return 'consumed_state'
+    if 'description' in body and not isinstance(body['description'], str):
+        return 'description'
+    if 'order' in body and not isinstance(body['order'], int):
+        return 'order'
+
+
+def main():
+    size = benchmark_size(10000)
+
+    valid_body = [{
+        'name': 'medianame{}'.format(n),
+        'medium': 'film',
+        'consumed_state': 'finished',
+        'description': 'description',
+        'order': n
+    } for n in range(size)]
+    invalid_body = [dict(element, order=str(n)) for n, element in enumerate(valid_body)]
+
+    with benchmark_app():
+        def chained_twice():
+            for element in valid_body:
+                chained_validation(element)
+            for element in valid_body:
+                chained_validation(element)
+
+        print('validating an array PUT of {} media elements'.format(size))
+        timed('chained checks, twice per element (valid)', chained_twice, repeat=10)
+        timed('put_body_list_errors (valid)', lambda: put_body_list_errors(valid_body), repeat=10)
+        timed('put_body_list_errors (every element invalid)', lambda: put_body_list_errors(invalid_body), repeat=10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+compares moving a media element by PUTing a new order for every affected element (one SELECT, UPDATE and commit
+each) against the single statement move_media and reorder_media operations
+usage: python benchmarks/reorder.py [number of media elements, default 10000]
+"""
+from common import benchmark_app, add_benchmark_user, seed_media, timed, benchmark_size
+
+from database import db
+
+from models.media import Media
+
+from logic.media import update_media, move_media, reorder_media
+
+
+def main():
+    size = benchmark_size(10000)
+
+    with benchmark_app():
+        user = add_benchmark_user()
+        seed_media(user.id, size)
+        ids = [id for id, in db.session.query(Media.id).filter(Media.user == user.id).order_by(Media.order)]
+
+        def move_with_per_item_updates():
+            # what the client does today: move the last element to the front by renumbering every element
+            new_ids = ids[-1:] + ids[:-1]
+            for position, id in enumerate(new_ids):
+                update_media(id, order=position)
+
+        def move_single_statement():
+            move_media(user.id, ids[-1], 0)
+            move_media(user.id, ids[-1], size - 1)
+
+        def reorder_single_statement():
+            reorder_media(user.id, ids[-1:] + ids[:-1])
+
+        print('reordering within a list of {} media elements'.format(size))
+        timed('per element updates (move last to front)', move_with_per_item_updates)
+        timed('move_media (move last to front and back)', move_single_statement, repeat=10)
+        timed('reorder_media (full list of ids)', reorder_single_statement, repeat=10)
+
+
+if __name__ == '__main__':
+    main()
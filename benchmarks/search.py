@@ -0,0 +1,61 @@
+"""
+compares searching a user's media with the q parameter of get_media against loading the whole list and filtering it
+the way clients do today. Run against PostgreSQL to measure the search_vector GIN index.
+usage: python benchmarks/search.py [number of media elements, default 1000000]
+"""
+import random
+
+from common import benchmark_app, add_benchmark_user, timed, benchmark_size
+
+from database import db
+
+from models.media import Media
+
+from logic.media import get_media
+
+words = ['star', 'night', 'river', 'ghost', 'summer', 'empire', 'garden', 'silent', 'machine', 'winter', 'ocean',
+         'shadow', 'golden', 'city', 'dream', 'house', 'iron', 'storm', 'paper', 'mountain']
+
+
+def main():
+    size = benchmark_size(1000000)
+    rng = random.Random(0)
+
+    with benchmark_app():
+        user = add_benchmark_user()
+        username = user.username
+        for start in range(0, size, 10000):
+            db.session.execute(Media.__table__.insert(), [{
+                'medianame': '{} {} {}'.format(rng.choice(words), rng.choice(words), n),
+                'user': user.id,
+                'medium': 'other',
+                'consumed_state': 'not started',
+                'description': ' '.join(rng.choice(words) for _ in range(20)),
+                'order': n
+            } for n in range(start, min(start + 10000, size))])
+        db.session.commit()
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute('ANALYZE media')
+            db.session.commit()
+
+        def client_side_filter():
+            db.session.expunge_all()
+            [media for media in get_media(username)
+             if 'ghost' in media.medianame and 'storm' in media.medianame]
+
+        def server_side_search():
+            db.session.expunge_all()
+            get_media(username, q='ghost storm')
+
+        def server_side_prefix_search():
+            db.session.expunge_all()
+            get_media(username, q='gho sto')
+
+        print('searching {} media elements on {}'.format(size, db.engine.dialect.name))
+        timed('load everything and filter in python', client_side_filter)
+        timed('get_media q="ghost storm"', server_side_search, repeat=5)
+        timed('get_media q="gho sto" (prefix)', server_side_prefix_search, repeat=5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+measures the cost of one typeahead keystroke with suggest_media_names, using the database query and using the
+in-process media name index. Run against PostgreSQL to measure the trigram index.
+usage: python benchmarks/suggestions.py [number of media elements, default 50000]
+"""
+import random
+
+from flask import current_app
+
+from common import benchmark_app, add_benchmark_user, timed, benchmark_size
+
+from database import db
+
+from models.media import Media
+
+from logic.media import suggest_media_names
+
+words = ['star', 'night', 'river', 'ghost', 'summer', 'empire', 'garden', 'silent', 'machine', 'winter', 'ocean',
+         'shadow', 'golden', 'city', 'dream', 'house', 'iron', 'storm', 'paper', 'mountain']
+
+
+def main():
+    size = benchmark_size(50000)
+    rng = random.Random(0)
+
+    with benchmark_app():
+        user = add_benchmark_user()
+        userid = user.id
+        db.session.execute(Media.__table__.insert(), [{
+            'medianame': '{} {} {}'.format(rng.choice(words), rng.choice(words), n),
+            'user': userid,
+            'medium': 'other',
+            'consumed_state': 'not started',
+            'description': '',
+            'order': n
+        } for n in range(size)])
+        db.session.commit()
+
+        keystrokes = ['g', 'gh', 'gho', 'ghos', 'ghost', 'ghost ', 'ghost s', 'ghost st']
+
+        def type_query():
+            for keystroke in keystrokes:
+                suggest_media_names(userid, keystroke)
+
+        print('suggestions from {} media elements on {}, {} keystrokes per run'.format(
+            size, db.engine.dialect.name, len(keystrokes)))
+        timed('database query', type_query, repeat=5)
+
+        current_app.config['MEDIA_NAME_INDEX'] = True
+        timed('media name index (first lookup loads the index)', lambda: suggest_media_names(userid, 'g'))
+        timed('media name index', type_query, repeat=100)
+
+
+if __name__ == '__main__':
+    main()
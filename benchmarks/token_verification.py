@@ -0,0 +1,56 @@
+"""
+compares the cost of signing and verifying an auth token with each supported algorithm, and of verifying with a key
+parsed once (what Keyring does) against parsing the PEM public key for every verification
+usage: python benchmarks/token_verification.py [number of tokens, default 1000]
+"""
+import jwt
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ec
+
+from common import benchmark_app, timed, benchmark_size
+
+from auth_keys import Keyring, parse_pem_key
+
+
+def private_pem(private_key):
+    return private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                     serialization.NoEncryption()).decode('utf-8')
+
+
+def main():
+    size = benchmark_size(1000)
+
+    keys = {
+        'rsa': private_pem(rsa.generate_private_key(65537, 2048, default_backend())),
+        'ec': private_pem(ec.generate_private_key(ec.SECP256R1(), default_backend()))
+    }
+    keyrings = [
+        ('HS256', Keyring({}, None, 'benchmark secret key')),
+        ('RS256 (2048 bit)', Keyring(keys, 'rsa', 'benchmark secret key')),
+        ('ES256 (P-256)', Keyring(keys, 'ec', 'benchmark secret key'))
+    ]
+    payload = {'sub': 1}
+
+    with benchmark_app():
+        print('signing and verifying {} auth tokens'.format(size))
+        for label, keyring in keyrings:
+            auth_token = keyring.sign(payload)
+            timed('{} sign'.format(label), lambda: [keyring.sign(payload) for _ in range(size)])
+            timed('{} verify'.format(label), lambda: [keyring.verify(auth_token) for _ in range(size)])
+
+        keyring = keyrings[1][1]
+        auth_token = keyring.sign(payload)
+        public_pem = keyring.keys['rsa'][2].public_bytes(serialization.Encoding.PEM,
+                                                         serialization.PublicFormat.SubjectPublicKeyInfo)
+
+        def verify_parsing_pem():
+            for _ in range(size):
+                algorithm, private_key, public_key = parse_pem_key(public_pem)
+                jwt.decode(auth_token, public_key, algorithms=[algorithm])
+
+        timed('RS256 verify, parsing the PEM public key each time', verify_parsing_pem)
+
+
+if __name__ == '__main__':
+    main()
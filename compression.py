@@ -0,0 +1,114 @@
+import collections
+import hashlib
+import threading
+import zlib
+
+from flask import request, current_app
+
+try:
+    import brotli
+except ImportError:
+    # brotli is optional, responses are only gzipped without it
+    brotli = None
+
+# the mimetypes worth compressing, everything else (like images) is sent as is
+compressible_mimetypes = {'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain'}
+
+
+class CompressedBodyCache:
+    """
+    CompressedBodyCache keeps the compressed bytes of the most recently sent response bodies, keyed by a hash of the
+    uncompressed body, so a client polling an unchanged media list gets the same compressed bytes without compressing
+    them again. Hashing a body is much cheaper than compressing it.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        # (encoding, level, body digest) -> compressed body, least recently used first
+        self.entries = collections.OrderedDict()
+
+    def get(self, key):
+        """
+        get returns the compressed body stored under key, or None if it isn't cached
+        """
+        with self.lock:
+            compressed = self.entries.get(key)
+            if compressed is not None:
+                self.entries.move_to_end(key)
+            return compressed
+
+    def put(self, key, compressed):
+        """
+        put stores a compressed body, forgetting the least recently used one if the cache is full
+        """
+        with self.lock:
+            self.entries[key] = compressed
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+def compress(data, encoding, level):
+    """
+    compress returns data compressed with the given encoding, 'gzip' or 'br', at the given gzip compression level.
+    gzip output leaves out the modification time, so the same data always compresses to the same bytes.
+    """
+    if encoding == 'br':
+        # brotli's quality goes to 11 rather than 9
+        return brotli.compress(data, quality=min(11, round(level * 11 / 9)))
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def get_compressed_body_cache():
+    """
+    get_compressed_body_cache returns the current app's CompressedBodyCache, or None if COMPRESS_CACHE_SIZE is 0
+    """
+    if not current_app.config.get('COMPRESS_CACHE_SIZE'):
+        return None
+
+    if 'compressed_body_cache' not in current_app.extensions:
+        current_app.extensions['compressed_body_cache'] = CompressedBodyCache(current_app.config['COMPRESS_CACHE_SIZE'])
+
+    return current_app.extensions['compressed_body_cache']
+
+
+def compress_response(response):
+    """
+    compress_response runs after every request, and compresses the response body with the best encoding the client
+    accepts, brotli if it is installed or gzip. Streamed responses, like exports, and bodies smaller than
+    COMPRESS_MIN_SIZE bytes are sent as is.
+    """
+    if not current_app.config['COMPRESS'] or response.mimetype not in compressible_mimetypes:
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers or \
+            not 200 <= response.status_code < 300:
+        return response
+
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    level = current_app.config['COMPRESS_LEVEL']
+    cache = get_compressed_body_cache()
+    if cache is None:
+        compressed = compress(data, encoding, level)
+    else:
+        key = (encoding, level, hashlib.sha1(data).digest())
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = compress(data, encoding, level)
+            cache.put(key, compressed)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    return response
@@ -1,3 +1,142 @@
-from flask_sqlalchemy import SQLAlchemy
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
 
-db = SQLAlchemy()
+from flask import g, request, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm, event
+
+# username -> time.time() of the user's last write handled by this process, oldest first, only kept for
+# CONSISTENCY_WINDOW seconds
+last_writes = OrderedDict()
+last_writes_lock = threading.Lock()
+
+
+class RoutingSession(SignallingSession):
+    """
+    RoutingSession sends the queries of logic functions marked read_only to a replica database, when replicas are
+    configured with DATABASE_REPLICA_URLS (which become the SQLALCHEMY_REPLICA_BIND_KEYS binds), and everything else
+    to the primary. Reads still go to the primary when the session has written anything, or has changes waiting to be
+    flushed, or the user being read has written within the last CONSISTENCY_WINDOW seconds, so users always read their
+    own writes.
+    """
+    def __init__(self, db, **options):
+        SignallingSession.__init__(self, db, **options)
+        self.db = db
+        # how many read_only logic functions are running
+        self.read_only_depth = 0
+
+    def get_bind(self, mapper=None, clause=None):
+        replica_bind_keys = self.app.config['SQLALCHEMY_REPLICA_BIND_KEYS']
+        if not replica_bind_keys or not self.read_only_depth or self._flushing or self.info.get('wrote') or \
+                self.new or self.dirty or self.deleted or (has_request_context() and g.get('read_from_primary')):
+            return SignallingSession.get_bind(self, mapper, clause)
+
+        return self.db.get_engine(self.app, bind=random.choice(replica_bind_keys))
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        session_factory = orm.sessionmaker(class_=RoutingSession, db=self, **options)
+        # remembers that a session has written, so its later reads, and the response, know about it
+        event.listen(session_factory, 'after_flush', lambda session, flush_context: session.info.update(wrote=True))
+
+        return session_factory
+
+
+db = RoutingSQLAlchemy()
+
+
+def read_only(f):
+    """
+    read_only marks a logic function that only reads from the database, so its queries can be sent to a replica
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        session = db.session()
+        session.read_only_depth += 1
+        try:
+            return f(*args, **kwargs)
+        finally:
+            session.read_only_depth -= 1
+
+    return decorated_function
+
+
+def consistency_key():
+    """
+    consistency_key returns the username of the user a request reads and writes, from its url
+    """
+    return (request.view_args or {}).get('username')
+
+
+def route_reads():
+    """
+    route_reads runs before every request, and sends the request's reads to the primary when the client's
+    X-Consistency-Token, or the last write by the url's user seen by this process, is within CONSISTENCY_WINDOW seconds
+    """
+    window = db.get_app().config['CONSISTENCY_WINDOW']
+    try:
+        last_write = float(request.headers.get('X-Consistency-Token', 0))
+    except ValueError:
+        last_write = 0
+    last_write = max(last_write, last_writes.get(consistency_key(), 0))
+
+    g.read_from_primary = time.time() - last_write < window
+
+
+def issue_consistency_token(response):
+    """
+    issue_consistency_token runs after every request that wrote to the database, and returns the time of the write as
+    an X-Consistency-Token header, which clients send back so their next reads see the write, even on other servers
+    """
+    if 'wrote' in db.session().info:
+        now = time.time()
+        response.headers['X-Consistency-Token'] = repr(now)
+        if consistency_key() is not None:
+            record_write(consistency_key(), now, db.get_app().config['CONSISTENCY_WINDOW'])
+
+    return response
+
+
+def record_write(key, now, window):
+    """
+    record_write remembers the time of a user's write in last_writes, and forgets the writes older than window
+    seconds, which no longer send reads to the primary, so last_writes only holds the users who wrote recently
+    """
+    with last_writes_lock:
+        last_writes.pop(key, None)
+        last_writes[key] = now
+        while last_writes and next(iter(last_writes.values())) <= now - window:
+            last_writes.popitem(last=False)
+
+
+@contextmanager
+def no_expire_on_commit():
+    """
+    no_expire_on_commit is a context manager that stops commits from expiring the session's instances while it is
+    open. Instances written inside it keep the values they were written with, so serializing them after the commit
+    doesn't SELECT every row again, and instances loaded inside it can be found again with query.get without a query.
+    Only use it where nothing else writes the same rows during the request.
+    """
+    session = db.session()
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        yield session
+    finally:
+        session.expire_on_commit = expire_on_commit
+
+
+def commit_or_flush(commit=True):
+    """
+    commit_or_flush commits the session, or only flushes it when commit is False, for logic functions that can run as
+    one step of a larger transaction, which the caller commits or rolls back as a whole
+    """
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
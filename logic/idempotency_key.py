@@ -0,0 +1,71 @@
+import datetime
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from database import db, no_expire_on_commit
+
+from models.idempotency_key import IdempotencyKey
+
+
+def claim_idempotency_key(userid, key, request_hash):
+    """
+    claim_idempotency_key stores an Idempotency-Key of the user with the given userid before the request it came with
+    runs, so a retry of the request can find it. A key that is already stored is only claimed again once it is older
+    than IDEMPOTENCY_KEY_TTL, so of several retries racing with the same key only one runs the request. A key whose
+    request never finished isn't claimed again before then either, since its write may have been committed before the
+    response could be stored, and running it again could write twice.
+    @param request_hash: a hash of the request, so a key reused for a different request can be told apart
+    @return: an (IdempotencyKey, claimed) tuple, where claimed is True if this request should run, and False if the
+        stored key belongs to an earlier request with the same key
+    """
+    # commits don't expire the stored key, so reading it after the commit doesn't SELECT it again
+    with no_expire_on_commit():
+        stored = IdempotencyKey(userid, key, request_hash)
+        db.session.add(stored)
+        try:
+            db.session.commit()
+            return stored, True
+        except IntegrityError:
+            db.session.rollback()
+
+        stored = IdempotencyKey.query.filter_by(user=userid, key=key).first()
+        if stored is None:
+            # the key was purged since the INSERT
+            return claim_idempotency_key(userid, key, request_hash)
+
+        now = datetime.datetime.now()
+        if stored.created_on < now - current_app.config['IDEMPOTENCY_KEY_TTL']:
+            # taken over with a conditional UPDATE, so only one of several racing retries gets it
+            claimed = IdempotencyKey.query.filter_by(id=stored.id, created_on=stored.created_on).update({
+                'request_hash': request_hash,
+                'status_code': None,
+                'response': None,
+                'created_on': now
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                stored.request_hash, stored.status_code, stored.response, stored.created_on = \
+                    request_hash, None, None, now
+                return stored, True
+
+        return stored, False
+
+
+def finish_idempotency_key(stored, status_code, response):
+    """
+    finish_idempotency_key stores the response of the request an Idempotency-Key was claimed for, to be replayed to
+    retries
+    @param response: the response body as a string
+    """
+    IdempotencyKey.query.filter_by(id=stored.id).update({'status_code': status_code, 'response': response},
+                                                        synchronize_session=False)
+    db.session.commit()
+
+
+def release_idempotency_key(stored):
+    """
+    release_idempotency_key deletes a claimed Idempotency-Key whose request failed, so a retry runs the request again
+    """
+    IdempotencyKey.query.filter_by(id=stored.id).delete(synchronize_session=False)
+    db.session.commit()
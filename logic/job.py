@@ -0,0 +1,223 @@
+import datetime
+import json
+import threading
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import db, read_only
+
+from models.job import Job, JobFile
+
+# bytes of a queued job's file stored in each job_files row, and read into memory at a time
+job_file_chunk_size = 1024 * 1024
+
+
+def enqueue_job(userid, kind, payload, stream=None):
+    """
+    enqueue_job adds a job to the queue for the worker to run
+    @param userid: the id of the user the job is for, or None for maintenance jobs
+    @param kind: a string naming the job handler that runs this job
+    @param payload: a JSON serializable value passed to the job handler
+    @param stream: an optional binary stream, like a request's body, that is copied into the job's file
+        job_file_chunk_size bytes at a time, in the same transaction as the job. The payload, which has to be a dict,
+        then gets a 'file' key with the job's id, for the handler to read the file with iter_job_file_lines.
+    @return: the newly queued job
+    """
+    job = Job(kind, userid, payload)
+    db.session.add(job)
+
+    if stream is not None:
+        db.session.flush()
+        position = 0
+        chunk = stream.read(job_file_chunk_size)
+        while chunk:
+            db.session.execute(JobFile.__table__.insert(), {'job': job.id, 'position': position, 'data': chunk})
+            position += 1
+            chunk = stream.read(job_file_chunk_size)
+        job.payload = json.dumps(dict(payload, file=job.id))
+
+    db.session.commit()
+
+    return job
+
+
+def iter_job_file_lines(job_id, max_length=None):
+    """
+    iter_job_file_lines reads the file of the job with the given id one chunk at a time, and yields its lines as bytes
+    with their line endings, like iterating over a file opened in binary mode does
+    @param max_length: if given, lines longer than max_length bytes are yielded in pieces of max_length bytes, like
+        readline(max_length) reads them, so a file without line breaks isn't held in memory as one line
+    """
+    def pieces(line):
+        if max_length is None or len(line) <= max_length:
+            yield line
+            return
+        for start in range(0, len(line), max_length):
+            yield line[start:start + max_length]
+
+    pending = b''
+    position = 0
+
+    while True:
+        chunk = db.session.query(JobFile.data).filter_by(job=job_id, position=position).scalar()
+        if chunk is None:
+            break
+
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield from pieces(line + b'\n')
+        if max_length is not None and len(pending) >= max_length:
+            # the line goes on in the next chunk, only the part that can't be a full piece yet is kept
+            kept = len(pending) % max_length
+            yield from pieces(pending[:len(pending) - kept])
+            pending = pending[len(pending) - kept:]
+        position += 1
+
+    if pending:
+        yield pending
+
+
+def get_job_checkpoint(job_id):
+    """
+    get_job_checkpoint returns the checkpoint an earlier run of the job with the given id saved, or None
+    """
+    checkpoint = db.session.query(Job.checkpoint).filter_by(id=job_id).scalar()
+
+    return json.loads(checkpoint) if checkpoint is not None else None
+
+
+def set_job_checkpoint(job_id, checkpoint):
+    """
+    set_job_checkpoint saves how far the job with the given id got, without committing, so it is committed in the
+    same transaction as the writes it records
+    @param checkpoint: a JSON serializable value
+    """
+    Job.query.filter_by(id=job_id).update({'checkpoint': json.dumps(checkpoint)}, synchronize_session=False)
+
+
+@read_only
+def get_job(id):
+    """
+    get_job returns the job with the given id, or None if there is no job with the given id
+    """
+    return Job.query.filter_by(id=id).first()
+
+
+def has_queued_job(kind):
+    """
+    has_queued_job returns True if a job of the given kind is waiting to run
+    """
+    return Job.query.filter_by(kind=kind, status='queued').first() is not None
+
+
+def claim_next_job():
+    """
+    claim_next_job marks the oldest queued job as running and returns it, or returns None if the queue is empty.
+    On PostgreSQL the job row is locked with FOR UPDATE SKIP LOCKED, so several workers can claim jobs at the same
+    time without getting the same job.
+    """
+    job = Job.query.filter_by(status='queued').order_by(Job.id).with_for_update(skip_locked=True).first()
+    if job is None:
+        db.session.commit()
+        return None
+
+    job.status = 'running'
+    job.started_on = datetime.datetime.now()
+    job.heartbeat_on = job.started_on
+    job.attempts += 1
+    db.session.commit()
+
+    return job
+
+
+def start_heartbeat(job, interval):
+    """
+    start_heartbeat starts a thread that sets the job's heartbeat_on every interval seconds, on its own connection, so
+    requeue_stale_jobs knows the worker running the job is still alive
+    @return: an Event to set once the job is done, which stops the thread
+    """
+    engine = db.engine
+    job_id = job.id
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(interval):
+            try:
+                with engine.begin() as connection:
+                    connection.execute(Job.__table__.update().where(Job.__table__.c.id == job_id),
+                                       heartbeat_on=datetime.datetime.now())
+            except SQLAlchemyError:
+                # tried again on the next beat, the job is only requeued after missing JOB_TIMEOUT worth of them
+                pass
+
+    threading.Thread(target=beat, daemon=True).start()
+
+    return stopped
+
+
+def run_job(job, job_handlers, heartbeat_interval=None):
+    """
+    run_job runs a claimed job with the handler for its kind, and records the handler's result, or its error if it
+    raised one. The job's file, if it has one, is deleted once it is done.
+    @param job_handlers: a dict mapping job kinds to functions that take the job's userid and payload, and return a
+        JSON serializable result
+    @param heartbeat_interval: if given, the job's heartbeat_on is set every heartbeat_interval seconds while it runs
+    """
+    stop_heartbeat = start_heartbeat(job, heartbeat_interval) if heartbeat_interval else None
+    try:
+        result = job_handlers[job.kind](job.user, json.loads(job.payload))
+    except Exception as e:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = '{}: {}'.format(type(e).__name__, e)[:500]
+    else:
+        job.status = 'finished'
+        job.result = json.dumps(result)
+    finally:
+        if stop_heartbeat is not None:
+            stop_heartbeat.set()
+
+    job.finished_on = datetime.datetime.now()
+    JobFile.query.filter_by(job=job.id).delete(synchronize_session=False)
+    db.session.commit()
+
+    return job
+
+
+def run_next_job(job_handlers, heartbeat_interval=None):
+    """
+    run_next_job claims and runs the oldest queued job
+    @return: the job that was run, or None if the queue was empty
+    """
+    job = claim_next_job()
+    if job is not None:
+        run_job(job, job_handlers, heartbeat_interval)
+
+    return job
+
+
+def requeue_stale_jobs(timeout, max_attempts):
+    """
+    requeue_stale_jobs puts the running jobs whose heartbeat_on is older than timeout, whose worker stopped while
+    running them, back in the queue, keeping their checkpoints. Jobs that were already tried max_attempts times are
+    marked failed instead, so a job that stops every worker that runs it isn't run forever.
+    @param timeout: a timedelta, longer than a few heartbeat intervals
+    @return: the number of jobs requeued or failed
+    """
+    stale = Job.query.filter(Job.status == 'running', Job.heartbeat_on < datetime.datetime.now() - timeout)
+
+    failed_ids = [id for id, in stale.filter(Job.attempts >= max_attempts).with_entities(Job.id)]
+    if failed_ids:
+        Job.query.filter(Job.id.in_(failed_ids)).update({
+            'status': 'failed',
+            'error': 'the worker running the job stopped {} times'.format(max_attempts),
+            'finished_on': datetime.datetime.now()
+        }, synchronize_session=False)
+        JobFile.query.filter(JobFile.job.in_(failed_ids)).delete(synchronize_session=False)
+
+    requeued = stale.update({'status': 'queued', 'started_on': None, 'heartbeat_on': None},
+                            synchronize_session=False)
+    db.session.commit()
+
+    return len(failed_ids) + requeued
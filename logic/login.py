@@ -1,3 +1,4 @@
+import hmac
 from functools import wraps
 from flask import request, jsonify, session, current_app
 
@@ -41,3 +42,16 @@ def login_required(f):
             }), 401
 
     return decorated_function
+
+
+def admin_token_valid():
+    """
+    admin_token_valid returns True if the request's X-Admin-Token header matches the ADMIN_TOKEN app setting. Admin
+    endpoints are turned off while ADMIN_TOKEN isn't set.
+    """
+    admin_token = current_app.config['ADMIN_TOKEN']
+    request_token = request.headers.get('X-Admin-Token')
+    if not admin_token or request_token is None:
+        return False
+
+    return hmac.compare_digest(request_token.encode('utf-8'), admin_token.encode('utf-8'))
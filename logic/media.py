@@ -1,28 +1,115 @@
-from database import db
+import re
 
-from models.media import Media
+from flask import current_app
+
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.util import identity_key
+
+from database import db, read_only, commit_or_flush
+from prepared_statements import PreparedStatement, prepared_statements_enabled
+
+from models.media import Media, MediaRecord, mediums, consumed_states, media_fields, medium_code_sql, \
+    consumed_state_code_sql
 from models.user import User
 
+from logic.media_name_index import get_media_name_index
+
+# the hot media queries, run as prepared statements when PREPARED_STATEMENTS is enabled. Every one names the user, so
+# generic plans of the prepared statements still only scan the user's partition when media is partitioned.
+media_by_id = PreparedStatement(
+    'media_by_id',
+    'SELECT id, medianame, "user", medium, consumed_state, description, "order" FROM media '
+    'WHERE id = :id AND "user" = :userid',
+    [('id', 'integer'), ('userid', 'integer')])
+media_records_by_username = PreparedStatement(
+    'media_records_by_username',
+    'SELECT id, medianame, {}, {}, description, "order" FROM media '
+    'WHERE "user" = (SELECT id FROM users WHERE username = :username) ORDER BY "order", id'.format(
+        medium_code_sql, consumed_state_code_sql),
+    [('username', 'text')])
+media_stats_by_userid = PreparedStatement(
+    'media_stats_by_userid',
+    'SELECT medium, consumed_state, count(id) FROM media WHERE "user" = :userid GROUP BY medium, consumed_state',
+    [('userid', 'integer')])
+
 
-def add_media(userid, medianame, medium='other', consumed_state='not started', description='', order=0):
+# the most media elements upsert_media_rows writes with one statement, each one takes 6 bind parameters
+upsert_batch_size = 1000
+# the fields an upsert sets on update when they are given, and the values they get on insert when they aren't
+upsert_defaults = {'medium': 'other', 'consumed_state': 'not started', 'description': '', 'order': 0}
+upsert_keys = tuple(upsert_defaults)
+
+
+def add_media(userid, medianame, medium='other', consumed_state='not started', description='', order=0, commit=True):
     """
     add_media creates a new media record with the given medianame and assigns the media to the user with the given
     username
+    @param commit: if False the media is only flushed, so it gets its id, and the caller finishes the transaction with
+        commit_media
     """
     media = Media(medianame, userid, medium, consumed_state, description, order)
     db.session.add(media)
-    db.session.commit()
+    commit_or_flush(commit)
+
+    media_name_index = get_media_name_index()
+    if media_name_index is not None and commit:
+        media_name_index.add(userid, media.id, medianame)
 
     return media
 
 
-def update_media(id, medianame=None, medium=None, consumed_state=None, description=None, order=None):
+def add_media_rows(userid, rows, commit=True):
+    """
+    add_media_rows inserts a batch of new media elements for the user with the given userid with one multi-row INSERT
+    statement, used for bulk imports. With MEDIA_UPSERT_NATURAL_KEY enabled, a batch with names that are already
+    taken is upserted with upsert_media_rows instead.
+    @param rows: a list of validated PUT body dicts without ids
+    @param commit: if False the caller finishes the transaction with commit_media. A failed INSERT rolls the session
+        back, so the batch has to be the first write of the transaction.
+    @return: the number of media elements added/updated
+    """
+    if not rows:
+        return 0
+
+    values = [{
+        'medianame': row['name'],
+        'user': userid,
+        'medium': row.get('medium', 'other'),
+        'consumed_state': row.get('consumed_state', 'not started'),
+        'description': row.get('description', ''),
+        'order': row.get('order', 0)
+    } for row in rows]
+
+    try:
+        db.session.execute(Media.__table__.insert().values(values))
+        commit_or_flush(commit)
+    except IntegrityError:
+        db.session.rollback()
+        # only the natural key's unique index can make an upsert succeed where the INSERT failed, anything else, like
+        # a foreign key error, is raised as it is
+        if not current_app.config['MEDIA_UPSERT_NATURAL_KEY']:
+            raise
+        upsert_media_rows(userid, rows, commit)
+
+    media_name_index = get_media_name_index()
+    if media_name_index is not None and commit:
+        media_name_index.invalidate(userid)
+
+    return len(rows)
+
+
+def update_media(id, medianame=None, medium=None, consumed_state=None, description=None, order=None, userid=None,
+                 commit=True):
     """
     upadte_media updates an existing media record with the given id
     @param id: id is required when updating
     @param: if the given parameter's are None or missing no change is made to that media property
+    @param userid: the id of the user that owns the media, when it is known, so the media is found in the session, or
+        in the user's partition, without looking through every user's media
+    @param commit: if False the change is only flushed, and the caller finishes the transaction with commit_media
     """
-    media = Media.query.filter_by(id=id).first()
+    media = get_media_by_id(id, userid)
 
     if medianame is not None:
         media.medianame = medianame
@@ -34,42 +121,491 @@ def update_media(id, medianame=None, medium=None, consumed_state=None, descripti
         media.description = description
     if order is not None:
         media.order = order
-    db.session.commit()
+    commit_or_flush(commit)
+
+    media_name_index = get_media_name_index()
+    if media_name_index is not None and medianame is not None and commit:
+        media_name_index.add(media.user, media.id, medianame)
 
     return media
 
 
-def remove_media(id):
+def upsert_media(userid, medianame, medium=None, consumed_state=None, description=None, order=None, commit=True):
+    """
+    upsert_media inserts a media element with the given medianame for the user with the given userid, or updates the
+    user's media element that already has this medianame, in a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+    statement, so there is no read before the write and concurrent upserts of the same medianame can't both insert.
+    It needs the unique index on media (user, medianame) that the media natural key migration adds.
+    @param: if the given parameter's are None or missing no change is made to that media property on update, and the
+        property gets its default value on insert
+    @param commit: if False the caller finishes the transaction with commit_media
+    @return: a MediaRecord of the inserted/updated media element
+    """
+    if medium is not None and medium not in mediums:
+        raise ValueError('medium must be one of these values: {}'.format(mediums))
+    if consumed_state is not None and consumed_state not in consumed_states:
+        raise ValueError('consumed_state must be on of these values: {}'.format(consumed_states))
+
+    row = {'medium': medium, 'consumed_state': consumed_state, 'description': description, 'order': order}
+    row = {key: value for key, value in row.items() if value is not None}
+    row['name'] = medianame
+
+    return upsert_media_rows(userid, [row], commit)[medianame]
+
+
+def upsert_media_rows(userid, rows, commit=True):
+    """
+    upsert_media_rows upserts a batch of media elements for the user with the given userid on their medianames, like
+    upsert_media, in one transaction. Elements that give the same fields are upserted together with one multi-row
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING statement per upsert_batch_size elements, so a batch whose elements
+    all give the same fields, the usual case, is a single statement. One statement can't update a row twice, so
+    elements with the same name are merged first, in order, with the fields of later elements winning, which leaves
+    the same row as upserting them one at a time would.
+    It needs the unique index on media (user, medianame) that the media natural key migration adds.
+    @param rows: a list of validated PUT body dicts without ids
+    @param commit: if False the caller finishes the transaction with commit_media
+    @return: a dict mapping each medianame to a MediaRecord of its inserted/updated media element
+    """
+    merged = {}
+    for row in rows:
+        merged.setdefault(row['name'], {}).update(
+            (key, row[key]) for key in upsert_keys if row.get(key) is not None)
+
+    groups = {}
+    for medianame, row in merged.items():
+        groups.setdefault(tuple(sorted(row)), []).append((medianame, row))
+
+    records = {}
+    for keys, group in groups.items():
+        # the update has to set something for RETURNING to return the existing row
+        updated_columns = [media_fields[key] for key in keys] or ['medianame']
+        for start in range(0, len(group), upsert_batch_size):
+            batch = group[start:start + upsert_batch_size]
+            parameters = {'user': userid}
+            for index, (medianame, row) in enumerate(batch):
+                parameters['medianame_{}'.format(index)] = medianame
+                for key, default in upsert_defaults.items():
+                    parameters['{}_{}'.format(key, index)] = row.get(key, default)
+
+            for row in db.session.execute(upsert_statement(updated_columns, len(batch)), parameters):
+                records[row[1]] = MediaRecord._make(row)
+    commit_or_flush(commit)
+
+    media_name_index = get_media_name_index()
+    if media_name_index is not None and commit:
+        for record in records.values():
+            media_name_index.add(userid, record.id, record.name)
+
+    return records
+
+
+def upsert_statement(updated_columns, count):
+    """
+    upsert_statement returns the INSERT ... ON CONFLICT DO UPDATE ... RETURNING statement upsert_media_rows runs for
+    count media elements, whose parameters are suffixed with the element's position, that sets updated_columns of the
+    elements that already exist. It returns the rows MediaRecord._make takes.
+    """
+    values = ', '.join('(:medianame_{0}, :user, :medium_{0}, :consumed_state_{0}, :description_{0}, :order_{0})'
+                       .format(index) for index in range(count))
+
+    return db.text(
+        'INSERT INTO media (medianame, "user", medium, consumed_state, description, "order") VALUES {} '
+        'ON CONFLICT ("user", medianame) DO UPDATE SET {} '
+        'RETURNING id, medianame, {}, {}, description, "order"'.format(
+            values,
+            ', '.join('"{0}" = excluded."{0}"'.format(column) for column in updated_columns),
+            medium_code_sql, consumed_state_code_sql))
+
+
+def remove_media(id, userid=None, commit=True):
     """
     remove_media removes a Media record from the database
+    @param userid: if given, the media is only removed if it belongs to the user with this userid, and the DELETE only
+        looks at the user's partition
+    @param commit: if False the caller finishes the transaction with commit_media
     """
     # if there is no record for this medianame for this user, then filter returns nothing, and nothing is deleted
-    Media.query.filter_by(id=id).delete()
+    query = Media.query.filter_by(id=id)
+    if userid is not None:
+        query = query.filter_by(user=userid)
+    query.delete()
+    commit_or_flush(commit)
+
+    media_name_index = get_media_name_index()
+    if media_name_index is not None and commit:
+        media_name_index.remove(id)
+
+
+def commit_media(userid):
+    """
+    commit_media commits the media writes made with commit=False for the user with the given userid as one
+    transaction, and drops the user's media name index entries, which those writes didn't keep up to date
+    """
     db.session.commit()
 
+    media_name_index = get_media_name_index()
+    if media_name_index is not None:
+        media_name_index.invalidate(userid)
+
+
+def remove_media_list(userid, ids):
+    """
+    remove_media_list removes the media records with the given ids that belong to the user with the given userid, with
+    a single DELETE statement
+    @return: the number of media records removed
+    """
+    count = Media.query.filter(Media.user == userid, Media.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+    media_name_index = get_media_name_index()
+    if media_name_index is not None:
+        media_name_index.invalidate(userid)
+
+    return count
+
+
+def move_media(userid, id, position, commit=True):
+    """
+    move_media moves the media element with the given id to the given order position for the user with the given
+    userid. Every media element between the old position and the new position is shifted by one so the relative
+    ordering of the rest of the list is kept. The renumbering is done with a single UPDATE statement.
+    @param userid: the id of the user that owns the media element
+    @param id: the id of the media element to move
+    @param position: the new order value for the media element
+    @param commit: if False the caller finishes the transaction with commit_media. The media loaded in the session
+        are expired instead, since the UPDATE renumbered them, so later steps of the transaction read their new order.
+    @return: the number of media elements that were renumbered
+    """
+    media = get_media_by_id(id, userid)
+    old_position = media.order if media.order is not None else 0
+
+    if position < old_position:
+        # media between the new and old positions move down the list
+        shifted = db.and_(Media.order >= position, Media.order < old_position)
+        shifted_order = Media.order + 1
+    else:
+        # media between the old and new positions move up the list
+        shifted = db.and_(Media.order > old_position, Media.order <= position)
+        shifted_order = Media.order - 1
+
+    count = Media.query.filter(Media.user == userid, db.or_(Media.id == id, shifted)).update(
+        {Media.order: db.case([(Media.id == id, position)], else_=shifted_order)},
+        synchronize_session=False)
+    if commit:
+        db.session.commit()
+    else:
+        # the UPDATE flushed everything pending first, so there are no unflushed changes to lose
+        db.session.expire_all()
 
-def get_media(username, medium=None, consumed_state=None):
+    return count
+
+
+def reorder_media(userid, ids):
+    """
+    reorder_media sets the order of the user's media elements to match the given list of media ids, so the first id
+    gets order 0, the second gets order 1, and so on. The renumbering is done with a single UPDATE statement.
+    @param userid: the id of the user that owns the media elements
+    @param ids: a list of the ids of all of the user's media in their new display order, media left out keep their
+        order, which may now be the same as one of the listed media's
+    @return: the number of media elements that were renumbered
+    """
+    if not ids:
+        return 0
+
+    count = Media.query.filter(Media.user == userid, Media.id.in_(ids)).update(
+        {Media.order: db.case({media_id: position for position, media_id in enumerate(ids)}, value=Media.id)},
+        synchronize_session=False)
+    db.session.commit()
+
+    return count
+
+
+def get_media_owned_by_user(userid, ids):
+    """
+    get_media_owned_by_user returns the media objects with the given ids that belong to the user with the given userid,
+    with one query. They stay in the session, so get_media_by_id finds them again without a query.
+    """
+    return Media.query.filter(Media.user == userid, Media.id.in_(ids)).all()
+
+
+def count_media_owned_by_user(userid, ids):
+    """
+    count_media_owned_by_user returns how many of the given media ids belong to the user with the given userid
+    """
+    return Media.query.filter(Media.user == userid, Media.id.in_(ids)).count()
+
+
+def count_user_media(userid):
+    """
+    count_user_media returns how many media elements the user with the given userid has
+    """
+    return Media.query.filter(Media.user == userid).count()
+
+
+@read_only
+def get_media(username, medium=None, consumed_state=None, q=None, fields=None):
     """
     get_media returns all the media associated with the given username.
     If medium is set to a medium type, then only the media with the same medium type will be returned.
     If consumed_state is set to a consumed_state, then only the media with the same consumed_state will be returned.
+    If q is set to a search string, then only the media whose name or description contains every word of q (as a word
+    prefix on PostgreSQL) will be returned, best matches first.
+    If fields is set to a list of media_fields keys, then only the columns for those keys are loaded, and the media
+    elements should be serialized with as_dict(fields).
     @return: a list of media elements
     """
-    media_list = User.query.filter_by(username=username).first().media
+    where, order_by = media_list_clauses(username, medium, consumed_state, q)
+    query = Media.query.filter(*where).order_by(*order_by)
+
+    if fields is not None:
+        query = query.options(db.load_only(*[media_fields[field] for field in fields]))
+
+    return query.all()
+
+
+@read_only
+def get_media_records(username, medium=None, consumed_state=None, q=None, fields=None):
+    """
+    get_media_records takes the same arguments as get_media and returns the same media, but as MediaRecords. It runs a
+    Core select and builds the records straight from the rows, which skips building Media instances and adding them to
+    the session, so it is the cheaper way to read a list of media for a response.
+    @return: a list of MediaRecords, with the fields that weren't selected set to None
+    """
+    if medium is None and consumed_state is None and q is None and fields is None and prepared_statements_enabled():
+        return list(map(MediaRecord._make, media_records_by_username.execute(Media, username=username)))
+
+    where, order_by = media_list_clauses(username, medium, consumed_state, q)
+
+    statement = db.select(media_record_columns(fields)) \
+        .where(db.and_(*where)) \
+        .order_by(*order_by)
+
+    return list(map(MediaRecord._make, db.session.execute(statement)))
+
+
+def media_record_columns(fields=None):
+    """
+    media_record_columns returns the columns to select for media rows that MediaRecord._make takes as they are: the
+    media_fields columns in order, with medium and consumed_state turned into their codes by the database
+    @param fields: an optional list of media_fields keys, NULL is selected in place of the columns of the other keys
+    """
+    columns = {
+        'id': Media.id,
+        'name': Media.medianame,
+        'medium': db.literal_column(medium_code_sql),
+        'consumed_state': db.literal_column(consumed_state_code_sql),
+        'description': Media.description,
+        'order': Media.order
+    }
+
+    return [column if fields is None or key in fields else db.null() for key, column in columns.items()]
+
+
+def iter_media_records(userid, batch_size=1000):
+    """
+    iter_media_records yields every media element of the user with the given userid as MediaRecords in display order.
+    The rows are streamed from a server side cursor and fetched batch_size at a time, so exporting a large library
+    doesn't hold it all in memory.
+    """
+    statement = db.select(media_record_columns()) \
+        .where(Media.user == userid) \
+        .order_by(Media.order, Media.id)
+    result = db.session.connection().execution_options(stream_results=True).execute(statement)
+
+    try:
+        rows = result.fetchmany(batch_size)
+        while rows:
+            for row in rows:
+                yield MediaRecord._make(row)
+            rows = result.fetchmany(batch_size)
+    finally:
+        result.close()
+
+
+def get_media_dicts(username, medium=None, consumed_state=None, q=None, fields=None):
+    """
+    get_media_dicts takes the same arguments as get_media and returns the same media, but as the dicts as_dict(fields)
+    would return
+    @return: a list of dicts representing media elements
+    """
+    return [record.as_dict(fields) for record in get_media_records(username, medium, consumed_state, q, fields)]
+
+
+@read_only
+def get_media_json(username, medium=None, consumed_state=None, q=None, fields=None):
+    """
+    get_media_json takes the same arguments as get_media and returns the same media, but as the text of a JSON array
+    of the dicts as_dict(fields) would return, built by the database with json_agg on PostgreSQL or json_group_array
+    on SQLite. The text can be put into a response as is, without decoding and encoding it again in python.
+    @return: a string holding a JSON array of media elements
+    """
+    keys = [key for key in media_fields if fields is None or key in fields]
+    where, order_by = media_list_clauses(username, medium, consumed_state, q)
+
+    # the list order is computed as a single position column so the aggregate only has to order by one key
+    media_rows = db.select([Media.__table__.c[media_fields[key]].label(key) for key in keys] +
+                           [db.func.row_number().over(order_by=order_by).label('position')]) \
+        .where(db.and_(*where))
+
+    if db.engine.dialect.name == 'postgresql':
+        media_rows = media_rows.alias('media_rows')
+        media_object = db.func.json_build_object(*json_object_arguments(media_rows, keys))
+        media_json = db.func.json_agg(aggregate_order_by(media_object, media_rows.c.position))
+        # cast to text so psycopg2 doesn't decode the json
+        statement = db.select([db.cast(db.func.coalesce(media_json, db.literal_column("'[]'")), db.Text)]) \
+            .select_from(media_rows)
+    else:
+        # json_group_array keeps the order of the rows it aggregates
+        media_rows = media_rows.order_by(db.literal_column('position')).alias('media_rows')
+        media_object = db.func.json_object(*json_object_arguments(media_rows, keys))
+        statement = db.select([db.func.json_group_array(media_object)]).select_from(media_rows)
+
+    return db.session.execute(statement).scalar()
+
+
+def json_object_arguments(rows, keys):
+    """
+    json_object_arguments returns the alternating key and column arguments json_build_object and json_object take to
+    build an object with the given keys from the columns of rows with the same names
+    """
+    arguments = []
+    for key in keys:
+        arguments.extend([db.literal_column("'{}'".format(key)), rows.c[key]])
+
+    return arguments
+
+
+def media_list_clauses(username, medium=None, consumed_state=None, q=None):
+    """
+    media_list_clauses builds the WHERE and ORDER BY clauses shared by get_media and get_media_dicts, for a query
+    of media.
+    The user is matched with a scalar subquery of their id, rather than a join to users, so when media is partitioned
+    PostgreSQL runs the subquery first and only scans the user's partition.
+    @return: a tuple of a list of WHERE clauses and a list of ORDER BY clauses
+    """
+    where = [Media.user == db.select([User.id]).where(User.username == username).as_scalar()]
+    order_by = []
 
     # if medium is set then only return the media items that have the same medium type
     if medium is not None:
-        media_list = [media for media in media_list if media.medium == medium]
+        where.append(Media.medium == medium)
 
     # if consumed is set then only return the media items that have the same consumed value
     if consumed_state is not None:
-        media_list = [media for media in media_list if media.consumed_state == consumed_state]
+        where.append(Media.consumed_state == consumed_state)
 
-    return media_list
+    terms = search_terms(q) if q is not None else []
+    if terms:
+        search_where, search_order_by = search_media_clauses(terms)
+        where.extend(search_where)
+        order_by.extend(search_order_by)
 
+    order_by.extend([Media.order, Media.id])
 
-def get_media_by_id(id):
+    return where, order_by
+
+
+def search_terms(q):
+    """
+    search_terms splits a search string into lowercase words, dropping punctuation so the words are safe to use in
+    tsquery and LIKE patterns
     """
-    get_media_by_id returns a single media object with the given id, or None if there is no media with the given id
+    return re.findall(r'[^\W_]+', q.lower())
+
+
+def search_media_clauses(terms):
     """
-    return Media.query.filter_by(id=id).first()
+    search_media_clauses builds the clauses that filter media down to the media matching every search term, and order
+    it by relevance. On PostgreSQL this uses the generated search_vector column (and its GIN index) with prefix matching
+    on each term, ranked by ts_rank. Other databases fall back to case insensitive substring matching, with name
+    matches first.
+    @return: a tuple of a list of WHERE clauses and a list of ORDER BY clauses
+    """
+    if db.engine.dialect.name == 'postgresql':
+        search_vector = db.literal_column('media.search_vector')
+        tsquery = db.func.to_tsquery('simple', ' & '.join(term + ':*' for term in terms))
+
+        return [search_vector.op('@@')(tsquery)], [db.func.ts_rank(search_vector, tsquery).desc()]
+
+    name_matches = [Media.medianame.ilike('%' + term + '%') for term in terms]
+    description_matches = [Media.description.ilike('%' + term + '%') for term in terms]
+
+    return [db.or_(name_match, description_match)
+            for name_match, description_match in zip(name_matches, description_matches)], \
+        [db.case([(db.and_(*name_matches), 0)], else_=1)]
+
+
+@read_only
+def get_media_stats(userid):
+    """
+    get_media_stats counts the media of the user with the given userid by medium and consumed_state, using a single
+    GROUP BY query
+    @return: a dict mapping every medium to a dict mapping every consumed_state to the number of media elements
+    """
+    stats = {medium: {consumed_state: 0 for consumed_state in consumed_states} for medium in mediums}
+
+    if prepared_statements_enabled():
+        rows = media_stats_by_userid.execute(Media, userid=userid)
+    else:
+        rows = db.session.query(Media.medium, Media.consumed_state, db.func.count(Media.id)) \
+            .filter(Media.user == userid) \
+            .group_by(Media.medium, Media.consumed_state)
+    for medium, consumed_state, count in rows:
+        # rows from before medium and consumed_state existed can have NULLs, they aren't counted
+        if medium in stats and consumed_state in stats[medium]:
+            stats[medium][consumed_state] = count
+
+    return stats
+
+
+@read_only
+def suggest_media_names(userid, q, limit=10):
+    """
+    suggest_media_names returns up to limit (id, name) tuples of the user's media whose names best match q, for
+    typeahead while the user types.
+    If MEDIA_NAME_INDEX is enabled the in-process media name index is used, which only matches name prefixes.
+    On PostgreSQL names starting with q come first, followed by fuzzy matches using pg_trgm similarity, both served by
+    the trigram index on medianame. Other databases match names starting with q, then names containing q.
+    """
+    media_name_index = get_media_name_index()
+    if media_name_index is not None:
+        return media_name_index.suggest(userid, q, limit)
+
+    pattern = escape_like(q)
+    prefix_match = Media.medianame.ilike(pattern + '%', escape='\\')
+
+    if db.engine.dialect.name == 'postgresql':
+        # the trigram similarity operator is %, which psycopg2 needs escaped
+        query = Media.query.filter(Media.user == userid, db.or_(prefix_match, Media.medianame.op('%%')(q))) \
+            .order_by(db.case([(prefix_match, 0)], else_=1), db.func.similarity(Media.medianame, q).desc())
+    else:
+        query = Media.query.filter(Media.user == userid, Media.medianame.ilike('%' + pattern + '%', escape='\\')) \
+            .order_by(db.case([(prefix_match, 0)], else_=1))
+
+    return query.order_by(Media.medianame).with_entities(Media.id, Media.medianame).limit(limit).all()
+
+
+def escape_like(value):
+    """
+    escape_like escapes the LIKE wildcards in value, so it can be used in a LIKE pattern with '\\' as the escape
+    character
+    """
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def get_media_by_id(id, userid=None):
+    """
+    get_media_by_id returns a single media object with the given id, or None if there is no media with the given id.
+    @param userid: if given, only media belonging to the user with this userid is returned. A media object already
+        loaded in the session is then returned without a query, and otherwise only the user's partition is searched.
+    """
+    if userid is None:
+        return Media.query.filter_by(id=id).first()
+
+    if prepared_statements_enabled():
+        media = db.session.identity_map.get(identity_key(Media, (id, userid)))
+        if media is not None:
+            return media
+        return media_by_id.query(Media, id=id, userid=userid).first()
+
+    return Media.query.get((id, userid))
@@ -0,0 +1,131 @@
+import bisect
+import threading
+import time
+
+from flask import current_app
+
+from database import db
+
+from models.media import Media
+
+
+class MediaNameIndex:
+    """
+    MediaNameIndex is an in-process index of media names used for typeahead suggestions. Each user's media names are
+    kept in a sorted list of (lowercase name, id, name) tuples, so a prefix lookup is a binary search.
+    A user's entries are loaded from the database on their first lookup, and are kept up to date by the write paths in
+    logic/media.py. Writes made by other processes aren't seen here, so a user's entries are reloaded once they are
+    older than max_age seconds.
+    The lock is only held to read and change the in-memory entries, a user's entries are queried without it so one slow
+    load doesn't hold up lookups and writes for every other user.
+    """
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        # userid -> sorted list of (lowercase name, id, name)
+        self.entries = {}
+        # userid -> time the user's entries were loaded
+        self.loaded_on = {}
+        # media id -> (userid, entry) so entries can be found from a media id alone
+        self.media = {}
+        # counts add, remove and invalidate calls, so a load can tell if a write happened while it was querying
+        self.writes = 0
+
+    def suggest(self, userid, prefix, limit):
+        """
+        suggest returns up to limit (id, name) tuples for the user's media whose name starts with prefix, ignoring case
+        """
+        with self.lock:
+            loaded_on = self.loaded_on.get(userid)
+            if loaded_on is not None and time.monotonic() - loaded_on <= self.max_age:
+                return self._suggest(self.entries[userid], prefix, limit)
+            writes = self.writes
+
+        entries = self._query(userid)
+
+        with self.lock:
+            if self.writes == writes:
+                self._install(userid, entries)
+            # otherwise the query may have missed the write, so its entries answer this lookup but aren't kept
+            return self._suggest(entries, prefix, limit)
+
+    def add(self, userid, id, name):
+        """
+        add records a new or renamed media element, it does nothing if the user's entries haven't been loaded yet
+        """
+        with self.lock:
+            self.writes += 1
+            self._remove(id)
+            if userid in self.entries and name is not None:
+                entry = (name.lower(), id, name)
+                bisect.insort(self.entries[userid], entry)
+                self.media[id] = (userid, entry)
+
+    def remove(self, id):
+        """
+        remove forgets a deleted media element
+        """
+        with self.lock:
+            self.writes += 1
+            self._remove(id)
+
+    def invalidate(self, userid):
+        """
+        invalidate drops a user's entries so they are reloaded on the next lookup, used after bulk writes
+        """
+        with self.lock:
+            self.writes += 1
+            for entry in self.entries.pop(userid, []):
+                self.media.pop(entry[1], None)
+            self.loaded_on.pop(userid, None)
+
+    @staticmethod
+    def _suggest(entries, prefix, limit):
+        prefix = prefix.lower()
+        start = bisect.bisect_left(entries, (prefix,))
+
+        suggestions = []
+        for lower_name, id, name in entries[start:start + limit]:
+            if not lower_name.startswith(prefix):
+                break
+            suggestions.append((id, name))
+
+        return suggestions
+
+    @staticmethod
+    def _query(userid):
+        rows = db.session.query(Media.id, Media.medianame) \
+            .filter(Media.user == userid, Media.medianame.isnot(None)).all()
+        return sorted((name.lower(), id, name) for id, name in rows)
+
+    def _install(self, userid, entries):
+        for entry in self.entries.pop(userid, []):
+            self.media.pop(entry[1], None)
+
+        self.entries[userid] = entries
+        self.loaded_on[userid] = time.monotonic()
+        for entry in entries:
+            self.media[entry[1]] = (userid, entry)
+
+    def _remove(self, id):
+        if id not in self.media:
+            return
+
+        userid, entry = self.media.pop(id)
+        entries = self.entries[userid]
+        index = bisect.bisect_left(entries, entry)
+        if index < len(entries) and entries[index] == entry:
+            del entries[index]
+
+
+def get_media_name_index():
+    """
+    get_media_name_index returns the current app's MediaNameIndex, or None if MEDIA_NAME_INDEX is disabled
+    """
+    if not current_app.config.get('MEDIA_NAME_INDEX'):
+        return None
+
+    if 'media_name_index' not in current_app.extensions:
+        current_app.extensions['media_name_index'] = MediaNameIndex(current_app.config['MEDIA_NAME_INDEX_MAX_AGE'])
+
+    return current_app.extensions['media_name_index']
@@ -0,0 +1,65 @@
+import datetime
+import secrets
+import uuid
+
+from flask import current_app
+
+from database import db
+
+from models.refresh_token import RefreshToken
+
+
+def issue_refresh_token(userid, family=None):
+    """
+    issue_refresh_token creates and stores a new refresh token for the user with the given userid
+    @param family: the family of the refresh token this one replaces, or None to start a new family at login
+    @return: a string representing the refresh token, which is only stored hashed
+    """
+    refresh_token = secrets.token_urlsafe(32)
+    db.session.add(RefreshToken(userid, family if family is not None else uuid.uuid4().hex, refresh_token,
+                                current_app.config['REFRESH_TOKEN_LIFETIME']))
+    db.session.commit()
+
+    return refresh_token
+
+
+def get_refresh_token(refresh_token):
+    """
+    get_refresh_token returns the stored RefreshToken for a refresh token string, or None if it isn't stored
+    """
+    return RefreshToken.query.filter_by(token_hash=RefreshToken.hash_token(refresh_token)).first()
+
+
+def rotate_refresh_token(refresh_token):
+    """
+    rotate_refresh_token uses up a refresh token and issues the next one in its family. A refresh token that has
+    already been used (or revoked) has been stolen or replayed, so its whole family is revoked.
+    @return: a (userid, new refresh token) tuple, or a string representing an error message if the refresh token
+        can't be used
+    """
+    stored_token = get_refresh_token(refresh_token)
+    if stored_token is None:
+        return 'invalid refresh token'
+
+    if stored_token.expires_on < datetime.datetime.now():
+        return 'refresh token expired'
+
+    # marked used with a conditional UPDATE, so of two requests racing with the same token only one gets through
+    used = RefreshToken.query \
+        .filter_by(id=stored_token.id, used_on=None, revoked=False) \
+        .update({'used_on': datetime.datetime.now()}, synchronize_session=False)
+    db.session.commit()
+
+    if not used:
+        revoke_refresh_token_family(stored_token.family)
+        return 'refresh token revoked'
+
+    return stored_token.user, issue_refresh_token(stored_token.user, stored_token.family)
+
+
+def revoke_refresh_token_family(family):
+    """
+    revoke_refresh_token_family revokes every refresh token in a family, so none of them can be used again
+    """
+    RefreshToken.query.filter_by(family=family).update({'revoked': True}, synchronize_session=False)
+    db.session.commit()
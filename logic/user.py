@@ -1,7 +1,13 @@
-from database import db
+from database import db, read_only
 from models.user import User
+from prepared_statements import PreparedStatement, prepared_statements_enabled
 import bcrypt
 
+user_by_username = PreparedStatement(
+    'user_by_username', 'SELECT id, username, passhash FROM users WHERE username = :username', [('username', 'text')])
+user_by_id = PreparedStatement(
+    'user_by_id', 'SELECT id, username, passhash FROM users WHERE id = :user_id', [('user_id', 'integer')])
+
 
 def add_user(username, password):
     """
@@ -17,15 +23,23 @@ def add_user(username, password):
     return user
 
 
+@read_only
 def get_user(username):
     """
     get_user queries the database for a user with the given username, returning the user instance
     """
+    if prepared_statements_enabled():
+        return user_by_username.query(User, username=username).first()
+
     return User.query.filter_by(username=username).first()
 
 
+@read_only
 def get_user_by_id(user_id):
     """
     get_user_by_id queries the database for a user with the given user id, returning the user instance
     """
+    if prepared_statements_enabled():
+        return user_by_id.query(User, user_id=user_id).first()
+
     return User.query.filter_by(id=user_id).first()
@@ -0,0 +1,200 @@
+"""
+helpers for alembic migrations that change big tables, like media, while the app keeps running. Long running work is
+split into short transactions on their own connection, so no lock is held for more than one batch:
+    backfill runs an UPDATE (or INSERT ... SELECT) over a table one id range at a time, pausing between batches, and
+        records its progress, so a backfill that is stopped or fails picks up where it left off when run again
+    create_index_concurrently and drop_index_concurrently build and drop indexes without blocking writes
+    run_with_lock_timeout runs DDL that needs a strong lock, like adding a column, with a short lock_timeout, and tries
+        again later if the lock can't be had, rather than queueing every query on the table behind it
+    set_lock_timeout guards the DDL in the migration's own transaction the same way, failing rather than waiting
+
+Import the helpers inside a migration's upgrade(), since alembic only puts the repo root on sys.path when it runs
+env.py, which commands like alembic history don't.
+Helpers that use their own connection have to be called before the migration runs anything on op.get_bind(), since
+CREATE INDEX CONCURRENTLY waits for every open transaction, including a migration's own. On databases other than
+PostgreSQL the concurrent and lock_timeout parts are skipped.
+"""
+import time
+
+from alembic import op
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# the postgres error code of a statement cancelled by lock_timeout
+lock_not_available = '55P03'
+
+default_lock_timeout = '5s'
+
+progress_table_ddl = """
+    CREATE TABLE IF NOT EXISTS migration_progress (
+        name varchar(200) PRIMARY KEY,
+        last_id bigint NOT NULL,
+        updated_on timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def get_engine(bind=None):
+    """
+    get_engine returns the engine of the running migration, or of bind if one is given
+    """
+    bind = bind if bind is not None else op.get_bind()
+    return bind.engine if hasattr(bind, 'engine') else bind
+
+
+def is_postgresql(bind):
+    return bind.dialect.name == 'postgresql'
+
+
+def set_lock_timeout(timeout=default_lock_timeout, bind=None):
+    """
+    set_lock_timeout makes statements in the current transaction fail after waiting timeout for a lock, rather than
+    waiting for long running queries while every other query on the table waits behind them
+    """
+    bind = bind if bind is not None else op.get_bind()
+    if is_postgresql(bind):
+        bind.execute("SET LOCAL lock_timeout = '{}'".format(timeout))
+
+
+def is_lock_timeout(error):
+    return getattr(error.orig, 'pgcode', None) == lock_not_available
+
+
+def run_with_lock_timeout(statements, timeout=default_lock_timeout, retries=10, retry_pause=1.0, bind=None):
+    """
+    run_with_lock_timeout runs statements in one short transaction on its own connection, with lock_timeout set. If the
+    lock times out the transaction is rolled back and tried again after retry_pause seconds, up to retries times.
+    @param statements: a SQL string or a list of them
+    @raise OperationalError: if the lock still couldn't be had after the last try
+    """
+    if isinstance(statements, str):
+        statements = [statements]
+
+    with get_engine(bind).connect() as connection:
+        for attempt in range(retries + 1):
+            try:
+                with connection.begin():
+                    set_lock_timeout(timeout, connection)
+                    for statement in statements:
+                        connection.execute(text(statement))
+                return
+            except OperationalError as e:
+                if not is_lock_timeout(e) or attempt == retries:
+                    raise
+                time.sleep(retry_pause)
+
+
+def get_progress(connection, name):
+    """
+    get_progress returns the last id a backfill with the given name finished, or None if it hasn't started
+    """
+    connection.execute(text(progress_table_ddl))
+    return connection.execute(text('SELECT last_id FROM migration_progress WHERE name = :name'), name=name).scalar()
+
+
+def save_progress(connection, name, last_id):
+    connection.execute(text(
+        'INSERT INTO migration_progress (name, last_id, updated_on) VALUES (:name, :last_id, CURRENT_TIMESTAMP) '
+        'ON CONFLICT (name) DO UPDATE SET last_id = excluded.last_id, updated_on = excluded.updated_on'),
+        name=name, last_id=last_id)
+
+
+def backfill(name, statement, table='media', batch_size=10000, pause=0.1, timeout=default_lock_timeout, retries=10,
+             bind=None, **params):
+    """
+    backfill runs statement once for each range of batch_size ids of table, up to the largest id when it starts, each
+    batch in its own transaction with lock_timeout set. Rows added while it runs have to be written correctly by the
+    app (or a trigger), since they may be after the last batch. Each batch records the last id it covered under name,
+    in the same transaction, so running the backfill again skips the batches that were done.
+    @param name: a name for the backfill that is unique among all migrations, like '<revision>_<what it fills>'
+    @param statement: SQL that changes the rows with ids from :start up to but not including :end, e.g.
+        'UPDATE media SET consumed_state = 'not started' WHERE id >= :start AND id < :end AND consumed_state IS NULL'
+    @param pause: seconds to sleep between batches, so the backfill leaves room for the app's queries and replicas
+        can keep up
+    @param params: any other bind parameters of statement
+    @return: the number of rows the statement changed
+    """
+    changed = 0
+
+    with get_engine(bind).connect() as connection:
+        with connection.begin():
+            last_id = get_progress(connection, name)
+            max_id = connection.execute(text('SELECT max(id) FROM {}'.format(table))).scalar()
+            if last_id is None:
+                last_id = connection.execute(text('SELECT min(id) FROM {}'.format(table))).scalar()
+                last_id = last_id - 1 if last_id is not None else 0
+
+        while max_id is not None and last_id < max_id:
+            start = last_id + 1
+            end = start + batch_size
+            for attempt in range(retries + 1):
+                try:
+                    with connection.begin():
+                        set_lock_timeout(timeout, connection)
+                        changed += connection.execute(text(statement), start=start, end=end, **params).rowcount
+                        save_progress(connection, name, end - 1)
+                    break
+                except OperationalError as e:
+                    if not is_lock_timeout(e) or attempt == retries:
+                        raise
+                    time.sleep(pause)
+
+            last_id = end - 1
+            print('{}: filled ids up to {} of {}'.format(name, min(last_id, max_id), max_id))
+            time.sleep(pause)
+
+    return changed
+
+
+def index_state(connection, name):
+    """
+    index_state returns None if there is no index with the given name, otherwise whether it is valid. A CREATE INDEX
+    CONCURRENTLY that failed part way leaves an invalid index behind.
+    """
+    return connection.execute(text(
+        'SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)'), name=name).scalar()
+
+
+def create_index_concurrently(name, table, columns, unique=False, using=None, timeout=default_lock_timeout,
+                              bind=None):
+    """
+    create_index_concurrently builds an index without blocking writes to the table, on its own connection outside
+    of any transaction. An invalid index left by an earlier failed try is dropped and built again, a valid one is left
+    as is, so the migration can be run again after a failure.
+    @param columns: the SQL of the indexed columns or expressions, e.g. '"user", "order"'
+    @param using: an index method like 'gin', or None for the default
+    """
+    engine = get_engine(bind)
+    if not is_postgresql(engine):
+        with engine.connect() as connection:
+            connection.execute(text('CREATE {}INDEX IF NOT EXISTS {} ON {} ({})'.format(
+                'UNIQUE ' if unique else '', name, table, columns)))
+        return
+
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+        state = index_state(connection, name)
+        if state:
+            return
+        connection.execute(text("SET lock_timeout = '{}'".format(timeout)))
+        if state is not None:
+            connection.execute(text('DROP INDEX CONCURRENTLY IF EXISTS {}'.format(name)))
+        connection.execute(text('CREATE {}INDEX CONCURRENTLY {} ON {}{} ({})'.format(
+            'UNIQUE ' if unique else '', name, table, ' USING {}'.format(using) if using else '', columns)))
+        connection.execute(text('RESET lock_timeout'))
+
+
+def drop_index_concurrently(name, timeout=default_lock_timeout, bind=None):
+    """
+    drop_index_concurrently drops an index, if it exists, without blocking reads and writes of its table
+    """
+    engine = get_engine(bind)
+    with engine.connect() as connection:
+        if not is_postgresql(engine):
+            connection.execute(text('DROP INDEX IF EXISTS {}'.format(name)))
+            return
+
+        connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+        connection.execute(text("SET lock_timeout = '{}'".format(timeout)))
+        connection.execute(text('DROP INDEX CONCURRENTLY IF EXISTS {}'.format(name)))
+        connection.execute(text('RESET lock_timeout'))
@@ -1,10 +1,17 @@
 import datetime
 
-from database import db
+from database import db, read_only
+from prepared_statements import PreparedStatement, prepared_statements_enabled
+
+blacklisted_token_exists = PreparedStatement(
+    'blacklisted_token_exists', 'SELECT 1 FROM blacklisted_tokens WHERE token = :token', [('token', 'text')])
 
 
 class BlacklistedToken(db.Model):
     __tablename__ = 'blacklisted_tokens'
+    __table_args__ = (
+        db.Index('ix_blacklisted_tokens_blacklisted_on', 'blacklisted_on'),
+    )
     id = db.Column('id', db.Integer, primary_key=True)
     token = db.Column('token', db.String(500), unique=True, nullable=False)
     blacklisted_on = db.Column('blacklisted_on', db.DateTime, nullable=False)
@@ -18,6 +25,7 @@ class BlacklistedToken(db.Model):
             self.id, self.token, self.blacklisted_on)
 
     @staticmethod
+    @read_only
     def check_blacklist(auth_token):
         """
         check_blacklist takes an auth token and checks the blacklisted_tokens table to see
@@ -25,4 +33,22 @@ class BlacklistedToken(db.Model):
         @param auth_token: a string representing an auth token
         @return: a boolean that is True if this token has been blacklisted, and False otherwise
         """
+        if prepared_statements_enabled():
+            return blacklisted_token_exists.execute(BlacklistedToken, token=auth_token).first() is not None
+
         return BlacklistedToken.query.filter_by(token=auth_token).first() is not None
+
+    @staticmethod
+    def purge_blacklist(max_age):
+        """
+        purge_blacklist deletes the blacklisted tokens that were blacklisted more than max_age ago. Auth tokens can't be
+        used after they expire, so tokens blacklisted longer ago than auth tokens live don't need to be kept.
+        @param max_age: a timedelta
+        @return: the number of blacklisted tokens deleted
+        """
+        count = BlacklistedToken.query \
+            .filter(BlacklistedToken.blacklisted_on < datetime.datetime.now() - max_age) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+        return count
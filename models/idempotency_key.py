@@ -0,0 +1,45 @@
+import datetime
+
+from database import db
+
+
+class IdempotencyKey(db.Model):
+    """
+    IdempotencyKey is an Idempotency-Key a client sent with a write, with a hash of the request it came with, and the
+    response to replay when the client retries the request with the same key. The response is None while the request
+    is still running.
+    """
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user', 'key', name='uq_idempotency_keys_user_key'),
+    )
+    id = db.Column('id', db.Integer, primary_key=True)
+    user = db.Column('user', db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key = db.Column('key', db.String(255), nullable=False)
+    request_hash = db.Column('request_hash', db.String(64), nullable=False)
+    status_code = db.Column('status_code', db.Integer)
+    response = db.Column('response', db.Text)
+    created_on = db.Column('created_on', db.DateTime, nullable=False, index=True)
+
+    def __init__(self, userid, key, request_hash):
+        self.user = userid
+        self.key = key
+        self.request_hash = request_hash
+        self.created_on = datetime.datetime.now()
+
+    def __repr__(self):
+        return '<IdempotencyKey(id={}, user={}, key={}, status_code={}, created_on={})>'.format(
+            self.id, self.user, self.key, self.status_code, self.created_on)
+
+    @staticmethod
+    def purge_expired(ttl):
+        """
+        purge_expired deletes the idempotency keys stored more than ttl ago, after which retries with them run again
+        @param ttl: a timedelta
+        @return: the number of idempotency keys deleted
+        """
+        count = IdempotencyKey.query.filter(IdempotencyKey.created_on < datetime.datetime.now() - ttl) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+        return count
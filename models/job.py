@@ -0,0 +1,69 @@
+import datetime
+import json
+
+from database import db
+
+job_statuses = {'queued', 'running', 'finished', 'failed'}
+job_status_type = db.Enum(*job_statuses, name='job_status_type', validate_strings=True)
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_id', 'status', 'id'),
+    )
+    id = db.Column('id', db.Integer, primary_key=True)
+    user = db.Column('user', db.Integer, db.ForeignKey('users.id'))
+    kind = db.Column('kind', db.String(50), nullable=False)
+    payload = db.Column('payload', db.Text, nullable=False)
+    status = db.Column('status', job_status_type, nullable=False, default='queued')
+    result = db.Column('result', db.Text)
+    error = db.Column('error', db.String(500))
+    created_on = db.Column('created_on', db.DateTime, nullable=False)
+    started_on = db.Column('started_on', db.DateTime)
+    finished_on = db.Column('finished_on', db.DateTime)
+    # set when a worker claims the job and every JOB_HEARTBEAT_INTERVAL while it runs it, so the jobs of a worker that
+    # stopped can be told apart from long running ones
+    heartbeat_on = db.Column('heartbeat_on', db.DateTime)
+    attempts = db.Column('attempts', db.Integer, nullable=False, default=0)
+    # JSON a job that writes in several transactions saves with each one, so when a stopped job is run again it can
+    # carry on after the last one instead of writing everything again
+    checkpoint = db.Column('checkpoint', db.Text)
+
+    def __init__(self, kind, userid, payload):
+        self.kind = kind
+        self.user = userid
+        self.payload = json.dumps(payload)
+        self.status = 'queued'
+        self.attempts = 0
+        self.created_on = datetime.datetime.now()
+
+    def __repr__(self):
+        return '<Job(id={}, kind={}, user={}, status={})>'.format(self.id, self.kind, self.user, self.status)
+
+    def as_dict(self):
+        """
+        returns a dict representing this job, without its payload. Used when returning job data as json in response
+        """
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'result': json.loads(self.result) if self.result is not None else None,
+            'error': self.error,
+            'created_on': self.created_on.isoformat(),
+            'started_on': self.started_on.isoformat() if self.started_on is not None else None,
+            'finished_on': self.finished_on.isoformat() if self.finished_on is not None else None
+        }
+
+
+class JobFile(db.Model):
+    """
+    JobFile is one chunk of a file a job reads, like the file of a queued import. The file is kept in the database in
+    chunks, rather than in the job's payload, so neither the request that queues the job nor the worker that runs it
+    holds the whole file in memory, and any worker can run the job. A job's file is deleted once the job is done.
+    """
+    __tablename__ = 'job_files'
+    job = db.Column('job', db.Integer, db.ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True)
+    position = db.Column('position', db.Integer, primary_key=True, autoincrement=False)
+    data = db.Column('data', db.LargeBinary, nullable=False)
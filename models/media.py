@@ -1,3 +1,5 @@
+from collections import namedtuple
+
 from database import db
 
 mediums = {'film', 'audio', 'literature', 'other'}
@@ -6,9 +8,41 @@ medium_type = db.Enum(*mediums, name='medium_type', validate_strings=True)
 consumed_states = {'not started', 'started', 'finished'}
 consumed_state_type = db.Enum(*consumed_states, name='consumed_state_type', validate_strings=True)
 
+# media records store medium and consumed_state as their index in these tuples
+medium_codes = tuple(sorted(mediums))
+consumed_state_codes = tuple(sorted(consumed_states))
+medium_code_lookup = {medium: code for code, medium in enumerate(medium_codes)}
+consumed_state_code_lookup = {consumed_state: code for code, consumed_state in enumerate(consumed_state_codes)}
+
+
+def code_case_sql(column, codes):
+    """
+    code_case_sql returns a SQL CASE expression turning the values of column into their index in codes
+    """
+    return 'CASE {} {} END'.format(column, ' '.join("WHEN '{}' THEN {}".format(value, code)
+                                                    for code, value in enumerate(codes)))
+
+
+# selected in place of medium and consumed_state, so MediaRecords can be made straight from the rows with _make
+medium_code_sql = code_case_sql('media.medium', medium_codes)
+consumed_state_code_sql = code_case_sql('media.consumed_state', consumed_state_codes)
+
+# maps the keys of a media element in responses to the Media attribute they come from
+media_fields = {
+    'id': 'id',
+    'name': 'medianame',
+    'medium': 'medium',
+    'consumed_state': 'consumed_state',
+    'description': 'description',
+    'order': 'order'
+}
+
 
 class Media(db.Model):
     __tablename__ = 'media'
+    __table_args__ = (
+        db.Index('ix_media_user_order', 'user', 'order'),
+    )
     id = db.Column('id', db.Integer, primary_key=True)
     medianame = db.Column('medianame', db.String(80))
     user = db.Column('user', db.Integer, db.ForeignKey('users.id'))
@@ -17,6 +51,11 @@ class Media(db.Model):
     description = db.Column('description', db.String(500))
     order = db.Column('order', db.Integer, default=0)
 
+    # media can be hash partitioned on user (see the media partitioning migrations), and a partitioned table's primary
+    # key has to include the partition key, so the ORM identifies media by (id, user). Its UPDATEs and DELETEs then
+    # name the user, which lets PostgreSQL prune them to the user's partition.
+    __mapper_args__ = {'primary_key': [id, user]}
+
     def __init__(self, medianame, userid, medium='other', consumed_state='not started', description='', order=0):
         if medium not in mediums:
             raise ValueError('medium must be one of these values: {}'.format(mediums))
@@ -34,10 +73,14 @@ class Media(db.Model):
         return '<Media(id={}, medianame={}, user={}, medium={}, consumed_state={}, order={})>'.format(
             self.medianame, self.user, self.medium, self.consumed_state, self.order)
 
-    def as_dict(self):
+    def as_dict(self, fields=None):
         """
         returns a dict representing this media element. Used when returning media data as json in response
+        @param fields: an optional list of media_fields keys, if given only these keys are included in the dict
         """
+        if fields is not None:
+            return {field: getattr(self, attribute) for field, attribute in media_fields.items() if field in fields}
+
         return {
             'id': self.id,
             'name': self.medianame,
@@ -46,3 +89,78 @@ class Media(db.Model):
             'description': self.description,
             'order': self.order
         }
+
+
+class MediaRecord(namedtuple('MediaRecord', ['id', 'name', 'medium_code', 'consumed_state_code', 'description',
+                                             'order'])):
+    """
+    MediaRecord is a compact, read only copy of a media element, used as the unit the logic layer hands to serializers
+    and caches instead of Media instances or dicts. medium and consumed_state are stored as small integer codes into
+    medium_codes and consumed_state_codes. Fields that weren't loaded are None.
+    Reads select media_record_columns (in logic/media.py), whose rows are already in MediaRecord's field order with the
+    codes computed by the database, so a record is made from a row with MediaRecord._make(row).
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, media):
+        """
+        from_dict makes a MediaRecord from a dict shaped like the ones as_dict returns, missing keys become None
+        """
+        medium = media.get('medium')
+        consumed_state = media.get('consumed_state')
+
+        return cls(media.get('id'),
+                   media.get('name'),
+                   medium_code_lookup.get(medium),
+                   consumed_state_code_lookup.get(consumed_state),
+                   media.get('description'),
+                   media.get('order'))
+
+    @property
+    def medium(self):
+        return medium_codes[self.medium_code] if self.medium_code is not None else None
+
+    @property
+    def consumed_state(self):
+        return consumed_state_codes[self.consumed_state_code] if self.consumed_state_code is not None else None
+
+    def as_dict(self, fields=None):
+        """
+        returns the same dict Media.as_dict returns for this media element
+        @param fields: an optional list of media_fields keys, if given only these keys are included in the dict
+        """
+        if fields is not None:
+            return {field: getattr(self, field) for field in media_fields if field in fields}
+
+        id, name, medium_code, consumed_state_code, description, order = self
+        return {
+            'id': id,
+            'name': name,
+            'medium': medium_codes[medium_code] if medium_code is not None else None,
+            'consumed_state': consumed_state_codes[consumed_state_code] if consumed_state_code is not None else None,
+            'description': description,
+            'order': order
+        }
+
+
+# On PostgreSQL media has a generated tsvector column that full text search in get_media uses, and a trigram index on
+# medianame that suggest_media_names uses. The tsvector column isn't mapped on the model since it is always computed by
+# the database. These are created here so tables made by create_all match the tables made by the alembic migrations.
+search_vector_ddl = db.DDL(
+    """
+    ALTER TABLE media ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(medianame, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED;
+    CREATE INDEX ix_media_search_vector ON media USING gin (search_vector);
+    """
+)
+db.event.listen(Media.__table__, 'after_create', search_vector_ddl.execute_if(dialect='postgresql'))
+medianame_trigram_ddl = db.DDL(
+    """
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX ix_media_medianame_trigram ON media USING gin (medianame gin_trgm_ops);
+    """
+)
+db.event.listen(Media.__table__, 'after_create', medianame_trigram_ddl.execute_if(dialect='postgresql'))
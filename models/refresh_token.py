@@ -0,0 +1,52 @@
+import datetime
+import hashlib
+
+from database import db
+
+
+class RefreshToken(db.Model):
+    """
+    RefreshToken is a stored refresh token. Only a hash of the token is kept, and each use of a refresh token replaces
+    it with a new one in the same family, so a refresh token that is used twice has been stolen, and its whole family
+    is revoked.
+    """
+    __tablename__ = 'refresh_tokens'
+    id = db.Column('id', db.Integer, primary_key=True)
+    user = db.Column('user', db.Integer, db.ForeignKey('users.id'), nullable=False)
+    family = db.Column('family', db.String(32), nullable=False, index=True)
+    token_hash = db.Column('token_hash', db.String(64), unique=True, nullable=False)
+    created_on = db.Column('created_on', db.DateTime, nullable=False)
+    expires_on = db.Column('expires_on', db.DateTime, nullable=False, index=True)
+    used_on = db.Column('used_on', db.DateTime)
+    revoked = db.Column('revoked', db.Boolean, nullable=False, default=False)
+
+    def __init__(self, userid, family, refresh_token, lifetime):
+        self.user = userid
+        self.family = family
+        self.token_hash = RefreshToken.hash_token(refresh_token)
+        self.created_on = datetime.datetime.now()
+        self.expires_on = self.created_on + lifetime
+        self.revoked = False
+
+    def __repr__(self):
+        return '<RefreshToken(id={}, user={}, family={}, expires_on={}, used_on={}, revoked={})>'.format(
+            self.id, self.user, self.family, self.expires_on, self.used_on, self.revoked)
+
+    @staticmethod
+    def hash_token(refresh_token):
+        """
+        hash_token returns the hash a refresh token is stored and looked up by
+        """
+        return hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def purge_expired():
+        """
+        purge_expired deletes the refresh tokens that have expired
+        @return: the number of refresh tokens deleted
+        """
+        count = RefreshToken.query.filter(RefreshToken.expires_on < datetime.datetime.now()) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+        return count
@@ -4,8 +4,12 @@ import bcrypt
 import jwt
 import datetime
 
+from auth_keys import get_keyring
 from models.blacklisted_token import BlacklistedToken
 
+# how long auth tokens lived before short lived access tokens, blacklisted tokens are kept this long
+legacy_auth_token_lifetime = datetime.timedelta(hours=5)
+
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -32,31 +36,37 @@ class User(db.Model):
 
     def encode_auth_token(self):
         """
-        get_auth_token generates a new auth token with this user's id
+        get_auth_token generates a new short lived access token with this user's id, signed by the app's keyring.
+        Access tokens can't be revoked, so they only live for AUTH_TOKEN_LIFETIME, and a refresh token is used to get
+        the next one.
         @return: a string representing the auth token to use
         """
         payload = {
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=5),
+            'exp': datetime.datetime.utcnow() + current_app.config['AUTH_TOKEN_LIFETIME'],
             'iat': datetime.datetime.utcnow(),
-            'sub': self.id
+            'sub': self.id,
+            'typ': 'access'
         }
-        return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256').decode('utf-8')
+        return get_keyring().sign(payload)
 
     @staticmethod
     def decode_auth_token(auth_token):
         """
-        decode_auth_token is a static method that takes some user's auth token, deocdes it, and returns the user's id
+        decode_auth_token is a static method that takes some user's auth token, deocdes it, and returns the user's id.
+        Access tokens are only checked by their signature. Tokens from before access tokens (without a 'typ') lived
+        for legacy_auth_token_lifetime, and are still checked against the blacklist until they expire.
         @param auth_token: a string representing the encrypted auth token made for some user
         @return: a number representing the user's id that was used when this auth token was encrypted, or a string
             representing an error message if auth token decoding failed.
         """
-        if BlacklistedToken.check_blacklist(auth_token):
-            return 'auth token blacklisted'
-
         try:
-            payload = jwt.decode(auth_token, current_app.config['SECRET_KEY'])
-            return payload['sub']
+            payload = get_keyring().verify(auth_token)
         except jwt.ExpiredSignatureError:
             return 'signature expired'
         except jwt.InvalidTokenError:
             return 'invalid token'
+
+        if payload.get('typ') != 'access' and BlacklistedToken.check_blacklist(auth_token):
+            return 'auth token blacklisted'
+
+        return payload['sub']
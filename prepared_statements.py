@@ -0,0 +1,67 @@
+import re
+
+from flask import current_app
+
+from database import db
+
+
+class PreparedStatement:
+    """
+    PreparedStatement is one of the hot queries that runs the same way thousands of times a second, prepared on the
+    PostgreSQL server with PREPARE the first time each connection runs it, and run with EXECUTE after that, so the
+    server doesn't parse and plan it again on every call. Prepared statements belong to a server connection, so they
+    only work when each app connection keeps its own server connection, which PgBouncer in transaction or statement
+    pooling mode doesn't do. They are only used when the PREPARED_STATEMENTS app setting is enabled.
+    """
+    def __init__(self, name, sql, parameters):
+        """
+        @param name: the name the statement is prepared as, unique across the app
+        @param sql: the query, with :name bind parameters
+        @param parameters: (name, postgres type) tuples of the bind parameters, in the order PREPARE numbers them
+        """
+        self.name = name
+        positional_sql = sql
+        for number, (parameter, parameter_type) in enumerate(parameters, start=1):
+            positional_sql = re.sub(r':{}\b'.format(parameter), '${}'.format(number), positional_sql)
+
+        self.prepare_sql = 'PREPARE {} ({}) AS {}'.format(
+            name, ', '.join(parameter_type for parameter, parameter_type in parameters), positional_sql)
+        self.execute_text = db.text('EXECUTE {} ({})'.format(
+            name, ', '.join(':' + parameter for parameter, parameter_type in parameters)))
+
+    def prepare(self, connection):
+        """
+        prepare prepares the statement on connection's server connection, unless it already has been
+        """
+        # Connection.info lives as long as the DBAPI connection, and is cleared when it is closed or invalidated
+        prepared = connection.info.setdefault('prepared_statements', set())
+        if self.name not in prepared:
+            connection.execute(self.prepare_sql)
+            prepared.add(self.name)
+
+    def execute(self, model, **params):
+        """
+        execute runs the statement on the session's connection for model's table, the replica or primary its query
+        would go to
+        @return: a result proxy of the rows
+        """
+        connection = db.session.connection(mapper=model.__mapper__)
+        self.prepare(connection)
+
+        return connection.execute(self.execute_text, **params)
+
+    def query(self, model, **params):
+        """
+        query runs the statement and loads its rows as instances of model, through the session like any other query
+        @return: a Query of model instances
+        """
+        self.prepare(db.session.connection(mapper=model.__mapper__))
+
+        return db.session.query(model).from_statement(self.execute_text).params(**params)
+
+
+def prepared_statements_enabled():
+    """
+    prepared_statements_enabled returns True if the hot queries should run as prepared statements
+    """
+    return current_app.config['PREPARED_STATEMENTS'] and db.engine.dialect.name == 'postgresql'
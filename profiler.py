@@ -0,0 +1,296 @@
+import atexit
+import collections
+import cProfile
+import glob
+import os
+import signal
+import sys
+import threading
+import time
+
+from flask import current_app, request, g
+
+from logic.login import admin_token_valid
+
+# the root of the repo, frames are named relative to it
+root_dir = os.path.dirname(os.path.abspath(__file__))
+views_dir = os.path.join(root_dir, 'views') + os.sep
+
+# seconds between samples, sampling every thread's stack takes tens of microseconds, so this costs about 1% of a core
+sample_interval = 0.005
+
+# the SIGPROF handler install_profile_signal last installed, and the (pid, directory) the process last registered in
+profile_signal_handler = None
+registered_worker = None
+
+
+def frame_key(frame):
+    """
+    frame_key returns a (function name, file, first line) tuple identifying the function a frame is running
+    """
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(root_dir + os.sep):
+        filename = os.path.relpath(filename, root_dir)
+
+    return code.co_name, filename, code.co_firstlineno
+
+
+def sample_stacks(seconds, interval=sample_interval, only_views=True):
+    """
+    sample_stacks samples the stacks of every other thread in the process every interval seconds, for the given number
+    of seconds, in the calling thread
+    @param only_views: if True only samples of threads running a request handler in views/ are kept
+    @return: a Counter mapping stacks, tuples of frame_keys from the outermost frame in, to the number of samples
+    """
+    counts = collections.Counter()
+    sampler_id = threading.get_ident()
+    end = time.monotonic() + seconds
+
+    while time.monotonic() < end:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == sampler_id:
+                continue
+
+            stack = []
+            in_views = False
+            while frame is not None:
+                in_views = in_views or frame.f_code.co_filename.startswith(views_dir)
+                stack.append(frame_key(frame))
+                frame = frame.f_back
+
+            if in_views or not only_views:
+                counts[tuple(reversed(stack))] += 1
+
+        time.sleep(interval)
+
+    return counts
+
+
+def frame_name(key):
+    name, filename, line = key
+    return '{} ({}:{})'.format(name, filename, line)
+
+
+def collapsed_stacks(counts):
+    """
+    collapsed_stacks formats sampled stacks in the collapsed format flamegraph.pl, speedscope and most flamegraph tools
+    read, one 'outer;inner;... count' line per stack
+    """
+    return ''.join('{} {}\n'.format(';'.join(frame_name(key) for key in stack), count)
+                   for stack, count in sorted(counts.items()))
+
+
+def speedscope_profile(counts, interval=sample_interval, name='gogomedia'):
+    """
+    speedscope_profile formats sampled stacks as a speedscope sampled profile, each stack weighted by the seconds its
+    samples stand for
+    @return: a dict to be sent as JSON
+    """
+    frames = []
+    frame_indexes = {}
+    samples = []
+    weights = []
+
+    for stack, count in sorted(counts.items()):
+        sample = []
+        for key in stack:
+            if key not in frame_indexes:
+                frame_indexes[key] = len(frames)
+                frames.append({'name': key[0], 'file': key[1], 'line': key[2]})
+            sample.append(frame_indexes[key])
+        samples.append(sample)
+        weights.append(count * interval)
+
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'gogomedia',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights
+        }]
+    }
+
+
+def profile_to_file(directory, seconds):
+    """
+    profile_to_file samples this process for the given number of seconds, and writes the collapsed stacks to
+    profile-<pid>-<time>.collapsed in directory
+    @return: the path of the file
+    """
+    counts = sample_stacks(seconds)
+    path = os.path.join(directory, 'profile-{}-{}.collapsed'.format(os.getpid(), int(time.time())))
+    with open(path, 'w') as profile_file:
+        profile_file.write(collapsed_stacks(counts))
+
+    return path
+
+
+def install_profile_signal(app):
+    """
+    install_profile_signal makes SIGPROF start profiling the process in a background thread for PROFILE_SECONDS
+    seconds, writing the collapsed stacks to PROFILE_DIR, so every worker can be profiled without a restart. It only
+    works in the main thread, so it is skipped when the app is made in another thread, and only when ADMIN_TOKEN is
+    set, since the admin endpoints that signal workers are off without it. The process registers itself in PROFILE_DIR,
+    since SIGPROF kills a process without the handler.
+    """
+    global profile_signal_handler
+    if not app.config['ADMIN_TOKEN']:
+        return
+
+    directory = app.config['PROFILE_DIR']
+    seconds = app.config['PROFILE_SECONDS']
+
+    def handle_signal(signal_number, frame):
+        threading.Thread(target=profile_to_file, args=(directory, seconds), daemon=True).start()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGPROF, handle_signal)
+        profile_signal_handler = handle_signal
+        register_profile_worker(directory)
+
+
+def worker_pid_file(directory, pid):
+    return os.path.join(directory, 'profile-worker-{}.pid'.format(pid))
+
+
+def register_profile_worker(directory):
+    """
+    register_profile_worker writes PROFILE_DIR/profile-worker-<pid>.pid, holding the process's command line, if the
+    process has the SIGPROF handler and hasn't registered yet. Workers forked from a process that made the app, like
+    gunicorn's with --preload, inherit the handler but have a new pid, so this also runs before each request. The file
+    is deleted when the process exits, and registered_worker_pids deletes the files of processes that were killed.
+    """
+    global registered_worker
+    if registered_worker == (os.getpid(), directory) or signal.getsignal(signal.SIGPROF) is not profile_signal_handler:
+        return
+
+    try:
+        cmdline = read_cmdline(os.getpid())
+    except IOError:
+        # no /proc, the pid file is only checked for a running process
+        cmdline = b''
+    try:
+        with open(worker_pid_file(directory, os.getpid()), 'wb') as pid_file:
+            pid_file.write(cmdline)
+    except IOError:
+        return
+
+    registered_worker = (os.getpid(), directory)
+    atexit.register(unregister_profile_worker, directory, os.getpid())
+
+
+def unregister_profile_worker(directory, pid):
+    """
+    unregister_profile_worker deletes the pid file register_profile_worker wrote, at exit. Forked workers inherit
+    their parent's exit handlers, so only the process that wrote the file deletes it.
+    """
+    if os.getpid() != pid:
+        return
+
+    try:
+        os.remove(worker_pid_file(directory, pid))
+    except OSError:
+        pass
+
+
+def registered_worker_pids(directory):
+    """
+    registered_worker_pids returns the pids of the running processes registered in directory by
+    register_profile_worker, whose command line is still the one they registered with, so a pid reused by another
+    process isn't counted. Pid files of processes that have exited are deleted.
+    """
+    pids = []
+    for path in glob.glob(os.path.join(directory, 'profile-worker-*.pid')):
+        try:
+            pid = int(os.path.basename(path)[len('profile-worker-'):-len('.pid')])
+            with open(path, 'rb') as pid_file:
+                cmdline = pid_file.read()
+        except (IOError, ValueError):
+            continue
+
+        if worker_running(pid, cmdline):
+            pids.append(pid)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    return sorted(pids)
+
+
+def worker_running(pid, cmdline):
+    try:
+        if cmdline:
+            return read_cmdline(pid) == cmdline
+        os.kill(pid, 0)
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def read_cmdline(pid):
+    with open('/proc/{}/cmdline'.format(pid), 'rb') as cmdline:
+        return cmdline.read()
+
+
+def sibling_worker_pids():
+    """
+    sibling_worker_pids returns the pids of this process and the other workers started by the same parent with the same
+    command line, like the workers of a gunicorn master, using /proc on Linux. Elsewhere only this process's pid is
+    returned.
+    """
+    parent = os.getppid()
+    try:
+        with open('/proc/{0}/task/{0}/children'.format(parent)) as children:
+            pids = [int(pid) for pid in children.read().split()]
+        own_cmdline = read_cmdline(os.getpid())
+        workers = []
+        for pid in pids:
+            try:
+                if read_cmdline(pid) == own_cmdline:
+                    workers.append(pid)
+            except IOError:
+                # the process has exited
+                pass
+    except (IOError, ValueError):
+        return [os.getpid()]
+
+    return workers if os.getpid() in workers else [os.getpid()]
+
+
+def start_request_profile():
+    """
+    start_request_profile runs before every request, and profiles the request with cProfile when PROFILE_REQUESTS is
+    enabled and the request has an 'X-Profile: cprofile' header and the admin token. It also registers a forked worker
+    for SIGPROF the first time it handles a request.
+    """
+    register_profile_worker(current_app.config['PROFILE_DIR'])
+    if current_app.config['PROFILE_REQUESTS'] and request.headers.get('X-Profile') == 'cprofile' and \
+            admin_token_valid():
+        g.request_profile = cProfile.Profile()
+        g.request_profile.enable()
+
+
+def finish_request_profile(response):
+    """
+    finish_request_profile runs after every request, and writes the profile of a profiled request to
+    PROFILE_DIR/request-<pid>-<time>.prof, whose name is returned in an X-Profile header. The file can be read with
+    pstats or snakeviz.
+    """
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        profile.disable()
+        filename = 'request-{}-{}.prof'.format(os.getpid(), int(time.time() * 1000))
+        profile.dump_stats(os.path.join(current_app.config['PROFILE_DIR'], filename))
+        response.headers['X-Profile'] = filename
+
+    return response
@@ -0,0 +1,32 @@
+from flask import request, jsonify, current_app
+
+# the endpoints that read their request body a piece at a time, which are allowed bodies up to
+# MEDIA_STREAM_MAX_CONTENT_LENGTH instead of MAX_CONTENT_LENGTH
+streaming_endpoints = {'media_import'}
+
+
+def check_content_length():
+    """
+    check_content_length runs before every request, and rejects request bodies larger than the app allows before any
+    of the body is read. Bodies sent without a Content-Length can't be checked up front, so they are refused.
+    @return: None if there is no issue, otherwise a JSON response with a detailed message on what was wrong
+    """
+    if request.content_length is None:
+        if 'chunked' in request.headers.get('Transfer-Encoding', ''):
+            return jsonify({
+                'success': False,
+                'message': 'request body must have a Content-Length'
+            }), 411
+        return None
+
+    if request.endpoint in streaming_endpoints or (request.endpoint == 'media' and request.method == 'PUT' and
+                                                   request.args.get('stream') == 'true'):
+        max_content_length = current_app.config['MEDIA_STREAM_MAX_CONTENT_LENGTH']
+    else:
+        max_content_length = current_app.config['MAX_CONTENT_LENGTH']
+
+    if max_content_length is not None and request.content_length > max_content_length:
+        return jsonify({
+            'success': False,
+            'message': 'request body must be at most {} bytes'.format(max_content_length)
+        }), 413
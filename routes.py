@@ -1,16 +1,32 @@
-from views.index import index
-from views.user import register, login, logout
-from views.media import media
+from views.index import index, jwks
+from views.user import register, login, refresh, logout
+from views.media import media, media_order, media_suggestions, media_stats, media_batch
+from views.media_transfer import media_import, media_export
+from views.job import job
+from views.admin import profile
 
 from models.user import User
 
 
 def add_routes(app):
     app.add_url_rule('/', 'index', index)
+    app.add_url_rule('/.well-known/jwks.json', 'jwks', jwks, methods=['GET'])
 
     app.add_url_rule('/register', 'register', register, methods=['POST'])
 
     app.add_url_rule('/login', 'login', login, methods=['POST'])
-    app.add_url_rule('/logout', 'logout', logout, methods=['GET'])
+    app.add_url_rule('/refresh', 'refresh', refresh, methods=['POST'])
+    app.add_url_rule('/logout', 'logout', logout, methods=['GET', 'POST'])
 
     app.add_url_rule('/user/<username>/media', 'media', media, methods=['PUT', 'GET', 'DELETE'])
+    app.add_url_rule('/user/<username>/media/order', 'media_order', media_order, methods=['PUT'])
+    app.add_url_rule('/user/<username>/media/batch', 'media_batch', media_batch, methods=['POST'])
+    app.add_url_rule('/user/<username>/media/suggestions', 'media_suggestions', media_suggestions,
+                     methods=['GET'])
+    app.add_url_rule('/user/<username>/media/stats', 'media_stats', media_stats, methods=['GET'])
+    app.add_url_rule('/user/<username>/media/import', 'media_import', media_import, methods=['POST'])
+    app.add_url_rule('/user/<username>/media/export', 'media_export', media_export, methods=['GET'])
+
+    app.add_url_rule('/user/<username>/jobs/<int:job_id>', 'job', job, methods=['GET'])
+
+    app.add_url_rule('/admin/profile', 'profile', profile, methods=['GET'])
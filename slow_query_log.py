@@ -0,0 +1,114 @@
+import datetime
+import json
+import logging
+import logging.handlers
+import random
+import threading
+import time
+
+from flask import current_app, request, has_app_context, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_logger_lock = threading.Lock()
+
+
+def get_slow_query_logger():
+    """
+    get_slow_query_logger returns the current app's slow query logger, which writes one JSON object per line to
+    SLOW_QUERY_LOG, rotating it when it reaches SLOW_QUERY_LOG_MAX_BYTES and keeping SLOW_QUERY_LOG_BACKUP_COUNT old
+    logs
+    """
+    if 'slow_query_logger' not in current_app.extensions:
+        with slow_query_logger_lock:
+            if 'slow_query_logger' not in current_app.extensions:
+                logger = logging.getLogger('slow_queries.{}'.format(id(current_app._get_current_object())))
+                logger.setLevel(logging.INFO)
+                # slow queries only go to their own log
+                logger.propagate = False
+                config = current_app.config
+                handler = logging.handlers.RotatingFileHandler(config['SLOW_QUERY_LOG'],
+                                                               maxBytes=config['SLOW_QUERY_LOG_MAX_BYTES'],
+                                                               backupCount=config['SLOW_QUERY_LOG_BACKUP_COUNT'])
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                current_app.extensions['slow_query_logger'] = logger
+
+    return current_app.extensions['slow_query_logger']
+
+
+def parameter_shapes(parameters):
+    """
+    parameter_shapes describes the bound parameters of a statement by their types, without their values, which can be
+    passwords or tokens
+    @return: a dict mapping parameter names to type names, or a list of type names for positional parameters
+    """
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+
+    return type(parameters).__name__
+
+
+def explain_analyze(connection, statement, parameters):
+    """
+    explain_analyze runs statement again with EXPLAIN (ANALYZE, BUFFERS) on the same DBAPI connection, inside a
+    savepoint so a failure doesn't abort the request's transaction
+    @return: the plan as text, or None if it couldn't be explained
+    """
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + statement, parameters)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+            return plan
+        except Exception:
+            cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return None
+    except Exception:
+        # savepoints need a transaction, which autocommit connections don't have
+        return None
+    finally:
+        cursor.close()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(connection, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def log_slow_query(connection, cursor, statement, parameters, context, executemany):
+    """
+    log_slow_query runs after every statement, and logs the statements that took at least SLOW_QUERY_THRESHOLD seconds
+    with their duration, the shapes of their parameters, and the Flask endpoint they ran for. A SLOW_QUERY_EXPLAIN_RATE
+    fraction of slow SELECTs on PostgreSQL are run again with EXPLAIN (ANALYZE, BUFFERS), and the plan is logged too.
+    Only SELECTs are explained since EXPLAIN ANALYZE really runs the statement.
+    """
+    if context is None or not has_app_context():
+        return
+
+    duration = time.perf_counter() - context.query_start_time
+    threshold = current_app.config.get('SLOW_QUERY_THRESHOLD')
+    if threshold is None or duration < threshold:
+        return
+
+    entry = {
+        'time': datetime.datetime.utcnow().isoformat() + 'Z',
+        'duration_ms': round(duration * 1000, 3),
+        'endpoint': request.endpoint if has_request_context() else None,
+        'statement': statement,
+        'parameters': parameter_shapes(parameters) if not executemany else 'executemany',
+        'database': connection.engine.url.database
+    }
+
+    if not executemany and connection.dialect.name == 'postgresql' and \
+            statement.lstrip()[:6].upper() == 'SELECT' and \
+            random.random() < current_app.config['SLOW_QUERY_EXPLAIN_RATE']:
+        entry['plan'] = explain_analyze(connection, statement, parameters)
+
+    get_slow_query_logger().info(json.dumps(entry))
@@ -0,0 +1,128 @@
+import configparser
+import datetime
+import os
+from unittest.mock import patch
+import jwt
+from base_test_case import GoGoMediaBaseTestCase
+from flask import current_app
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ec
+
+from database import db
+
+from models.user import User
+
+from app import create_app
+from auth_keys import Keyring, get_keyring
+
+
+def private_pem(private_key):
+    return private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                     serialization.NoEncryption()).decode('utf-8')
+
+
+def public_pem(private_key):
+    return private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                 serialization.PublicFormat.SubjectPublicKeyInfo).decode('utf-8')
+
+
+class GoGoMediaAuthKeysTestCase(GoGoMediaBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rsa_key = rsa.generate_private_key(65537, 2048, default_backend())
+        self.ec_key = ec.generate_private_key(ec.SECP256R1(), default_backend())
+
+    def test_sign_and_verify(self):
+        keyring = Keyring({'rsa1': private_pem(self.rsa_key), 'ec1': private_pem(self.ec_key)}, 'rsa1', 'secret')
+
+        auth_token = keyring.sign({'sub': 1})
+
+        self.assertEqual(jwt.get_unverified_header(auth_token)['alg'], 'RS256')
+        self.assertEqual(jwt.get_unverified_header(auth_token)['kid'], 'rsa1')
+        self.assertEqual(keyring.verify(auth_token), {'sub': 1})
+
+        keyring = Keyring({'ec1': private_pem(self.ec_key)}, 'ec1', 'secret')
+        auth_token = keyring.sign({'sub': 1})
+
+        self.assertEqual(jwt.get_unverified_header(auth_token)['alg'], 'ES256')
+        self.assertEqual(keyring.verify(auth_token), {'sub': 1})
+
+    def test_key_rotation(self):
+        old_keyring = Keyring({'rsa1': private_pem(self.rsa_key)}, 'rsa1', 'secret')
+        old_auth_token = old_keyring.sign({'sub': 1})
+
+        # the retired key only keeps its public half, to verify tokens it signed until they expire
+        keyring = Keyring({'rsa1': public_pem(self.rsa_key), 'ec1': private_pem(self.ec_key)}, 'ec1', 'secret')
+
+        self.assertEqual(keyring.verify(old_auth_token), {'sub': 1})
+        self.assertEqual(jwt.get_unverified_header(keyring.sign({'sub': 1}))['kid'], 'ec1')
+
+        with self.assertRaises(ValueError):
+            Keyring({'rsa1': public_pem(self.rsa_key)}, 'rsa1', 'secret')
+
+    def test_verify_rejects_unknown_and_mismatched_tokens(self):
+        keyring = Keyring({'rsa1': private_pem(self.rsa_key)}, 'rsa1', 'secret')
+
+        other_key = rsa.generate_private_key(65537, 2048, default_backend())
+        forged_token = jwt.encode({'sub': 1}, other_key, algorithm='RS256', headers={'kid': 'rsa1'}).decode('utf-8')
+        with self.assertRaises(jwt.InvalidTokenError):
+            keyring.verify(forged_token)
+
+        unknown_token = jwt.encode({'sub': 1}, 'secret', algorithm='HS256', headers={'kid': 'rsa2'}).decode('utf-8')
+        with self.assertRaises(jwt.InvalidTokenError):
+            keyring.verify(unknown_token)
+
+        # a token without a kid is an HS256 token, and isn't accepted once there is an active key
+        with self.assertRaisesRegex(jwt.InvalidTokenError, 'no longer accepted'):
+            keyring.verify(jwt.encode({'sub': 1}, 'secret').decode('utf-8'))
+
+    def test_hs256_accepted_while_migrating(self):
+        hs256_token = jwt.encode({'sub': 1}, 'secret').decode('utf-8')
+
+        self.assertEqual(Keyring({}, None, 'secret').verify(hs256_token), {'sub': 1})
+
+        now = datetime.datetime.utcnow()
+        keyring = Keyring({'rsa1': private_pem(self.rsa_key)}, 'rsa1', 'secret', now + datetime.timedelta(hours=1))
+
+        self.assertEqual(keyring.verify(hs256_token), {'sub': 1})
+        with self.assertRaises(jwt.InvalidTokenError):
+            keyring.verify(jwt.encode({'sub': 1}, 'other secret').decode('utf-8'))
+
+        keyring = Keyring({'rsa1': private_pem(self.rsa_key)}, 'rsa1', 'secret', now - datetime.timedelta(hours=1))
+
+        with self.assertRaises(jwt.InvalidTokenError):
+            keyring.verify(hs256_token)
+
+    def test_secret_key_required(self):
+        with patch.dict(os.environ, {'DATABASE_URL': 'sqlite://'}), patch.object(configparser.ConfigParser, 'read'):
+            os.environ.pop('SECRET_KEY', None)
+
+            with self.assertRaisesRegex(ValueError, 'SECRET_KEY must be set'):
+                create_app()
+            self.assertEqual(create_app(test=True).secret_key, 'test secret key')
+
+    def test_user_auth_token_with_keyring(self):
+        current_app.config['AUTH_KEYS'] = {'ec1': private_pem(self.ec_key)}
+        current_app.config['AUTH_KEY_ID'] = 'ec1'
+
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        auth_token = user.encode_auth_token()
+
+        self.assertEqual(jwt.get_unverified_header(auth_token)['kid'], 'ec1')
+        self.assertEqual(User.decode_auth_token(auth_token), user.id)
+        self.assertIs(get_keyring(), get_keyring())
+
+    def test_jwks(self):
+        current_app.config['AUTH_KEYS'] = {'rsa1': public_pem(self.rsa_key), 'ec1': private_pem(self.ec_key)}
+        current_app.config['AUTH_KEY_ID'] = 'ec1'
+
+        response = self.client.get('/.well-known/jwks.json')
+        keys = response.get_json()['keys']
+
+        self.assertEqual([(key['kid'], key['kty'], key['alg']) for key in keys],
+                         [('ec1', 'EC', 'ES256'), ('rsa1', 'RSA', 'RS256')])
+        self.assertFalse(any('d' in key for key in keys))
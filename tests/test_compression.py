@@ -0,0 +1,60 @@
+import gzip
+import json
+from base_test_case import GoGoMediaBaseTestCase
+from flask import current_app
+
+from database import db
+
+from models.user import User
+from models.media import Media
+
+from compression import get_compressed_body_cache
+
+
+class GoGoMediaCompressionTestCase(GoGoMediaBaseTestCase):
+    def add_media(self, count):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        db.session.add_all([Media('testmedianame{}'.format(n), user.id) for n in range(count)])
+        db.session.commit()
+
+    def test_gzip_response(self):
+        self.add_media(50)
+
+        response = self.client.get('/user/testname/media', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        body = json.loads(gzip.decompress(response.get_data()).decode('utf-8'))
+        self.assertEqual(len(body['data']), 50)
+        self.assertEqual(int(response.headers['Content-Length']), len(response.get_data()))
+
+    def test_small_response_not_compressed(self):
+        self.add_media(1)
+
+        response = self.client.get('/user/testname/media', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertTrue(json.loads(response.get_data(as_text=True))['success'])
+
+    def test_response_not_compressed_without_accept_encoding(self):
+        self.add_media(50)
+
+        response = self.client.get('/user/testname/media', headers={'Accept-Encoding': 'identity'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(len(json.loads(response.get_data(as_text=True))['data']), 50)
+
+    def test_compressed_body_cache(self):
+        self.add_media(50)
+
+        first_response = self.client.get('/user/testname/media', headers={'Accept-Encoding': 'gzip'})
+        second_response = self.client.get('/user/testname/media', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(first_response.get_data(), second_response.get_data())
+        self.assertEqual(len(get_compressed_body_cache().entries), 1)
+
+        current_app.config['COMPRESS_CACHE_SIZE'] = 0
+        self.assertIsNone(get_compressed_body_cache())
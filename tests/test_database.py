@@ -0,0 +1,104 @@
+import json
+from base_test_case import GoGoMediaBaseTestCase
+from flask import current_app
+
+import database
+from database import db
+
+from models.user import User
+from models.media import Media
+
+from logic.user import get_user
+
+
+class GoGoMediaDatabaseTestCase(GoGoMediaBaseTestCase):
+    """
+    These tests use a second in memory database as a stand-in replica. It doesn't replicate anything, so a read shows
+    which database it went to by what it finds.
+    """
+    def setUp(self):
+        super().setUp()
+        current_app.config['SQLALCHEMY_BINDS'] = {'replica_0': 'sqlite://'}
+        current_app.config['SQLALCHEMY_REPLICA_BIND_KEYS'] = ['replica_0']
+        self.replica = db.get_engine(current_app, bind='replica_0')
+        db.Model.metadata.create_all(self.replica)
+        database.last_writes.clear()
+
+    def add_to_replica(self, username):
+        self.replica.execute(User.__table__.insert().values(username=username, passhash=''))
+
+    def test_read_only_queries_go_to_replica(self):
+        db.session.add(User('testname', 'P@ssw0rd'))
+        db.session.commit()
+        db.session.remove()
+        self.add_to_replica('replicaname')
+
+        self.assertIsNotNone(get_user('replicaname'))
+        self.assertIsNone(get_user('testname'))
+        # other queries stay on the primary
+        self.assertEqual(User.query.one().username, 'testname')
+
+    def test_reads_after_write_go_to_primary(self):
+        self.add_to_replica('replicaname')
+
+        db.session.add(User('testname', 'P@ssw0rd'))
+        self.assertIsNotNone(get_user('testname'))
+
+        db.session.commit()
+        self.assertIsNotNone(get_user('testname'))
+        self.assertIsNone(get_user('replicaname'))
+
+    def test_consistency_token(self):
+        response = self.client.post('/register',
+                                    data=json.dumps({'username': 'testname', 'password': 'P@ssw0rd'}),
+                                    content_type='application/json')
+        consistency_token = response.headers['X-Consistency-Token']
+        db.session.remove()
+
+        # the new user isn't on the replica yet
+        response = self.client.get('/user/testname/media')
+
+        self.assertEqual(response.status_code, 422)
+        db.session.remove()
+
+        response = self.client.get('/user/testname/media', headers={'X-Consistency-Token': consistency_token})
+
+        self.assertEqual(response.status_code, 200)
+        db.session.remove()
+
+        current_app.config['CONSISTENCY_WINDOW'] = 0
+        response = self.client.get('/user/testname/media', headers={'X-Consistency-Token': consistency_token})
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_recent_writer_reads_from_primary(self):
+        db.session.add(User('testname', 'P@ssw0rd'))
+        db.session.commit()
+        db.session.remove()
+        self.add_to_replica('testname')
+
+        response = self.client.put('/user/testname/media',
+                                   data=json.dumps({'name': 'testmedianame'}),
+                                   content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Consistency-Token', response.headers)
+        db.session.remove()
+
+        # the PUT was recorded for testname, so the media list comes from the primary without sending the token
+        response = self.client.get('/user/testname/media')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual([media['name'] for media in body['data']], ['testmedianame'])
+        self.assertEqual(Media.query.count(), 1)
+
+    def test_old_writes_forgotten(self):
+        database.record_write('firstname', 100, 5)
+        database.record_write('secondname', 103, 5)
+        database.record_write('firstname', 104, 5)
+
+        self.assertEqual(list(database.last_writes.items()), [('secondname', 103), ('firstname', 104)])
+
+        database.record_write('thirdname', 108.5, 5)
+
+        self.assertEqual(list(database.last_writes.items()), [('firstname', 104), ('thirdname', 108.5)])
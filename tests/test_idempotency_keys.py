@@ -0,0 +1,155 @@
+import datetime
+import json
+from base_test_case import GoGoMediaBaseTestCase
+from flask import current_app
+
+from database import db
+
+from models.user import User
+from models.media import Media
+from models.idempotency_key import IdempotencyKey
+
+from views.idempotency import hash_request
+
+
+class GoGoMediaIdempotencyKeyTestCase(GoGoMediaBaseTestCase):
+    def setUp(self):
+        GoGoMediaBaseTestCase.setUp(self)
+        self.user = User('testname', 'P@ssw0rd')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def put_media(self, data, key='testkey'):
+        return self.client.put('/user/testname/media',
+                               data=json.dumps(data),
+                               content_type='application/json',
+                               headers={'Idempotency-Key': key})
+
+    def store_key(self, data, status_code=None, response=None, age=datetime.timedelta()):
+        with current_app.test_request_context('/user/testname/media', method='PUT', data=json.dumps(data),
+                                              content_type='application/json'):
+            stored = IdempotencyKey(self.user.id, 'testkey', hash_request())
+        stored.status_code = status_code
+        stored.response = response
+        stored.created_on -= age
+        db.session.add(stored)
+        db.session.commit()
+
+    def test_retried_put_replayed(self):
+        first = self.put_media({'name': 'testmedianame'})
+        retry = self.put_media({'name': 'testmedianame'})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', first.headers)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(retry.get_data(as_text=True)), json.loads(first.get_data(as_text=True)))
+        self.assertEqual(Media.query.count(), 1)
+
+    def test_keys_are_per_user(self):
+        other_user = User('othername', 'P@ssw0rd')
+        db.session.add(other_user)
+        db.session.commit()
+
+        self.put_media({'name': 'testmedianame'})
+        response = self.client.put('/user/othername/media',
+                                   data=json.dumps({'name': 'testmedianame'}),
+                                   content_type='application/json',
+                                   headers={'Idempotency-Key': 'testkey'})
+
+        self.assertNotIn('Idempotent-Replayed', response.headers)
+        self.assertEqual(Media.query.count(), 2)
+
+    def test_key_reused_for_different_request(self):
+        self.put_media({'name': 'testmedianame'})
+        response = self.put_media({'name': 'othermedianame'})
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(body['success'])
+        self.assertEqual(body['message'], 'Idempotency-Key was already used for a different request')
+        self.assertEqual(Media.query.count(), 1)
+
+    def test_key_in_progress(self):
+        self.store_key({'name': 'testmedianame'})
+
+        response = self.put_media({'name': 'testmedianame'})
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(body['success'])
+        self.assertEqual(body['message'], 'a request with this Idempotency-Key is still in progress')
+        self.assertEqual(Media.query.count(), 0)
+
+    def test_abandoned_key_not_run_again(self):
+        self.store_key({'name': 'testmedianame'}, age=current_app.config['IDEMPOTENCY_KEY_TIMEOUT'] * 2)
+
+        response = self.put_media({'name': 'testmedianame'})
+        body = json.loads(response.get_data(as_text=True))
+
+        # the request may have written before its worker stopped, so it isn't run a second time
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(body['message'],
+                         'a request with this Idempotency-Key didn\'t finish, and may have been applied')
+        self.assertEqual(Media.query.count(), 0)
+        self.assertIsNone(IdempotencyKey.query.one().status_code)
+
+    def test_expired_key_claimed_again(self):
+        self.store_key({'name': 'othermedianame'}, status_code=200, response='{}',
+                       age=current_app.config['IDEMPOTENCY_KEY_TTL'] * 2)
+
+        response = self.put_media({'name': 'testmedianame'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response.headers)
+        self.assertEqual(Media.query.count(), 1)
+
+    def test_validation_errors_replayed(self):
+        first = self.put_media({'name': 1})
+        retry = self.put_media({'name': 1})
+
+        self.assertEqual(first.status_code, 422)
+        self.assertEqual(retry.status_code, 422)
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+
+    def test_retried_delete_replayed(self):
+        media = Media('testmedianame', self.user.id)
+        db.session.add(media)
+        db.session.commit()
+
+        responses = [self.client.delete('/user/testname/media',
+                                        data=json.dumps({'id': media.id}),
+                                        content_type='application/json',
+                                        headers={'Idempotency-Key': 'testkey'}) for _ in range(2)]
+
+        self.assertEqual(responses[0].status_code, 200)
+        self.assertEqual(responses[1].status_code, 200)
+        self.assertEqual(responses[1].headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(Media.query.count(), 0)
+
+    def test_invalid_key(self):
+        response = self.put_media({'name': 'testmedianame'}, key='k' * 256)
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['message'], 'Idempotency-Key header must be 1 to 255 characters')
+        self.assertEqual(Media.query.count(), 0)
+
+    def test_no_key(self):
+        for _ in range(2):
+            response = self.client.put('/user/testname/media',
+                                       data=json.dumps({'name': 'testmedianame'}),
+                                       content_type='application/json')
+
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('Idempotent-Replayed', response.headers)
+
+        self.assertEqual(Media.query.count(), 2)
+        self.assertEqual(IdempotencyKey.query.count(), 0)
+
+    def test_purge_expired(self):
+        self.store_key({'name': 'testmedianame'}, status_code=200, response='{}',
+                       age=datetime.timedelta(days=2))
+
+        self.assertEqual(IdempotencyKey.purge_expired(datetime.timedelta(days=1)), 1)
+        self.assertEqual(IdempotencyKey.query.count(), 0)
@@ -0,0 +1,178 @@
+import datetime
+import io
+import json
+import time
+from unittest.mock import patch
+from base_test_case import GoGoMediaBaseTestCase
+
+from database import db
+
+from models.blacklisted_token import BlacklistedToken
+from models.job import Job, JobFile
+from models.media import Media
+from models.user import User
+
+from logic.job import enqueue_job, get_job, has_queued_job, claim_next_job, run_next_job, requeue_stale_jobs, \
+    iter_job_file_lines, get_job_checkpoint
+
+import views.media_transfer
+
+from worker import job_handlers
+
+
+class GoGoMediaJobLogicTestCase(GoGoMediaBaseTestCase):
+    def test_enqueue_job(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        job = enqueue_job(user.id, 'delete_media', {'ids': [1, 2]})
+
+        self.assertEqual(get_job(job.id), job)
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(json.loads(job.payload), {'ids': [1, 2]})
+        self.assertTrue(has_queued_job('delete_media'))
+        self.assertFalse(has_queued_job('purge_blacklist'))
+
+    def test_claim_next_job(self):
+        first_job = enqueue_job(None, 'purge_blacklist', {})
+        second_job = enqueue_job(None, 'purge_blacklist', {})
+
+        self.assertEqual(claim_next_job(), first_job)
+        self.assertEqual(first_job.status, 'running')
+        self.assertIsNotNone(first_job.started_on)
+        self.assertEqual(claim_next_job(), second_job)
+        self.assertIsNone(claim_next_job())
+
+    def test_run_next_job(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media = [Media('testmedianame{}'.format(i), user.id) for i in range(3)]
+        db.session.add_all(media)
+        db.session.commit()
+
+        job = enqueue_job(user.id, 'delete_media', {'ids': [media[0].id, media[2].id]})
+
+        self.assertEqual(run_next_job(job_handlers), job)
+        self.assertEqual(job.status, 'finished')
+        self.assertEqual(job.as_dict()['result'], {'deleted': 2})
+        self.assertEqual([m.medianame for m in Media.query.all()], ['testmedianame1'])
+        self.assertIsNone(run_next_job(job_handlers))
+
+    def test_run_failing_job(self):
+        job = enqueue_job(None, 'unknown_kind', {})
+
+        run_next_job(job_handlers)
+
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'KeyError: \'unknown_kind\'')
+        self.assertIsNotNone(job.finished_on)
+
+    def test_run_import_media_job(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        job = enqueue_job(user.id, 'import_media', {'format': 'csv'},
+                          stream=io.BytesIO(b'name,medium\ntestmedianame1,film\ntestmedianame2,tv\n'))
+        run_next_job(job_handlers)
+
+        self.assertEqual(job.status, 'finished')
+        self.assertEqual(job.as_dict()['result']['imported'], 1)
+        self.assertEqual(job.as_dict()['result']['error_count'], 1)
+
+    def test_import_media_job_carries_on_after_stopping(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        data = 'name,medium\n' + ''.join('testmedianame{},{}\n'.format(n, 'tv' if n == 3 else 'film') for n in range(7))
+        job = enqueue_job(user.id, 'import_media', {'format': 'csv'}, stream=io.BytesIO(data.encode('utf-8')))
+        payload = json.loads(job.payload)
+        add_media_rows = views.media_transfer.add_media_rows
+
+        def stop_on_third_batch(userid, rows, commit=True):
+            if rows[0]['name'] == 'testmedianame5':
+                raise SystemExit
+            return add_media_rows(userid, rows, commit)
+
+        # the worker stops while writing the third batch, after two were committed
+        with patch('views.media_transfer.transfer_batch_size', 2), \
+                patch('views.media_transfer.add_media_rows', stop_on_third_batch):
+            with self.assertRaises(SystemExit):
+                job_handlers['import_media'](user.id, payload)
+        db.session.rollback()
+
+        self.assertEqual(Media.query.count(), 4)
+        self.assertEqual(get_job_checkpoint(job.id)['row'], 5)
+
+        with patch('views.media_transfer.transfer_batch_size', 2):
+            report = job_handlers['import_media'](user.id, payload)
+
+        self.assertEqual(report['imported'], 6)
+        self.assertEqual(report['errors'], [{'row': 4, 'message': 'medium parameter must be \'film\', \'audio\', '
+                                                                  '\'literature\', or \'other\''}])
+        self.assertEqual(sorted(m.medianame for m in Media.query.all()),
+                         ['testmedianame{}'.format(n) for n in range(7) if n != 3])
+
+    def test_job_file(self):
+        data = b'first line\nsecond, longer line\n\nlast line without an ending'
+
+        with patch('logic.job.job_file_chunk_size', 7):
+            job = enqueue_job(None, 'import_media', {'format': 'csv'}, stream=io.BytesIO(data))
+
+        self.assertEqual(json.loads(job.payload), {'format': 'csv', 'file': job.id})
+        self.assertEqual(JobFile.query.filter_by(job=job.id).count(), 9)
+        self.assertEqual(list(iter_job_file_lines(job.id)),
+                         [b'first line\n', b'second, longer line\n', b'\n', b'last line without an ending'])
+        # lines longer than max_length come in pieces, without reading the whole line in
+        self.assertEqual(list(iter_job_file_lines(job.id, max_length=8)),
+                         [b'first li', b'ne\n', b'second, ', b'longer l', b'ine\n', b'\n', b'last lin', b'e withou',
+                          b't an end', b'ing'])
+
+    def test_requeue_stale_jobs(self):
+        timeout = datetime.timedelta(minutes=5)
+        jobs = [enqueue_job(None, 'purge_blacklist', {}) for _ in range(3)]
+        for job in jobs:
+            claim_next_job()
+        jobs[0].heartbeat_on -= timeout * 2
+        jobs[1].heartbeat_on -= timeout * 2
+        jobs[1].attempts = 3
+        db.session.commit()
+
+        self.assertEqual(requeue_stale_jobs(timeout, max_attempts=3), 2)
+
+        self.assertEqual(jobs[0].status, 'queued')
+        self.assertIsNone(jobs[0].started_on)
+        self.assertEqual(jobs[1].status, 'failed')
+        self.assertEqual(jobs[1].error, 'the worker running the job stopped 3 times')
+        # the live job is left running
+        self.assertEqual(jobs[2].status, 'running')
+
+        self.assertEqual(claim_next_job(), jobs[0])
+        self.assertEqual(jobs[0].attempts, 2)
+
+    def test_run_job_heartbeat(self):
+        job = enqueue_job(None, 'wait', {})
+        handlers = {'wait': lambda userid, payload: time.sleep(0.3)}
+
+        run_next_job(handlers, heartbeat_interval=0.05)
+
+        self.assertEqual(job.status, 'finished')
+        self.assertGreater(job.heartbeat_on, job.started_on)
+
+    def test_run_purge_blacklist_job(self):
+        old_token = BlacklistedToken('oldtoken')
+        old_token.blacklisted_on = datetime.datetime.now() - datetime.timedelta(hours=6)
+        db.session.add_all([old_token, BlacklistedToken('newtoken')])
+        db.session.commit()
+
+        job = enqueue_job(None, 'purge_blacklist', {})
+        run_next_job(job_handlers)
+
+        self.assertEqual(job.as_dict()['result'], {'purged': 1, 'refresh_tokens_purged': 0,
+                                                        'idempotency_keys_purged': 0})
+        self.assertEqual([token.token for token in BlacklistedToken.query.all()], ['newtoken'])
+        self.assertEqual(Job.query.count(), 1)
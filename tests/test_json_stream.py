@@ -0,0 +1,52 @@
+import io
+import json
+import unittest
+
+import views.json_stream
+from views.json_stream import parse_json_array_rows, ElementTooLargeError
+
+
+class GoGoMediaJsonStreamTestCase(unittest.TestCase):
+    def setUp(self):
+        # read a few bytes at a time so elements are split across reads
+        self.read_size = views.json_stream.read_size
+        views.json_stream.read_size = 3
+
+    def tearDown(self):
+        views.json_stream.read_size = self.read_size
+
+    def parse(self, text):
+        return list(parse_json_array_rows(io.BytesIO(text.encode('utf-8'))))
+
+    def test_parse_json_array(self):
+        elements = [{'name': 'testmedianameé', 'order': 123456}, 78910, 'text', [1, 2], {}]
+
+        self.assertEqual(self.parse(json.dumps(elements)), list(enumerate(elements)))
+        self.assertEqual(self.parse(' [ ] '), [])
+
+    def test_parse_malformed_json_array(self):
+        for text in ['', '{"name": "testmedianame"}', '[1 2]', '[1, 2']:
+            with self.assertRaises(ValueError):
+                self.parse(text)
+
+        rows = parse_json_array_rows(io.BytesIO(b'[{"name": "testmedianame"}, {"name": ]'))
+
+        self.assertEqual(next(rows), (0, {'name': 'testmedianame'}))
+        with self.assertRaisesRegex(ValueError, 'element 1'):
+            next(rows)
+
+    def test_parse_element_too_large(self):
+        views.json_stream.max_element_size = 16
+        try:
+            # a string that is never closed would otherwise be read to the end of the body
+            rows = parse_json_array_rows(io.BytesIO(b'[1, "' + b'x' * 1024))
+
+            self.assertEqual(next(rows), (0, 1))
+            with self.assertRaisesRegex(ElementTooLargeError, 'element 1 of the request body must be at most 16'):
+                next(rows)
+
+            self.assertEqual(self.parse('["{}"]'.format('x' * 14)), [(0, 'x' * 14)])
+            with self.assertRaises(ElementTooLargeError):
+                self.parse('["{}"]'.format('x' * 32))
+        finally:
+            views.json_stream.max_element_size = 1024 * 1024
@@ -128,11 +128,13 @@ class GoGoMediaLoginRequiredTestCase(GoGoMediaBaseTestCase):
         db.session.add(user)
         db.session.commit()
 
-        response = self.client.post('/login',
-                                    data=json.dumps({'username': 'testname', 'password': 'P@ssw0rd'}),
-                                    content_type='application/json')
-        body = json.loads(response.get_data(as_text=True))
-        auth_token = body['auth_token']
+        # tokens from before short lived access tokens, without a 'typ', are still checked against the blacklist
+        payload = {
+            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=5),
+            'iat': datetime.datetime.utcnow(),
+            'sub': user.id
+        }
+        auth_token = jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256').decode('utf-8')
 
         blacklisted_token = BlacklistedToken(auth_token)
         db.session.add(blacklisted_token)
@@ -199,3 +201,31 @@ class GoGoMediaLoginRequiredTestCase(GoGoMediaBaseTestCase):
         self.assertEqual(response.status_code, 401)
         self.assertFalse(body['success'])
         self.assertEqual(body['message'], 'signature expired')
+
+    def test_login_access_token_skips_blacklist(self):
+        """
+        This test applies to all the media functions that use the /user/<username>/media endpoint
+        """
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.post('/login',
+                                    data=json.dumps({'username': 'testname', 'password': 'P@ssw0rd'}),
+                                    content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+        auth_token = body['auth_token']
+
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        db.event.listen(db.engine, 'before_cursor_execute', record_statement)
+        try:
+            response = self.client.get('/user/testname/media', headers={'Authorization': 'JWT ' + auth_token})
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', record_statement)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('blacklisted_tokens' in statement for statement in statements))
@@ -0,0 +1,182 @@
+import json
+from base_test_case import GoGoMediaBaseTestCase
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+
+from models.user import User
+from models.media import Media
+
+
+class GoGoMediaMediaBatchViewsTestCase(GoGoMediaBaseTestCase):
+    def setUp(self):
+        GoGoMediaBaseTestCase.setUp(self)
+        self.user = User('testname', 'P@ssw0rd')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def add_media(self, count):
+        media_list = [Media('testmedianame{}'.format(n), self.user.id, order=n) for n in range(count)]
+        db.session.add_all(media_list)
+        db.session.commit()
+
+        return [media.id for media in media_list]
+
+    def post_batch(self, operations, username='testname'):
+        return self.client.post('/user/{}/media/batch'.format(username),
+                                data=json.dumps({'operations': operations}),
+                                content_type='application/json')
+
+    def test_batch(self):
+        ids = self.add_media(4)
+
+        response = self.post_batch([
+            {'op': 'create', 'name': 'newmedianame', 'medium': 'film'},
+            {'op': 'update', 'id': ids[0], 'consumed_state': 'finished'},
+            {'op': 'delete', 'id': ids[1]},
+            {'op': 'move', 'id': ids[3], 'position': 0}
+        ])
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+        self.assertEqual(body['message'], 'successfully applied media operations')
+        self.assertEqual([result['op'] for result in body['data']], ['create', 'update', 'delete', 'move'])
+        self.assertEqual(body['data'][0]['data']['name'], 'newmedianame')
+        self.assertEqual(body['data'][0]['data']['medium'], 'film')
+        self.assertEqual(body['data'][1]['data']['consumed_state'], 'finished')
+        self.assertEqual(body['data'][2]['data'], {'id': ids[1]})
+        self.assertEqual(body['data'][3]['data'], {'id': ids[3], 'order': 0})
+
+        db.session.remove()
+        self.assertEqual(Media.query.filter_by(medianame='newmedianame').count(), 1)
+        self.assertEqual(Media.query.filter_by(id=ids[0]).first().consumed_state, 'finished')
+        self.assertIsNone(Media.query.filter_by(id=ids[1]).first())
+        self.assertEqual([media.id for media in Media.query.filter(Media.id.in_(ids)).order_by(Media.order)],
+                         [ids[3], ids[0], ids[2]])
+
+    def test_batch_update_after_move_sees_new_order(self):
+        ids = self.add_media(3)
+
+        response = self.post_batch([
+            {'op': 'move', 'id': ids[2], 'position': 0},
+            {'op': 'update', 'id': ids[0], 'name': 'renamed'}
+        ])
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['data'][1]['data']['order'], 1)
+
+    def test_batch_ownership_checked_with_one_query(self):
+        ids = self.add_media(3)
+        db.session.remove()
+
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        db.event.listen(db.engine, 'before_cursor_execute', record_statement)
+        try:
+            response = self.post_batch([{'op': 'update', 'id': id, 'medium': 'film'} for id in ids])
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', record_statement)
+
+        self.assertEqual(response.status_code, 200)
+        # the user, then the media being updated in one query, then one UPDATE per operation
+        self.assertEqual([statement.split()[0] for statement in statements],
+                         ['SELECT', 'SELECT', 'UPDATE', 'UPDATE', 'UPDATE'])
+
+    def test_batch_media_of_another_user(self):
+        other_user = User('othername', 'P@ssw0rd')
+        db.session.add(other_user)
+        db.session.commit()
+        other_media = Media('othermedianame', other_user.id)
+        db.session.add(other_media)
+        db.session.commit()
+        other_media_id = other_media.id
+
+        response = self.post_batch([
+            {'op': 'create', 'name': 'newmedianame'},
+            {'op': 'delete', 'id': other_media_id}
+        ])
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(body['message'], 'logged in user doesn\'t have media with given id')
+        self.assertEqual(Media.query.count(), 1)
+
+    def test_batch_invalid_operations(self):
+        ids = self.add_media(1)
+
+        response = self.post_batch([
+            {'op': 'create', 'name': 'newmedianame'},
+            {'op': 'rename', 'id': ids[0]},
+            {'op': 'create', 'id': ids[0], 'name': 'newmedianame'},
+            {'op': 'update', 'name': 1},
+            {'op': 'move', 'id': ids[0]},
+            {'op': 'delete', 'id': ids[0]},
+            {'op': 'update', 'id': ids[0], 'medium': 'painting'},
+            'delete',
+            {'op': 'move', 'id': ids[0], 'position': -1}
+        ])
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(body['success'])
+        self.assertEqual(body['message'], 'op parameter must be \'create\', \'update\', \'delete\', or \'move\'')
+        self.assertEqual(body['errors'], [
+            {'index': 1, 'messages': ['op parameter must be \'create\', \'update\', \'delete\', or \'move\'']},
+            {'index': 2, 'messages': ['create operation must not have an id parameter']},
+            {'index': 3, 'messages': ['missing parameter \'id\'']},
+            {'index': 4, 'messages': ['position parameter must be type integer']},
+            {'index': 6, 'messages': ['medium parameter must be \'film\', \'audio\', \'literature\', or \'other\'',
+                                      'media element was deleted by an earlier operation']},
+            {'index': 7, 'messages': ['operation must be a JSON object']},
+            {'index': 8, 'messages': ['position parameter must not be negative',
+                                      'media element was deleted by an earlier operation']}
+        ])
+        self.assertEqual(Media.query.count(), 1)
+
+    def test_batch_invalid_body(self):
+        for body, message in [({}, 'missing parameter \'operations\''),
+                              ({'operations': []}, 'operations parameter must be an array of 1 to 1000 operations'),
+                              ({'operations': {'op': 'create'}},
+                               'operations parameter must be an array of 1 to 1000 operations')]:
+            response = self.client.post('/user/testname/media/batch',
+                                        data=json.dumps(body),
+                                        content_type='application/json')
+
+            self.assertEqual(response.status_code, 422)
+            self.assertEqual(json.loads(response.get_data(as_text=True))['message'], message)
+
+    def test_batch_nonexistent_user(self):
+        response = self.post_batch([{'op': 'create', 'name': 'newmedianame'}], username='othername')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(json.loads(response.get_data(as_text=True))['message'], 'user doesn\'t exist')
+
+    def test_batch_rolled_back_on_error(self):
+        db.session.execute('CREATE UNIQUE INDEX uq_media_user_medianame ON media ("user", medianame)')
+        db.session.commit()
+
+        with self.assertRaises(IntegrityError):
+            self.post_batch([
+                {'op': 'create', 'name': 'newmedianame'},
+                {'op': 'create', 'name': 'newmedianame'}
+            ])
+        db.session.remove()
+
+        self.assertEqual(Media.query.count(), 0)
+
+    def test_batch_idempotency_key(self):
+        operations = [{'op': 'create', 'name': 'newmedianame'}]
+
+        responses = [self.client.post('/user/testname/media/batch',
+                                      data=json.dumps({'operations': operations}),
+                                      content_type='application/json',
+                                      headers={'Idempotency-Key': 'testkey'}) for _ in range(2)]
+
+        self.assertEqual(responses[1].status_code, 200)
+        self.assertEqual(responses[1].headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(Media.query.count(), 1)
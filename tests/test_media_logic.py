@@ -1,11 +1,17 @@
+import json
 from base_test_case import GoGoMediaBaseTestCase
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
 
 from database import db
 
 from models.user import User
 from models.media import Media
 
-from logic.media import add_media, update_media, remove_media, get_media, get_media_by_id
+from logic.media import add_media, add_media_rows, iter_media_records, update_media, upsert_media, remove_media, \
+    get_media, get_media_by_id, move_media, reorder_media, suggest_media_names, get_media_stats, get_media_dicts, \
+    get_media_records, get_media_json, commit_media, upsert_media_rows
 
 
 class GoGoMediaMediaLogicTestCase(GoGoMediaBaseTestCase):
@@ -201,6 +207,31 @@ class GoGoMediaMediaLogicTestCase(GoGoMediaBaseTestCase):
         self.assertEqual(media.description, 'some description')
         self.assertEqual(media.order, 12345)
 
+    def test_write_media_without_commit(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+        userid = user.id
+        kept = add_media(userid, 'keptmedianame')
+
+        media = add_media(userid, 'testmedianame', commit=False)
+        update_media(kept.id, medianame='renamed', userid=userid, commit=False)
+        move_media(userid, media.id, 1, commit=False)
+
+        # the writes were flushed, so they can be read in the same transaction
+        self.assertIsNotNone(media.id)
+        self.assertEqual(Media.query.filter_by(id=media.id).first().order, 1)
+
+        db.session.rollback()
+
+        self.assertEqual([media.medianame for media in Media.query.all()], ['keptmedianame'])
+
+        remove_media(kept.id, userid, commit=False)
+        commit_media(userid)
+        db.session.remove()
+
+        self.assertEqual(Media.query.count(), 0)
+
     def test_remove_media(self):
         user = User('testname', 'P@ssw0rd')
         db.session.add(user)
@@ -216,6 +247,25 @@ class GoGoMediaMediaLogicTestCase(GoGoMediaBaseTestCase):
 
         self.assertFalse(media in db.session)
 
+    def test_remove_media_of_other_user(self):
+        user = User('testname', 'P@ssw0rd')
+        other_user = User('othername', 'P@ssw0rd')
+        db.session.add_all([user, other_user])
+        db.session.commit()
+
+        media = Media('testmedianame', other_user.id)
+        db.session.add(media)
+        db.session.commit()
+        media_id = media.id
+
+        remove_media(media_id, user.id)
+
+        self.assertIsNotNone(Media.query.filter_by(id=media_id).first())
+
+        remove_media(media_id, other_user.id)
+
+        self.assertIsNone(Media.query.filter_by(id=media_id).first())
+
     def test_get_media(self):
         user = User('testname', 'P@ssw0rd')
         db.session.add(user)
@@ -367,3 +417,427 @@ class GoGoMediaMediaLogicTestCase(GoGoMediaBaseTestCase):
         self.assertEqual(returned_media, media)
         self.assertEqual(returned_media.id, media.id)
         self.assertEqual(returned_media.medianame, media.medianame)
+
+    def test_get_media_by_id_and_user(self):
+        user = User('testname', 'P@ssw0rd')
+        other_user = User('othername', 'P@ssw0rd')
+        db.session.add_all([user, other_user])
+        db.session.commit()
+
+        media = Media('testmedianame', user.id)
+        db.session.add(media)
+        db.session.commit()
+
+        self.assertEqual(get_media_by_id(media.id, user.id), media)
+        self.assertIsNone(get_media_by_id(media.id, other_user.id))
+
+    def test_move_media_down_the_list(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        for order in range(5):
+            db.session.add(Media('testmedianame{}'.format(order), user.id, order=order))
+        db.session.commit()
+
+        count = move_media(user.id, 1, 3)
+
+        self.assertEqual(count, 4)
+        orders = {media.medianame: media.order for media in Media.query.all()}
+        self.assertEqual(orders, {
+            'testmedianame0': 3,
+            'testmedianame1': 0,
+            'testmedianame2': 1,
+            'testmedianame3': 2,
+            'testmedianame4': 4
+        })
+
+    def test_move_media_up_the_list(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        for order in range(5):
+            db.session.add(Media('testmedianame{}'.format(order), user.id, order=order))
+        db.session.commit()
+
+        count = move_media(user.id, 5, 1)
+
+        self.assertEqual(count, 4)
+        orders = {media.medianame: media.order for media in Media.query.all()}
+        self.assertEqual(orders, {
+            'testmedianame0': 0,
+            'testmedianame1': 2,
+            'testmedianame2': 3,
+            'testmedianame3': 4,
+            'testmedianame4': 1
+        })
+
+    def test_move_media_leaves_other_users_media(self):
+        user1 = User('testname1', 'P@ssw0rd')
+        user2 = User('testname2', 'P@ssw0rd')
+        db.session.add(user1)
+        db.session.add(user2)
+        db.session.commit()
+
+        media1 = Media('testmedianame1', user1.id, order=0)
+        media2 = Media('testmedianame2', user1.id, order=1)
+        media3 = Media('testmedianame3', user2.id, order=0)
+        db.session.add(media1)
+        db.session.add(media2)
+        db.session.add(media3)
+        db.session.commit()
+
+        move_media(user1.id, media2.id, 0)
+
+        self.assertEqual(media1.order, 1)
+        self.assertEqual(media2.order, 0)
+        self.assertEqual(media3.order, 0)
+
+    def test_reorder_media(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        for order in range(3):
+            db.session.add(Media('testmedianame{}'.format(order), user.id))
+        db.session.commit()
+
+        count = reorder_media(user.id, [3, 1, 2])
+
+        self.assertEqual(count, 3)
+        self.assertEqual([media.id for media in Media.query.order_by(Media.order).all()], [3, 1, 2])
+        self.assertEqual(reorder_media(user.id, []), 0)
+
+    def test_get_media_with_search_query(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media1 = Media('The Matrix', user.id, medium='film')
+        media2 = Media('Dune', user.id, medium='literature', description='the first matrix of the desert planet')
+        media3 = Media('Blade Runner', user.id, medium='film')
+        db.session.add(media1)
+        db.session.add(media2)
+        db.session.add(media3)
+        db.session.commit()
+
+        # media with the search term in the name come before media with it in the description
+        self.assertListEqual(get_media('testname', q='matrix'), [media1, media2])
+        self.assertListEqual(get_media('testname', q='MATRIX first'), [media2])
+        self.assertListEqual(get_media('testname', q='blade, runner!'), [media3])
+        self.assertListEqual(get_media('testname', medium='film', q='matrix'), [media1])
+        self.assertListEqual(get_media('testname', q='nothing'), [])
+        # a search string without any words doesn't filter anything
+        self.assertEqual(len(get_media('testname', q='  %_ ')), 3)
+
+    def test_suggest_media_names(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media1 = Media('Star Wars', user.id)
+        media2 = Media('Lone Star', user.id)
+        media3 = Media('Stargate', user.id)
+        media4 = Media('100% Wolf', user.id)
+        db.session.add(media1)
+        db.session.add(media2)
+        db.session.add(media3)
+        db.session.add(media4)
+        db.session.commit()
+
+        # names starting with the query come first
+        self.assertListEqual(suggest_media_names(user.id, 'star'), [
+            (media1.id, 'Star Wars'),
+            (media3.id, 'Stargate'),
+            (media2.id, 'Lone Star')
+        ])
+        self.assertListEqual(suggest_media_names(user.id, 'star', limit=1), [(media1.id, 'Star Wars')])
+        self.assertListEqual(suggest_media_names(user.id, '100%'), [(media4.id, '100% Wolf')])
+        self.assertListEqual(suggest_media_names(user.id, '_'), [])
+
+    def test_get_media_stats(self):
+        user1 = User('testname1', 'P@ssw0rd')
+        user2 = User('testname2', 'P@ssw0rd')
+        db.session.add(user1)
+        db.session.add(user2)
+        db.session.commit()
+
+        db.session.add(Media('testmedianame1', user1.id, medium='film', consumed_state='finished'))
+        db.session.add(Media('testmedianame2', user1.id, medium='film', consumed_state='finished'))
+        db.session.add(Media('testmedianame3', user1.id, medium='film'))
+        db.session.add(Media('testmedianame4', user1.id, consumed_state='started'))
+        db.session.add(Media('testmedianame5', user2.id, medium='audio'))
+        db.session.commit()
+
+        stats = get_media_stats(user1.id)
+
+        self.assertEqual(stats['film'], {'not started': 1, 'started': 0, 'finished': 2})
+        self.assertEqual(stats['other'], {'not started': 0, 'started': 1, 'finished': 0})
+        self.assertEqual(stats['audio'], {'not started': 0, 'started': 0, 'finished': 0})
+        self.assertEqual(stats['literature'], {'not started': 0, 'started': 0, 'finished': 0})
+
+    def test_get_media_with_fields(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        db.session.add(Media('testmedianame', user.id, description='some description'))
+        db.session.commit()
+        db.session.expunge_all()
+
+        media_list = get_media('testname', fields=['name'])
+
+        self.assertEqual(len(media_list), 1)
+        self.assertNotIn('medianame', inspect(media_list[0]).unloaded)
+        self.assertTrue({'medium', 'consumed_state', 'description', 'order'} <= inspect(media_list[0]).unloaded)
+        self.assertDictEqual(media_list[0].as_dict(['name']), {'name': 'testmedianame'})
+
+    def test_get_media_dicts_matches_get_media(self):
+        user1 = User('testname1', 'P@ssw0rd')
+        user2 = User('testname2', 'P@ssw0rd')
+        db.session.add(user1)
+        db.session.add(user2)
+        db.session.commit()
+
+        db.session.add(Media('testmedianame1', user1.id, medium='film', consumed_state='started', order=2))
+        db.session.add(Media('testmedianame2', user1.id, description='some description', order=1))
+        db.session.add(Media('testmedianame3', user1.id, medium='film', order=3))
+        db.session.add(Media('testmedianame4', user2.id, medium='film'))
+        db.session.commit()
+
+        for arguments in [{},
+                          {'medium': 'film'},
+                          {'consumed_state': 'started'},
+                          {'q': 'description'},
+                          {'fields': ['name', 'order']},
+                          {'medium': 'film', 'fields': ['id']}]:
+            self.assertListEqual(get_media_dicts('testname1', **arguments),
+                                 [media.as_dict(arguments.get('fields'))
+                                  for media in get_media('testname1', **arguments)])
+
+        self.assertListEqual([media['name'] for media in get_media_dicts('testname1')],
+                             ['testmedianame2', 'testmedianame1', 'testmedianame3'])
+        self.assertListEqual(get_media_dicts('nonexistentname'), [])
+
+    def test_get_media_records(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media = Media('testmedianame', user.id, medium='audio', consumed_state='started', order=4)
+        db.session.add(media)
+        db.session.commit()
+
+        records = get_media_records('testname')
+
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].id, media.id)
+        self.assertEqual(records[0].name, 'testmedianame')
+        self.assertEqual(records[0].medium, 'audio')
+        self.assertEqual(records[0].consumed_state, 'started')
+        self.assertEqual(records[0].as_dict(), media.as_dict())
+
+        records = get_media_records('testname', fields=['name'])
+
+        self.assertEqual(records[0].name, 'testmedianame')
+        self.assertIsNone(records[0].id)
+        self.assertIsNone(records[0].medium_code)
+
+    def test_get_media_json_matches_get_media_dicts(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        db.session.add(Media('testmedianame1', user.id, medium='film', order=2))
+        db.session.add(Media('testmedianame2', user.id, description='a "quoted" description', order=1))
+        db.session.add(Media('testmedianame3', user.id, consumed_state='finished', order=3))
+        db.session.commit()
+
+        for arguments in [{},
+                          {'medium': 'film'},
+                          {'consumed_state': 'finished'},
+                          {'q': 'quoted'},
+                          {'fields': ['name', 'order']}]:
+            self.assertListEqual(json.loads(get_media_json('testname', **arguments)),
+                                 get_media_dicts('testname', **arguments))
+
+        self.assertEqual(json.loads(get_media_json('nonexistentname')), [])
+
+    def test_upsert_media(self):
+        db.session.execute('CREATE UNIQUE INDEX uq_media_user_medianame ON media ("user", medianame)')
+
+        user1 = User('testname1', 'P@ssw0rd')
+        user2 = User('testname2', 'P@ssw0rd')
+        db.session.add(user1)
+        db.session.add(user2)
+        db.session.commit()
+
+        inserted = upsert_media(user1.id, 'testmedianame', medium='film', description='some description')
+
+        self.assertDictEqual(inserted.as_dict(), {
+            'id': 1,
+            'name': 'testmedianame',
+            'medium': 'film',
+            'consumed_state': 'not started',
+            'description': 'some description',
+            'order': 0
+        })
+
+        updated = upsert_media(user1.id, 'testmedianame', consumed_state='finished', order=3)
+
+        self.assertDictEqual(updated.as_dict(), {
+            'id': 1,
+            'name': 'testmedianame',
+            'medium': 'film',
+            'consumed_state': 'finished',
+            'description': 'some description',
+            'order': 3
+        })
+        self.assertEqual(upsert_media(user1.id, 'testmedianame'), updated)
+
+        other_user_media = upsert_media(user2.id, 'testmedianame')
+
+        self.assertEqual(other_user_media.id, 2)
+        self.assertEqual(Media.query.count(), 2)
+
+    def test_upsert_media_rows(self):
+        db.session.execute('CREATE UNIQUE INDEX uq_media_user_medianame ON media ("user", medianame)')
+
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+        userid = user.id
+        upsert_media(userid, 'existingmedianame', medium='film', order=5)
+
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        db.event.listen(db.engine, 'before_cursor_execute', record_statement)
+        try:
+            records = upsert_media_rows(userid, [
+                {'name': 'existingmedianame', 'consumed_state': 'started'},
+                {'name': 'testmedianame', 'consumed_state': 'started'},
+                {'name': 'testmedianame', 'consumed_state': 'finished'}
+            ])
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', record_statement)
+
+        # the elements give the same fields, so they are upserted with one statement, after merging the duplicate
+        self.assertEqual([statement.split()[0] for statement in statements], ['INSERT'])
+        self.assertEqual(sorted(records), ['existingmedianame', 'testmedianame'])
+        self.assertEqual(records['existingmedianame'].as_dict(), {
+            'id': 1,
+            'name': 'existingmedianame',
+            'medium': 'film',
+            'consumed_state': 'started',
+            'description': '',
+            'order': 5
+        })
+        self.assertEqual(records['testmedianame'].consumed_state, 'finished')
+        self.assertEqual(Media.query.count(), 2)
+
+    def test_upsert_media_rows_merges_fields_in_order(self):
+        db.session.execute('CREATE UNIQUE INDEX uq_media_user_medianame ON media ("user", medianame)')
+
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        records = upsert_media_rows(user.id, [
+            {'name': 'testmedianame', 'medium': 'film', 'order': 1},
+            {'name': 'othermedianame'},
+            {'name': 'testmedianame', 'order': 2}
+        ])
+
+        self.assertEqual(records['testmedianame'].medium, 'film')
+        self.assertEqual(records['testmedianame'].order, 2)
+        self.assertEqual(records['othermedianame'].medium, 'other')
+
+    def test_upsert_media_invalid_values(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        with self.assertRaises(ValueError):
+            upsert_media(user.id, 'testmedianame', medium='tv')
+        with self.assertRaises(ValueError):
+            upsert_media(user.id, 'testmedianame', consumed_state='done')
+
+    def test_add_media_rows(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        count = add_media_rows(user.id, [
+            {'name': 'testmedianame1'},
+            {'name': 'testmedianame2', 'medium': 'film', 'consumed_state': 'finished', 'description': 'd', 'order': 4}
+        ])
+
+        self.assertEqual(count, 2)
+        self.assertListEqual([media.as_dict() for media in get_media('testname')], [
+            {
+                'id': 1,
+                'name': 'testmedianame1',
+                'medium': 'other',
+                'consumed_state': 'not started',
+                'description': '',
+                'order': 0
+            },
+            {
+                'id': 2,
+                'name': 'testmedianame2',
+                'medium': 'film',
+                'consumed_state': 'finished',
+                'description': 'd',
+                'order': 4
+            }
+        ])
+        self.assertEqual(add_media_rows(user.id, []), 0)
+
+    def test_add_media_rows_upserts_taken_names(self):
+        current_app.config['MEDIA_UPSERT_NATURAL_KEY'] = True
+        db.session.execute('CREATE UNIQUE INDEX uq_media_user_medianame ON media ("user", medianame)')
+
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        add_media(user.id, 'testmedianame1', medium='film')
+        add_media_rows(user.id, [{'name': 'testmedianame1', 'order': 2}, {'name': 'testmedianame2'}])
+
+        media_list = get_media('testname')
+
+        self.assertEqual(len(media_list), 2)
+        self.assertEqual(media_list[1].medianame, 'testmedianame1')
+        self.assertEqual(media_list[1].medium, 'film')
+        self.assertEqual(media_list[1].order, 2)
+
+    def test_add_media_rows_raises_integrity_error_without_natural_key(self):
+        db.session.execute('CREATE UNIQUE INDEX uq_media_user_medianame ON media ("user", medianame)')
+
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+        userid = user.id
+
+        add_media(userid, 'testmedianame1')
+        with self.assertRaises(IntegrityError):
+            add_media_rows(userid, [{'name': 'testmedianame1'}, {'name': 'testmedianame2'}])
+
+        self.assertEqual(Media.query.count(), 1)
+
+    def test_iter_media_records(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        for order in range(5):
+            db.session.add(Media('testmedianame{}'.format(order), user.id, order=4 - order))
+        db.session.commit()
+
+        records = list(iter_media_records(user.id, batch_size=2))
+
+        self.assertListEqual([record.as_dict() for record in records], get_media_dicts('testname'))
@@ -4,7 +4,7 @@ from sqlalchemy.exc import StatementError
 from database import db
 
 from models.user import User
-from models.media import Media, mediums, consumed_states
+from models.media import Media, MediaRecord, mediums, consumed_states, medium_codes, consumed_state_codes
 
 
 class GoGoMediaMediaModelTestCase(GoGoMediaBaseTestCase):
@@ -263,3 +263,55 @@ class GoGoMediaMediaModelTestCase(GoGoMediaBaseTestCase):
             'description': 'some description',
             'order': 5
         })
+
+    def test_as_dict_with_fields(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media = Media('testmedianame', user.id, description='some description', order=5)
+        db.session.add(media)
+        db.session.commit()
+
+        self.assertDictEqual(media.as_dict(['name', 'order']), {
+            'name': 'testmedianame',
+            'order': 5
+        })
+        self.assertDictEqual(media.as_dict([]), {})
+
+    def test_media_record(self):
+        record = MediaRecord.from_dict({
+            'id': 1,
+            'name': 'testmedianame',
+            'medium': 'film',
+            'consumed_state': 'finished',
+            'description': 'some description',
+            'order': 5
+        })
+
+        self.assertEqual(medium_codes[record.medium_code], 'film')
+        self.assertEqual(consumed_state_codes[record.consumed_state_code], 'finished')
+        self.assertEqual(record.medium, 'film')
+        self.assertEqual(record.consumed_state, 'finished')
+        self.assertDictEqual(record.as_dict(), {
+            'id': 1,
+            'name': 'testmedianame',
+            'medium': 'film',
+            'consumed_state': 'finished',
+            'description': 'some description',
+            'order': 5
+        })
+        self.assertDictEqual(record.as_dict(['id', 'medium']), {'id': 1, 'medium': 'film'})
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_media_record_missing_fields(self):
+        record = MediaRecord.from_dict({'id': 1, 'name': 'testmedianame'})
+
+        self.assertIsNone(record.medium_code)
+        self.assertIsNone(record.medium)
+        self.assertIsNone(record.consumed_state)
+        self.assertDictEqual(record.as_dict(['id', 'name']), {'id': 1, 'name': 'testmedianame'})
+
+    def test_media_record_codes_cover_enums(self):
+        self.assertEqual(set(medium_codes), mediums)
+        self.assertEqual(set(consumed_state_codes), consumed_states)
@@ -0,0 +1,130 @@
+from base_test_case import GoGoMediaBaseTestCase
+from flask import current_app
+
+from database import db
+
+from models.user import User
+from models.media import Media
+
+from logic.media import add_media, update_media, remove_media, suggest_media_names
+from logic.media_name_index import get_media_name_index
+
+
+class GoGoMediaMediaNameIndexTestCase(GoGoMediaBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        current_app.config['MEDIA_NAME_INDEX'] = True
+
+    def test_get_media_name_index_disabled(self):
+        current_app.config['MEDIA_NAME_INDEX'] = False
+
+        self.assertIsNone(get_media_name_index())
+
+    def test_suggest_loads_existing_media(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media1 = Media('Star Wars', user.id)
+        media2 = Media('stargate', user.id)
+        media3 = Media('Lone Star', user.id)
+        db.session.add(media1)
+        db.session.add(media2)
+        db.session.add(media3)
+        db.session.commit()
+
+        self.assertListEqual(suggest_media_names(user.id, 'STAR'), [(media1.id, 'Star Wars'), (media2.id, 'stargate')])
+        self.assertListEqual(suggest_media_names(user.id, 'star', limit=1), [(media1.id, 'Star Wars')])
+        self.assertListEqual(suggest_media_names(user.id, 'x'), [])
+
+    def test_write_paths_update_index(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media1 = add_media(user.id, 'Star Wars')
+        self.assertListEqual(suggest_media_names(user.id, 'star'), [(media1.id, 'Star Wars')])
+
+        media2 = add_media(user.id, 'Stardust')
+        self.assertListEqual(suggest_media_names(user.id, 'star'), [(media1.id, 'Star Wars'), (media2.id, 'Stardust')])
+
+        update_media(media1.id, medianame='Alien')
+        self.assertListEqual(suggest_media_names(user.id, 'star'), [(media2.id, 'Stardust')])
+        self.assertListEqual(suggest_media_names(user.id, 'al'), [(media1.id, 'Alien')])
+
+        remove_media(media2.id)
+        self.assertListEqual(suggest_media_names(user.id, 'star'), [])
+
+    def test_index_is_per_user(self):
+        user1 = User('testname1', 'P@ssw0rd')
+        user2 = User('testname2', 'P@ssw0rd')
+        db.session.add(user1)
+        db.session.add(user2)
+        db.session.commit()
+
+        media1 = add_media(user1.id, 'Star Wars')
+        add_media(user2.id, 'Stardust')
+
+        self.assertListEqual(suggest_media_names(user1.id, 'star'), [(media1.id, 'Star Wars')])
+
+    def test_index_reloads_after_max_age(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        self.assertListEqual(suggest_media_names(user.id, 'star'), [])
+
+        # a write the index doesn't hear about, like one made by another process
+        media = Media('Star Wars', user.id)
+        db.session.add(media)
+        db.session.commit()
+
+        self.assertListEqual(suggest_media_names(user.id, 'star'), [])
+
+        get_media_name_index().max_age = 0
+        self.assertListEqual(suggest_media_names(user.id, 'star'), [(media.id, 'Star Wars')])
+
+    def test_load_queries_without_the_lock(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media = add_media(user.id, 'Star Wars')
+        index = get_media_name_index()
+        query = index._query
+        locked = []
+
+        def query_and_check_lock(userid):
+            locked.append(index.lock.locked())
+            return query(userid)
+
+        index._query = query_and_check_lock
+
+        self.assertListEqual(suggest_media_names(user.id, 'star'), [(media.id, 'Star Wars')])
+        self.assertListEqual(locked, [False])
+
+    def test_load_not_kept_after_concurrent_write(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media1 = add_media(user.id, 'Star Wars')
+        index = get_media_name_index()
+        query = index._query
+
+        def query_then_write(userid):
+            entries = query(userid)
+            # a write another thread commits after the query read the user's media
+            media2 = Media('Stardust', userid)
+            db.session.add(media2)
+            db.session.commit()
+            index.add(userid, media2.id, media2.medianame)
+            return entries
+
+        index._query = query_then_write
+
+        self.assertListEqual(suggest_media_names(user.id, 'star'), [(media1.id, 'Star Wars')])
+        self.assertNotIn(user.id, index.entries)
+
+        index._query = query
+        self.assertListEqual([name for id, name in suggest_media_names(user.id, 'star')], ['Star Wars', 'Stardust'])
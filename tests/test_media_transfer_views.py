@@ -0,0 +1,222 @@
+import json
+from unittest.mock import patch
+from base_test_case import GoGoMediaBaseTestCase
+
+from database import db
+
+from models.user import User
+from models.media import Media
+from models.job import Job, JobFile
+
+from logic.media import get_media_dicts
+from logic.job import run_next_job
+
+from worker import job_handlers
+
+
+class GoGoMediaMediaTransferViewsTestCase(GoGoMediaBaseTestCase):
+    def test_import_ndjson(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        data = '\n'.join([
+            json.dumps({'name': 'testmedianame1', 'medium': 'film'}),
+            '',
+            json.dumps({'id': 12, 'name': 'testmedianame2', 'order': 3}),
+            json.dumps({'name': 'testmedianame3', 'medium': 'tv'}),
+            'not json',
+            json.dumps({'medium': 'film'})
+        ])
+
+        response = self.client.post('/user/testname/media/import', data=data, content_type='application/x-ndjson')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+        self.assertEqual(body['data'], {
+            'imported': 2,
+            'error_count': 3,
+            'errors': [
+                {'row': 4, 'message': 'medium parameter must be \'film\', \'audio\', \'literature\', or \'other\''},
+                {'row': 5, 'message': 'row must be a JSON object'},
+                {'row': 6, 'message': 'missing parameter \'name\''}
+            ]
+        })
+
+        media_list = Media.query.order_by(Media.id).all()
+
+        self.assertEqual([media.medianame for media in media_list], ['testmedianame1', 'testmedianame2'])
+        self.assertEqual(media_list[0].medium, 'film')
+        self.assertEqual(media_list[1].id, 2)
+        self.assertEqual(media_list[1].order, 3)
+
+    def test_import_csv(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        data = ('name,medium,consumed_state,description,order\n'
+                'testmedianame1,audio,started,"a description, with a comma\nand a newline",2\n'
+                'testmedianame2,,,,\n'
+                'testmedianame3,,,,first\n')
+
+        response = self.client.post('/user/testname/media/import?format=csv', data=data, content_type='text/csv')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['data'], {
+            'imported': 2,
+            'error_count': 1,
+            'errors': [{'row': 3, 'message': 'order parameter must be type integer'}]
+        })
+        self.assertListEqual(get_media_dicts('testname'), [
+            {
+                'id': 2,
+                'name': 'testmedianame2',
+                'medium': 'other',
+                'consumed_state': 'not started',
+                'description': '',
+                'order': 0
+            },
+            {
+                'id': 1,
+                'name': 'testmedianame1',
+                'medium': 'audio',
+                'consumed_state': 'started',
+                'description': 'a description, with a comma\nand a newline',
+                'order': 2
+            }
+        ])
+
+    def test_import_malformed_format_url_parameter(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.post('/user/testname/media/import?format=xml', data='<media/>')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(body['success'])
+        self.assertEqual(body['message'], 'format url parameter must be \'csv\' or \'ndjson\'')
+
+    def test_export_ndjson(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        db.session.add(Media('testmedianame1', user.id, medium='film', order=1))
+        db.session.add(Media('testmedianame2', user.id, description='some description'))
+        db.session.commit()
+
+        response = self.client.get('/user/testname/media/export')
+        lines = response.get_data(as_text=True).splitlines()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertListEqual([json.loads(line) for line in lines], get_media_dicts('testname'))
+
+    def test_import_async(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        data = 'name,medium\n' + ''.join('testmedianame{},film\n'.format(n) for n in range(100))
+
+        with patch('logic.job.job_file_chunk_size', 64):
+            response = self.client.post('/user/testname/media/import?format=csv&async=true', data=data,
+                                        content_type='text/csv')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 202)
+        job = Job.query.get(body['data']['id'])
+        # only a reference to the file is in the payload, the file itself is stored in chunks
+        self.assertEqual(json.loads(job.payload), {'format': 'csv', 'file': job.id})
+        self.assertEqual(b''.join(chunk.data for chunk in JobFile.query.order_by(JobFile.position)),
+                         data.encode('utf-8'))
+
+        run_next_job(job_handlers)
+
+        self.assertEqual(job.as_dict()['result']['imported'], 100)
+        self.assertEqual(Media.query.count(), 100)
+        self.assertEqual(JobFile.query.count(), 0)
+
+    def test_import_csv_not_utf8(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        data = 'name\ntestmedianame1\ntestmédianame2\n'.encode('latin-1')
+
+        response = self.client.post('/user/testname/media/import?format=csv', data=data, content_type='text/csv')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(body['success'])
+        self.assertEqual(body['message'], 'line 3 of the file isn\'t UTF-8')
+        self.assertEqual(body['data'], {'imported': 0})
+
+    def test_import_too_long_fields(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        data = '\n'.join([
+            json.dumps({'name': 'testmedianame1'}),
+            json.dumps({'name': 'n' * 81}),
+            json.dumps({'name': 'testmedianame3', 'description': 'd' * 501})
+        ])
+
+        response = self.client.post('/user/testname/media/import', data=data, content_type='application/x-ndjson')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['data'], {
+            'imported': 1,
+            'error_count': 2,
+            'errors': [
+                {'row': 2, 'message': 'name parameter must be at most 80 characters'},
+                {'row': 3, 'message': 'description parameter must be at most 500 characters'}
+            ]
+        })
+
+    def test_import_line_too_long(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        data = json.dumps({'name': 'testmedianame1'}) + '\n' + json.dumps({'name': 'x' * 200})
+
+        for file_format in ['ndjson', 'csv']:
+            with patch('views.media_transfer.max_import_line_length', 64):
+                response = self.client.post('/user/testname/media/import?format={}'.format(file_format), data=data,
+                                            content_type='text/plain')
+            body = json.loads(response.get_data(as_text=True))
+
+            self.assertEqual(response.status_code, 422)
+            self.assertEqual(body['message'], 'line 2 of the file is longer than 64 bytes')
+
+    def test_export_csv_round_trip(self):
+        user1 = User('testname1', 'P@ssw0rd')
+        user2 = User('testname2', 'P@ssw0rd')
+        db.session.add(user1)
+        db.session.add(user2)
+        db.session.commit()
+
+        db.session.add(Media('testmedianame1', user1.id, medium='film', consumed_state='finished', order=1))
+        db.session.add(Media('testmedianame2', user1.id, description='"quoted", with a comma'))
+        db.session.commit()
+
+        response = self.client.get('/user/testname1/media/export?format=csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+
+        response = self.client.post('/user/testname2/media/import?format=csv', data=response.get_data(),
+                                    content_type='text/csv')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(body['data']['imported'], 2)
+        self.assertListEqual([dict(media, id=None) for media in get_media_dicts('testname2')],
+                             [dict(media, id=None) for media in get_media_dicts('testname1')])
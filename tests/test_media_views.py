@@ -1,12 +1,22 @@
 import json
 import unittest
+from unittest.mock import patch
 from base_test_case import GoGoMediaBaseTestCase
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
 
 from database import db
 
 from models.user import User
 from models.media import Media
 
+import views.media
+import views.json_stream
+
+from logic.job import enqueue_job, run_next_job
+
+from worker import job_handlers
+
 
 class GoGoMediaMediaViewsTestCase(GoGoMediaBaseTestCase):
     def test_nonexistent_user_media_endpoint(self):
@@ -158,6 +168,21 @@ class GoGoMediaMediaViewsTestCase(GoGoMediaBaseTestCase):
         self.assertFalse(body['success'])
         self.assertEqual(body['message'], 'description parameter must be type string')
 
+    def test_add_media_too_long_params(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.put('/user/testname/media',
+                                   data=json.dumps({'name': 'n' * 81, 'description': 'd' * 501}),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['errors'], ['name parameter must be at most 80 characters',
+                                          'description parameter must be at most 500 characters'])
+        self.assertEqual(Media.query.count(), 0)
+
     def test_add_media_mistyped_request_order_param(self):
         user = User('testname', 'P@ssw0rd')
         db.session.add(user)
@@ -412,6 +437,40 @@ class GoGoMediaMediaViewsTestCase(GoGoMediaBaseTestCase):
             }
         ])
 
+    def test_add_and_update_multiple_media_query_count(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media_list = [Media('testmedianame{}'.format(n), user.id) for n in range(3)]
+        db.session.add_all(media_list)
+        db.session.commit()
+        ids = [media.id for media in media_list]
+        db.session.remove()
+
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        db.event.listen(db.engine, 'before_cursor_execute', record_statement)
+        try:
+            response = self.client.put('/user/testname/media',
+                                       data=json.dumps([{'id': id, 'medium': 'film'} for id in ids] +
+                                                       [{'name': 'testmedianame3'}, {'name': 'testmedianame4'}]),
+                                       content_type='application/json')
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', record_statement)
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([media['medium'] for media in body['data']], ['film', 'film', 'film', 'other', 'other'])
+        # the user, then the media being updated in one query, then one write per element, and no reloads after the
+        # commits
+        self.assertEqual(len(statements), 7)
+        self.assertEqual([statement.split()[0] for statement in statements],
+                         ['SELECT', 'SELECT', 'UPDATE', 'UPDATE', 'UPDATE', 'INSERT', 'INSERT'])
+
     def test_add_multiple_media_with_one_mistyped(self):
         user = User('testname', 'P@ssw0rd')
         db.session.add(user)
@@ -434,6 +493,275 @@ class GoGoMediaMediaViewsTestCase(GoGoMediaBaseTestCase):
 
         self.assertListEqual(media_list, [])
 
+    def test_add_multiple_media_reports_every_error(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.put('/user/testname/media',
+                                   data=json.dumps([
+                                       {'name': 'testmedianame1'},
+                                       {'medium': 'tv', 'order': 'first'},
+                                       'testmedianame3',
+                                       {'name': 'testmedianame4', 'description': 23}
+                                   ]),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(body['success'])
+        self.assertEqual(body['message'], 'missing parameter \'name\' or parameter \'id\'')
+        self.assertEqual(body['errors'], [
+            {'index': 1, 'messages': [
+                'missing parameter \'name\' or parameter \'id\'',
+                'medium parameter must be \'film\', \'audio\', \'literature\', or \'other\'',
+                'order parameter must be type integer'
+            ]},
+            {'index': 2, 'messages': ['media element must be a JSON object']},
+            {'index': 3, 'messages': ['description parameter must be type string']}
+        ])
+
+        media_list = Media.query.all()
+
+        self.assertListEqual(media_list, [])
+
+    def test_add_and_update_media_stream(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media = Media('testmedianame', user.id)
+        db.session.add(media)
+        db.session.commit()
+
+        response = self.client.put('/user/testname/media?stream=true',
+                                   data=json.dumps([
+                                       {'id': media.id, 'medium': 'film'},
+                                       {'name': 'testmedianame2', 'order': 1},
+                                       {'name': 'testmedianame3', 'consumed_state': 'started'}
+                                   ]),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+        self.assertEqual(body['data'], {'added': 2, 'updated': 1})
+
+        media_list = Media.query.order_by(Media.id).all()
+
+        self.assertEqual([(m.medianame, m.medium, m.consumed_state) for m in media_list], [
+            ('testmedianame', 'film', 'not started'),
+            ('testmedianame2', 'other', 'not started'),
+            ('testmedianame3', 'other', 'started')
+        ])
+
+    def test_media_stream_commits_once_per_batch(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        ids = []
+        for index in range(3):
+            media = Media('testmedianame{}'.format(index), user.id)
+            db.session.add(media)
+            db.session.commit()
+            ids.append(media.id)
+
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        db.event.listen(db.engine, 'before_cursor_execute', record_statement)
+        try:
+            with patch('views.media.commit_media', wraps=views.media.commit_media) as commit_media:
+                response = self.client.put('/user/testname/media?stream=true',
+                                           data=json.dumps([{'id': id, 'medium': 'film'} for id in ids] +
+                                                           [{'name': 'testmedianame3'}, {'name': 'testmedianame4'}]),
+                                           content_type='application/json')
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', record_statement)
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['data'], {'added': 2, 'updated': 3})
+        self.assertEqual(commit_media.call_count, 1)
+        # the user, then the media being updated in one query, then one INSERT for the new elements and one write per
+        # updated element
+        self.assertEqual([statement.split()[0] for statement in statements],
+                         ['SELECT', 'SELECT', 'INSERT', 'UPDATE', 'UPDATE', 'UPDATE'])
+
+    def test_add_media_stream_with_one_mistyped(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        batch_size = views.media.put_stream_batch_size
+        views.media.put_stream_batch_size = 2
+        try:
+            response = self.client.put('/user/testname/media?stream=true',
+                                       data=json.dumps([
+                                           {'name': 'testmedianame1'},
+                                           {'name': 'testmedianame2'},
+                                           {'name': 'testmedianame3'},
+                                           {'name': 'testmedianame4', 'order': 'last'}
+                                       ]),
+                                       content_type='application/json')
+        finally:
+            views.media.put_stream_batch_size = batch_size
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['errors'], [{'index': 3, 'messages': ['order parameter must be type integer']}])
+        self.assertEqual(body['data'], {'added': 2, 'updated': 0})
+        self.assertEqual(Media.query.count(), 2)
+
+    def test_media_stream_other_users_media_id(self):
+        user = User('testname', 'P@ssw0rd')
+        other_user = User('othertestname', 'P@ssw0rd')
+        db.session.add_all([user, other_user])
+        db.session.commit()
+
+        media = Media('testmedianame', other_user.id)
+        db.session.add(media)
+        db.session.commit()
+
+        response = self.client.put('/user/testname/media?stream=true',
+                                   data=json.dumps([{'id': media.id, 'name': 'renamed'}]),
+                                   content_type='application/json')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(Media.query.one().medianame, 'testmedianame')
+
+    def test_media_stream_element_too_large(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        views.json_stream.max_element_size = 64
+        try:
+            response = self.client.put('/user/testname/media?stream=true',
+                                       data='[{"name": "testmedianame"}, {"name": "' + 'x' * 1024,
+                                       content_type='application/json')
+        finally:
+            views.json_stream.max_element_size = 1024 * 1024
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(body['success'])
+        self.assertEqual(body['message'], 'element 1 of the request body must be at most 64 characters')
+        self.assertEqual(body['data'], {'added': 0, 'updated': 0})
+
+    def test_media_request_body_too_large(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        current_app.config['MAX_CONTENT_LENGTH'] = 64
+        data = json.dumps([{'name': 'testmedianame{}'.format(n)} for n in range(10)])
+
+        response = self.client.put('/user/testname/media', data=data, content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(body['success'])
+        self.assertEqual(body['message'], 'request body must be at most 64 bytes')
+
+        # streamed PUTs have their own, larger limit
+        response = self.client.put('/user/testname/media?stream=true', data=data, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Media.query.count(), 10)
+
+    def test_upsert_media_on_natural_key(self):
+        current_app.config['MEDIA_UPSERT_NATURAL_KEY'] = True
+        db.session.execute('CREATE UNIQUE INDEX uq_media_user_medianame ON media ("user", medianame)')
+
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.put('/user/testname/media',
+                                   data=json.dumps({'name': 'testmedianame', 'medium': 'audio'}),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['data']['id'], 1)
+        self.assertEqual(body['data']['medium'], 'audio')
+
+        response = self.client.put('/user/testname/media',
+                                   data=json.dumps([
+                                       {'name': 'testmedianame', 'consumed_state': 'started'},
+                                       {'name': 'testmedianame2'}
+                                   ]),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+        self.assertListEqual(body['data'], [
+            {
+                'id': 1,
+                'name': 'testmedianame',
+                'medium': 'audio',
+                'consumed_state': 'started',
+                'description': '',
+                'order': 0
+            },
+            {
+                'id': 2,
+                'name': 'testmedianame2',
+                'medium': 'other',
+                'consumed_state': 'not started',
+                'description': '',
+                'order': 0
+            }
+        ])
+        self.assertEqual(Media.query.count(), 2)
+
+    def test_upsert_media_array_on_natural_key_is_atomic(self):
+        current_app.config['MEDIA_UPSERT_NATURAL_KEY'] = True
+        db.session.execute('CREATE UNIQUE INDEX uq_media_user_medianame ON media ("user", medianame)')
+
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+        media = Media('testmedianame', user.id)
+        db.session.add(media)
+        db.session.commit()
+
+        # renaming the existing element to a name the array just upserted fails, and nothing in the array is kept
+        with self.assertRaises(IntegrityError):
+            self.client.put('/user/testname/media',
+                            data=json.dumps([{'name': 'newmedianame'}, {'id': media.id, 'name': 'newmedianame'}]),
+                            content_type='application/json')
+        db.session.remove()
+
+        self.assertEqual([media.medianame for media in Media.query.all()], ['testmedianame'])
+
+    def test_upsert_media_array_with_duplicate_names(self):
+        current_app.config['MEDIA_UPSERT_NATURAL_KEY'] = True
+        db.session.execute('CREATE UNIQUE INDEX uq_media_user_medianame ON media ("user", medianame)')
+
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.put('/user/testname/media',
+                                   data=json.dumps([
+                                       {'name': 'testmedianame', 'medium': 'film'},
+                                       {'name': 'testmedianame', 'consumed_state': 'finished'}
+                                   ]),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['data'][0], body['data'][1])
+        self.assertEqual(body['data'][1]['medium'], 'film')
+        self.assertEqual(body['data'][1]['consumed_state'], 'finished')
+        self.assertEqual(Media.query.count(), 1)
+
     def test_update_media_consumed_state(self):
         user = User('testname', 'P@ssw0rd')
         db.session.add(user)
@@ -962,6 +1290,132 @@ class GoGoMediaMediaViewsTestCase(GoGoMediaBaseTestCase):
         self.assertEqual(sorted(body['data'], key=lambda media: media['name']),
                          [media3.as_dict(), media4.as_dict()])
 
+    def test_get_media_with_search_query(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media1 = Media('testmedianame1', user.id, description='a searchable description')
+        media2 = Media('testmedianame2', user.id)
+        db.session.add(media1)
+        db.session.add(media2)
+        db.session.commit()
+
+        response = self.client.get('/user/testname/media?q=searchable')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+        self.assertListEqual(body['data'], [media1.as_dict()])
+
+    def test_get_media_suggestions(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media1 = Media('testmedianame1', user.id)
+        media2 = Media('othermedianame', user.id)
+        db.session.add(media1)
+        db.session.add(media2)
+        db.session.commit()
+
+        response = self.client.get('/user/testname/media/suggestions?q=test')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+        self.assertListEqual(body['data'], [{'id': media1.id, 'name': 'testmedianame1'}])
+
+    def test_get_media_suggestions_malformed_url_parameters(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.get('/user/testname/media/suggestions')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['message'], 'missing url parameter \'q\'')
+
+        response = self.client.get('/user/testname/media/suggestions?q=test&limit=many')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['message'], 'limit url parameter must be an integer between 1 and 50')
+
+    def test_get_media_stats(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        db.session.add(Media('testmedianame1', user.id, medium='literature', consumed_state='started'))
+        db.session.add(Media('testmedianame2', user.id))
+        db.session.commit()
+
+        response = self.client.get('/user/testname/media/stats')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+        self.assertEqual(body['data'], {
+            'film': {'not started': 0, 'started': 0, 'finished': 0},
+            'audio': {'not started': 0, 'started': 0, 'finished': 0},
+            'literature': {'not started': 0, 'started': 1, 'finished': 0},
+            'other': {'not started': 1, 'started': 0, 'finished': 0}
+        })
+
+    def test_get_media_with_fields(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media = Media('testmedianame', user.id, description='a long description', order=3)
+        db.session.add(media)
+        db.session.commit()
+
+        response = self.client.get('/user/testname/media?fields=id,name,order')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+        self.assertListEqual(body['data'], [{'id': media.id, 'name': 'testmedianame', 'order': 3}])
+
+    def test_get_media_with_malformed_fields_url_parameter(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.get('/user/testname/media?fields=name,medianame')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(body['success'])
+        self.assertEqual(body['message'],
+                         'fields url parameter must be a comma separated list of \'id\', \'name\', \'medium\', '
+                         '\'consumed_state\', \'description\', or \'order\'')
+
+    def test_get_media_with_json_agg(self):
+        current_app.config['MEDIA_JSON_AGG'] = True
+
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media1 = Media('testmedianame1', user.id, medium='film', consumed_state='started', order=1)
+        media2 = Media('testmedianame2', user.id)
+        db.session.add(media1)
+        db.session.add(media2)
+        db.session.commit()
+
+        response = self.client.get('/user/testname/media?fields=id,name')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertTrue(body['success'])
+        self.assertEqual(body['message'], 'successfully got media for the logged in user')
+        self.assertListEqual(body['data'], [media2.as_dict(['id', 'name']), media1.as_dict(['id', 'name'])])
+
     def test_get_media_with_malformed_consumed_state_url_parameter(self):
         user = User('testname', 'P@ssw0rd')
         db.session.add(user)
@@ -1017,6 +1471,71 @@ class GoGoMediaMediaViewsTestCase(GoGoMediaBaseTestCase):
 
         self.assertEqual(media_list, [])
 
+    def test_delete_media_list(self):
+        user = User('testname', 'P@ssw0rd')
+        other_user = User('othertestname', 'P@ssw0rd')
+        db.session.add_all([user, other_user])
+        db.session.commit()
+
+        media = [Media('testmedianame1', user.id), Media('testmedianame2', user.id),
+                 Media('testmedianame3', other_user.id)]
+        db.session.add_all(media)
+        db.session.commit()
+
+        response = self.client.delete('/user/testname/media',
+                                      data=json.dumps({'ids': [media[0].id, media[2].id]}),
+                                      content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+
+        media_list = Media.query.order_by(Media.id).all()
+
+        self.assertEqual([m.medianame for m in media_list], ['testmedianame2', 'testmedianame3'])
+
+    def test_delete_media_async(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        media = Media('testmedianame', user.id)
+        db.session.add(media)
+        db.session.commit()
+
+        response = self.client.delete('/user/testname/media?async=true',
+                                      data=json.dumps({'ids': [media.id]}),
+                                      content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(body['data']['status'], 'queued')
+        self.assertEqual(Media.query.count(), 1)
+
+        run_next_job(job_handlers)
+
+        response = self.client.get('/user/testname/jobs/{}'.format(body['data']['id']))
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['data']['status'], 'finished')
+        self.assertEqual(body['data']['result'], {'deleted': 1})
+        self.assertEqual(Media.query.count(), 0)
+
+    def test_get_other_users_job(self):
+        user = User('testname', 'P@ssw0rd')
+        other_user = User('othertestname', 'P@ssw0rd')
+        db.session.add_all([user, other_user])
+        db.session.commit()
+
+        job = enqueue_job(other_user.id, 'delete_media', {'ids': []})
+
+        response = self.client.get('/user/testname/jobs/{}'.format(job.id))
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(body['success'])
+
     def test_delete_media_missing_request_body_params(self):
         user = User('testname', 'P@ssw0rd')
         db.session.add(user)
@@ -1057,3 +1576,116 @@ class GoGoMediaMediaViewsTestCase(GoGoMediaBaseTestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertTrue(body['success'])
+
+    def test_move_media(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        for order in range(3):
+            db.session.add(Media('testmedianame{}'.format(order), user.id, order=order))
+        db.session.commit()
+
+        response = self.client.put('/user/testname/media/order',
+                                   data=json.dumps({'id': 3, 'position': 0}),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+        self.assertEqual([media.id for media in Media.query.order_by(Media.order).all()], [3, 1, 2])
+
+    def test_reorder_media(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        for order in range(3):
+            db.session.add(Media('testmedianame{}'.format(order), user.id))
+        db.session.commit()
+
+        response = self.client.put('/user/testname/media/order',
+                                   data=json.dumps({'ids': [2, 3, 1]}),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+        self.assertEqual([media.id for media in Media.query.order_by(Media.order).all()], [2, 3, 1])
+
+    def test_reorder_media_malformed_body(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.put('/user/testname/media/order',
+                                   data=json.dumps({'id': 1}),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['message'], 'missing parameter \'ids\' or parameters \'id\' and \'position\'')
+
+        response = self.client.put('/user/testname/media/order',
+                                   data=json.dumps({'ids': [1, '2']}),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['message'], 'ids parameter must be an array of integers')
+
+        response = self.client.put('/user/testname/media/order',
+                                   data=json.dumps({'id': 1, 'position': '0'}),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['message'], 'position parameter must be type integer')
+
+        response = self.client.put('/user/testname/media/order',
+                                   data=json.dumps({'id': 1, 'position': -1}),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['message'], 'position parameter must not be negative')
+
+    def test_reorder_media_partial_ids(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        for order in range(3):
+            db.session.add(Media('testmedianame{}'.format(order), user.id, order=order))
+        db.session.commit()
+
+        response = self.client.put('/user/testname/media/order',
+                                   data=json.dumps({'ids': [3, 2]}),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['message'], 'ids parameter must contain every media element of the user')
+        self.assertEqual([media.id for media in Media.query.order_by(Media.order).all()], [1, 2, 3])
+
+    def test_reorder_media_other_users_media_id(self):
+        user1 = User('testname1', 'P@ssw0rd')
+        user2 = User('testname2', 'P@ssw0rd')
+        db.session.add(user1)
+        db.session.add(user2)
+        db.session.commit()
+
+        media1 = Media('testmedianame1', user1.id)
+        media2 = Media('testmedianame2', user2.id)
+        db.session.add(media1)
+        db.session.add(media2)
+        db.session.commit()
+
+        response = self.client.put('/user/testname1/media/order',
+                                   data=json.dumps({'ids': [media2.id, media1.id]}),
+                                   content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(body['message'], 'logged in user doesn\'t have media with given id')
+        self.assertEqual(media2.order, 0)
@@ -0,0 +1,78 @@
+from base_test_case import GoGoMediaBaseTestCase
+
+from database import db
+
+from models.media import Media
+from models.user import User
+
+from migration_helpers import backfill, create_index_concurrently, drop_index_concurrently, run_with_lock_timeout
+
+fill_description = 'UPDATE media SET description = :description WHERE id >= :start AND id < :end'
+
+
+class GoGoMediaMigrationHelpersTestCase(GoGoMediaBaseTestCase):
+    def tearDown(self):
+        db.session.remove()
+        db.engine.execute('DROP TABLE IF EXISTS migration_progress')
+        GoGoMediaBaseTestCase.tearDown(self)
+
+    def add_media(self, count):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        db.session.add_all([Media('testmedianame{}'.format(n), user.id) for n in range(count)])
+        db.session.commit()
+
+    def descriptions(self):
+        db.session.expire_all()
+        return [media.description for media in Media.query.order_by(Media.id)]
+
+    def test_backfill(self):
+        self.add_media(25)
+
+        changed = backfill('test_backfill', fill_description, batch_size=10, pause=0, bind=db.engine,
+                           description='filled')
+
+        self.assertEqual(changed, 25)
+        self.assertEqual(self.descriptions(), ['filled'] * 25)
+
+    def test_backfill_resumes_after_the_last_batch(self):
+        self.add_media(25)
+        db.engine.execute('CREATE TABLE migration_progress (name varchar(200) PRIMARY KEY, last_id bigint NOT NULL, '
+                          'updated_on timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP)')
+        db.engine.execute("INSERT INTO migration_progress (name, last_id) VALUES ('test_backfill', 10)")
+
+        changed = backfill('test_backfill', fill_description, batch_size=10, pause=0, bind=db.engine,
+                           description='filled')
+
+        self.assertEqual(changed, 15)
+        self.assertEqual(self.descriptions(), [''] * 10 + ['filled'] * 15)
+        self.assertEqual(db.engine.execute('SELECT last_id FROM migration_progress').scalar(), 30)
+
+        # a finished backfill does nothing when run again
+        self.assertEqual(backfill('test_backfill', fill_description, batch_size=10, pause=0, bind=db.engine,
+                                  description='again'), 0)
+
+    def test_backfill_empty_table(self):
+        self.assertEqual(backfill('test_backfill', fill_description, pause=0, bind=db.engine, description='filled'), 0)
+
+    def test_create_and_drop_index_concurrently(self):
+        create_index_concurrently('ix_media_test', 'media', 'medianame', bind=db.engine)
+        # creating an index that exists does nothing
+        create_index_concurrently('ix_media_test', 'media', 'medianame', bind=db.engine)
+
+        self.assertIn('ix_media_test', [index['name'] for index in db.inspect(db.engine).get_indexes('media')])
+
+        drop_index_concurrently('ix_media_test', bind=db.engine)
+
+        self.assertNotIn('ix_media_test', [index['name'] for index in db.inspect(db.engine).get_indexes('media')])
+
+    def test_run_with_lock_timeout(self):
+        self.add_media(2)
+
+        run_with_lock_timeout(["UPDATE media SET description = 'first'",
+                               "UPDATE media SET medianame = 'second' WHERE id = 1"], bind=db.engine)
+
+        self.assertEqual(self.descriptions(), ['first', 'first'])
+        self.assertEqual(Media.query.filter_by(id=1).first().medianame, 'second')
@@ -0,0 +1,59 @@
+from base_test_case import GoGoMediaBaseTestCase
+from flask import current_app
+
+from database import db
+
+from models.user import User
+
+from logic.user import get_user, user_by_username
+from logic.media import media_by_id
+
+from prepared_statements import PreparedStatement, prepared_statements_enabled
+
+
+class RecordingConnection:
+    """
+    RecordingConnection stands in for a database connection, recording the statements executed on it
+    """
+    def __init__(self):
+        self.info = {}
+        self.statements = []
+
+    def execute(self, statement, **params):
+        self.statements.append(statement)
+
+
+class GoGoMediaPreparedStatementsTestCase(GoGoMediaBaseTestCase):
+    def test_prepared_statement_sql(self):
+        self.assertEqual(user_by_username.prepare_sql,
+                         'PREPARE user_by_username (text) AS SELECT id, username, passhash FROM users '
+                         'WHERE username = $1')
+        self.assertEqual(user_by_username.execute_text.text, 'EXECUTE user_by_username (:username)')
+
+        self.assertIn('WHERE id = $1 AND "user" = $2', media_by_id.prepare_sql)
+        self.assertIn('(integer, integer)', media_by_id.prepare_sql)
+        self.assertEqual(media_by_id.execute_text.text, 'EXECUTE media_by_id (:id, :userid)')
+
+    def test_prepare_once_per_connection(self):
+        statement = PreparedStatement('test_statement', 'SELECT :a, :ab', [('a', 'integer'), ('ab', 'text')])
+        connection = RecordingConnection()
+        other_connection = RecordingConnection()
+
+        statement.prepare(connection)
+        statement.prepare(connection)
+        statement.prepare(other_connection)
+
+        self.assertEqual(connection.statements, ['PREPARE test_statement (integer, text) AS SELECT $1, $2'])
+        self.assertEqual(other_connection.statements, connection.statements)
+
+    def test_prepared_statements_only_on_postgresql(self):
+        self.assertFalse(prepared_statements_enabled())
+
+        current_app.config['PREPARED_STATEMENTS'] = True
+        self.assertEqual(prepared_statements_enabled(), db.engine.dialect.name == 'postgresql')
+
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        self.assertEqual(get_user('testname'), user)
@@ -0,0 +1,195 @@
+import json
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+from base_test_case import GoGoMediaBaseTestCase
+from flask import current_app
+
+from database import db
+
+from models.user import User
+
+from profiler import sample_stacks, collapsed_stacks, speedscope_profile, profile_to_file, register_profile_worker, \
+    registered_worker_pids, install_profile_signal, unregister_profile_worker
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        time.sleep(0.001)
+
+
+class GoGoMediaProfilerTestCase(GoGoMediaBaseTestCase):
+    def setUp(self):
+        GoGoMediaBaseTestCase.setUp(self)
+        self.profile_dir = tempfile.mkdtemp()
+        current_app.config['PROFILE_DIR'] = self.profile_dir
+        current_app.config['ADMIN_TOKEN'] = 'test admin token'
+        install_profile_signal(current_app)
+
+    def tearDown(self):
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        shutil.rmtree(self.profile_dir)
+        GoGoMediaBaseTestCase.tearDown(self)
+
+    def sample_busy_thread(self, seconds=0.05, only_views=False):
+        stop = threading.Event()
+        thread = threading.Thread(target=busy_loop, args=(stop,))
+        thread.start()
+        try:
+            return sample_stacks(seconds, interval=0.001, only_views=only_views)
+        finally:
+            stop.set()
+            thread.join()
+
+    def test_sample_stacks(self):
+        counts = self.sample_busy_thread()
+
+        busy_stacks = [stack for stack in counts if stack[-1][0] == 'busy_loop']
+        self.assertTrue(busy_stacks)
+        self.assertEqual(busy_stacks[0][-1][1], os.path.join('tests', 'test_profiler.py'))
+        # the sampling thread doesn't sample itself
+        self.assertFalse([stack for stack in counts if any(key[0] == 'sample_stacks' for key in stack)])
+
+    def test_sample_stacks_only_views(self):
+        counts = self.sample_busy_thread(only_views=True)
+
+        self.assertFalse([stack for stack in counts if stack[-1][0] == 'busy_loop'])
+
+    def test_collapsed_stacks(self):
+        counts = {(('main', 'app.py', 1), ('media', 'views/media.py', 46)): 3}
+
+        self.assertEqual(collapsed_stacks(counts), 'main (app.py:1);media (views/media.py:46) 3\n')
+
+    def test_speedscope_profile(self):
+        counts = {
+            (('main', 'app.py', 1), ('media', 'views/media.py', 46)): 3,
+            (('main', 'app.py', 1),): 1
+        }
+
+        profile = speedscope_profile(counts, interval=0.01)
+
+        self.assertEqual(profile['shared']['frames'], [{'name': 'main', 'file': 'app.py', 'line': 1},
+                                                        {'name': 'media', 'file': 'views/media.py', 'line': 46}])
+        self.assertEqual(profile['profiles'][0]['samples'], [[0], [0, 1]])
+        self.assertEqual(profile['profiles'][0]['weights'], [0.01, 0.03])
+        self.assertAlmostEqual(profile['profiles'][0]['endValue'], 0.04)
+
+    def test_profile_to_file(self):
+        path = profile_to_file(self.profile_dir, 0.01)
+
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.basename(path).startswith('profile-{}-'.format(os.getpid())))
+
+    def test_profile_endpoint(self):
+        response = self.client.get('/admin/profile?seconds=1&all_threads=true',
+                                   headers={'X-Admin-Token': 'test admin token'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/plain')
+
+    def test_profile_endpoint_speedscope(self):
+        response = self.client.get('/admin/profile?seconds=1&format=speedscope',
+                                   headers={'X-Admin-Token': 'test admin token'})
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['profiles'][0]['type'], 'sampled')
+
+    def test_registered_worker_pids(self):
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, 'profile-worker-{}.pid'.format(os.getpid()))))
+
+        # a pid file whose process has exited, or whose pid now belongs to another command
+        stale_path = os.path.join(self.profile_dir, 'profile-worker-{}.pid'.format(os.getppid()))
+        with open(stale_path, 'wb') as pid_file:
+            pid_file.write(b'python\x00other.py\x00')
+
+        self.assertEqual(registered_worker_pids(self.profile_dir), [os.getpid()])
+        self.assertFalse(os.path.exists(stale_path))
+
+    def test_profile_signal_needs_admin_token(self):
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        current_app.config['ADMIN_TOKEN'] = None
+        other_dir = tempfile.mkdtemp()
+        current_app.config['PROFILE_DIR'] = other_dir
+        try:
+            install_profile_signal(current_app)
+
+            self.assertEqual(signal.getsignal(signal.SIGPROF), signal.SIG_DFL)
+            self.assertEqual(os.listdir(other_dir), [])
+        finally:
+            shutil.rmtree(other_dir)
+
+    def test_unregister_profile_worker(self):
+        unregister_profile_worker(self.profile_dir, os.getpid() + 1)
+
+        self.assertEqual(registered_worker_pids(self.profile_dir), [os.getpid()])
+
+        unregister_profile_worker(self.profile_dir, os.getpid())
+
+        self.assertEqual(registered_worker_pids(self.profile_dir), [])
+
+    def test_worker_without_handler_not_registered(self):
+        other_dir = tempfile.mkdtemp()
+        try:
+            with patch('profiler.signal.getsignal', return_value=signal.SIG_DFL):
+                register_profile_worker(other_dir)
+
+            self.assertEqual(registered_worker_pids(other_dir), [])
+        finally:
+            shutil.rmtree(other_dir)
+
+    def test_profile_endpoint_all_workers(self):
+        with patch('views.admin.sibling_worker_pids', return_value=[os.getpid(), 999999]), \
+                patch('views.admin.os.kill') as kill:
+            response = self.client.get('/admin/profile?workers=all', headers={'X-Admin-Token': 'test admin token'})
+        body = json.loads(response.get_data(as_text=True))
+
+        # this worker registered itself for SIGPROF when it handled the request, the other worker never did
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(body['data']['pids'], [os.getpid()])
+        kill.assert_called_once_with(os.getpid(), signal.SIGPROF)
+
+    def test_profile_endpoint_invalid_token(self):
+        response = self.client.get('/admin/profile', headers={'X-Admin-Token': 'wrong token'})
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(body['success'])
+        self.assertEqual(body['message'], 'missing or invalid admin token')
+
+    def test_profile_endpoint_disabled_without_admin_token(self):
+        current_app.config['ADMIN_TOKEN'] = None
+
+        response = self.client.get('/admin/profile', headers={'X-Admin-Token': ''})
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_profile_endpoint_invalid_seconds(self):
+        for seconds in ['0', '61', 'ten']:
+            response = self.client.get('/admin/profile?seconds={}'.format(seconds),
+                                       headers={'X-Admin-Token': 'test admin token'})
+            body = json.loads(response.get_data(as_text=True))
+
+            self.assertEqual(response.status_code, 422)
+            self.assertEqual(body['message'], 'seconds url parameter must be an integer from 1 to 60')
+
+    def test_cprofile_request(self):
+        current_app.config['PROFILE_REQUESTS'] = True
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.get('/user/testname/media',
+                                   headers={'X-Profile': 'cprofile', 'X-Admin-Token': 'test admin token'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, response.headers['X-Profile'])))
+
+        # the header does nothing without the admin token
+        response = self.client.get('/user/testname/media', headers={'X-Profile': 'cprofile'})
+
+        self.assertNotIn('X-Profile', response.headers)
@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+from base_test_case import GoGoMediaBaseTestCase
+from flask import current_app
+
+from database import db
+
+from models.user import User
+
+from slow_query_log import parameter_shapes
+
+
+class GoGoMediaSlowQueryLogTestCase(GoGoMediaBaseTestCase):
+    def setUp(self):
+        GoGoMediaBaseTestCase.setUp(self)
+        self.log_dir = tempfile.mkdtemp()
+        current_app.config['SLOW_QUERY_LOG'] = os.path.join(self.log_dir, 'slow_queries.log')
+
+    def tearDown(self):
+        current_app.config['SLOW_QUERY_THRESHOLD'] = None
+        logger = current_app.extensions.pop('slow_query_logger', None)
+        if logger is not None:
+            for handler in logger.handlers:
+                handler.close()
+        shutil.rmtree(self.log_dir)
+        GoGoMediaBaseTestCase.tearDown(self)
+
+    def log_entries(self):
+        if not os.path.exists(current_app.config['SLOW_QUERY_LOG']):
+            return []
+        with open(current_app.config['SLOW_QUERY_LOG']) as log:
+            return [json.loads(line) for line in log]
+
+    def test_slow_queries_logged_with_endpoint(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+        current_app.config['SLOW_QUERY_THRESHOLD'] = 0
+
+        response = self.client.get('/user/testname/media')
+
+        self.assertEqual(response.status_code, 200)
+        entries = self.log_entries()
+        self.assertTrue(entries)
+        for entry in entries:
+            self.assertEqual(entry['endpoint'], 'media')
+            self.assertGreaterEqual(entry['duration_ms'], 0)
+            self.assertNotIn('plan', entry)
+        user_entry = next(entry for entry in entries if 'FROM users' in entry['statement'])
+        # parameters are logged by their types, never their values
+        self.assertIn('str', user_entry['parameters'])
+        self.assertNotIn('testname', json.dumps(user_entry['parameters']))
+
+    def test_fast_queries_not_logged(self):
+        current_app.config['SLOW_QUERY_THRESHOLD'] = 60
+
+        self.client.get('/user/testname/media')
+
+        self.assertEqual(self.log_entries(), [])
+
+    def test_slow_query_log_off(self):
+        self.assertIsNone(current_app.config['SLOW_QUERY_THRESHOLD'])
+
+        self.client.get('/user/testname/media')
+
+        self.assertEqual(self.log_entries(), [])
+
+    def test_parameter_shapes(self):
+        self.assertEqual(parameter_shapes({'username': 'testname', 'id': 1}), {'username': 'str', 'id': 'int'})
+        self.assertEqual(parameter_shapes(('testname', 1, None)), ['str', 'int', 'NoneType'])
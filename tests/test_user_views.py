@@ -70,6 +70,7 @@ class GoGoMediaUserViewsTestCase(GoGoMediaBaseTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(body['success'])
         self.assertIsInstance(body['auth_token'], str)
+        self.assertIsInstance(body['refresh_token'], str)
 
     def test_login_missing_request_body_params(self):
         response = self.client.post('/login',
@@ -125,14 +126,97 @@ class GoGoMediaUserViewsTestCase(GoGoMediaBaseTestCase):
                                     content_type='application/json')
         body = json.loads(response.get_data(as_text=True))
         auth_token = body['auth_token']
+        refresh_token = body['refresh_token']
 
-        response = self.client.get('/logout', headers={'Authorization': 'JWT ' + auth_token})
+        response = self.client.post('/logout',
+                                    headers={'Authorization': 'JWT ' + auth_token},
+                                    data=json.dumps({'refresh_token': refresh_token}),
+                                    content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body['success'])
+
+        # access tokens are short lived instead of blacklisted, logging out revokes the refresh token
+        self.assertIsNone(BlacklistedToken.query.filter_by(token=auth_token).first())
+
+        response = self.client.post('/refresh',
+                                    data=json.dumps({'refresh_token': refresh_token}),
+                                    content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(body['message'], 'refresh token revoked')
+
+    def test_logout_body_not_an_object(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.post('/login',
+                                    data=json.dumps({'username': 'testname', 'password': 'P@ssw0rd'}),
+                                    content_type='application/json')
+        auth_token = json.loads(response.get_data(as_text=True))['auth_token']
+
+        for data in ['[1]', '"refresh_token"', 'not json']:
+            response = self.client.post('/logout',
+                                        headers={'Authorization': 'JWT ' + auth_token},
+                                        data=data,
+                                        content_type='application/json')
+
+            self.assertEqual(response.status_code, 200)
+
+    def test_refresh(self):
+        user = User('testname', 'P@ssw0rd')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.post('/login',
+                                    data=json.dumps({'username': 'testname', 'password': 'P@ssw0rd'}),
+                                    content_type='application/json')
+        first_refresh_token = json.loads(response.get_data(as_text=True))['refresh_token']
+
+        response = self.client.post('/refresh',
+                                    data=json.dumps({'refresh_token': first_refresh_token}),
+                                    content_type='application/json')
         body = json.loads(response.get_data(as_text=True))
 
         self.assertEqual(response.status_code, 200)
         self.assertTrue(body['success'])
+        self.assertEqual(User.decode_auth_token(body['auth_token']), user.id)
+        second_refresh_token = body['refresh_token']
+        self.assertNotEqual(second_refresh_token, first_refresh_token)
 
-        blacklisted_token = BlacklistedToken.query.filter_by(token=auth_token).first()
+        # reusing a refresh token means it was stolen, so every refresh token in its family is revoked
+        response = self.client.post('/refresh',
+                                    data=json.dumps({'refresh_token': first_refresh_token}),
+                                    content_type='application/json')
 
-        self.assertIsNotNone(blacklisted_token)
-        self.assertEqual(blacklisted_token.token, auth_token)
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.post('/refresh',
+                                    data=json.dumps({'refresh_token': second_refresh_token}),
+                                    content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(body['message'], 'refresh token revoked')
+
+    def test_refresh_invalid_refresh_token(self):
+        response = self.client.post('/refresh', data=json.dumps({}), content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(body['message'], 'missing parameter \'refresh_token\'')
+
+        response = self.client.post('/refresh', data=json.dumps('refresh_token'), content_type='application/json')
+
+        self.assertEqual(response.status_code, 422)
+
+        response = self.client.post('/refresh',
+                                    data=json.dumps({'refresh_token': 'not a refresh token'}),
+                                    content_type='application/json')
+        body = json.loads(response.get_data(as_text=True))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(body['message'], 'invalid refresh token')
@@ -0,0 +1,81 @@
+import os
+import signal
+
+from flask import request, jsonify, Response, current_app
+
+from logic.login import admin_token_valid
+
+from profiler import sample_stacks, collapsed_stacks, speedscope_profile, sibling_worker_pids, registered_worker_pids
+
+# the longest a profile request can sample for
+max_profile_seconds = 60
+profile_formats = {'collapsed', 'speedscope'}
+
+
+def profile():
+    """
+    profile accepts a GET request with the ADMIN_TOKEN in an X-Admin-Token header, samples the stacks of the request
+    handlers running in this worker's other threads, and returns them as a flamegraph profile, without restarting
+    or slowing the worker down noticeably.
+        a request arg 'seconds' can be set to how long to sample for, from 1 to 60, 10 by default
+        a request arg 'format' can be set to 'collapsed' (the default), for collapsed stacks as text, or 'speedscope',
+            for a speedscope JSON file
+        a request arg 'all_threads' can be set to 'true' to keep samples of threads that aren't running a request
+            handler in views/
+        a request arg 'workers' can be set to 'all' to send SIGPROF to every worker instead, including this one, so each
+            samples itself for PROFILE_SECONDS in the background and writes its collapsed stacks to PROFILE_DIR. The
+            response is then a 202 with the pids of the workers. Single threaded workers can only be profiled this way.
+            Only workers that registered their SIGPROF handler in PROFILE_DIR are signalled, since the signal kills a
+            process without one.
+    """
+    if not admin_token_valid():
+        return jsonify({
+            'success': False,
+            'message': 'missing or invalid admin token'
+        }), 401
+
+    validation_result = validate_profile_url_parameters()
+    if validation_result is not None:
+        return validation_result
+
+    if request.args.get('workers') == 'all':
+        registered = registered_worker_pids(current_app.config['PROFILE_DIR'])
+        pids = [pid for pid in sibling_worker_pids() if pid in registered]
+        for pid in pids:
+            os.kill(pid, signal.SIGPROF)
+
+        return jsonify({
+            'success': True,
+            'message': 'signalled workers to profile themselves',
+            'data': {
+                'pids': pids,
+                'seconds': current_app.config['PROFILE_SECONDS'],
+                'directory': current_app.config['PROFILE_DIR']
+            }
+        }), 202
+
+    counts = sample_stacks(int(request.args.get('seconds', 10)), only_views=request.args.get('all_threads') != 'true')
+
+    if request.args.get('format') == 'speedscope':
+        return jsonify(speedscope_profile(counts, name='worker {}'.format(os.getpid())))
+
+    return Response(collapsed_stacks(counts), mimetype='text/plain')
+
+
+def validate_profile_url_parameters():
+    """
+    validate_profile_url_parameters checks the url parameters of a profile request
+    @return: None if there is no issue, otherwise a JSON response with a detailed message on what was wrong
+    """
+    seconds = request.args.get('seconds')
+    if seconds is not None and (not seconds.isdigit() or not 1 <= int(seconds) <= max_profile_seconds):
+        return jsonify({
+            'success': False,
+            'message': 'seconds url parameter must be an integer from 1 to {}'.format(max_profile_seconds)
+        }), 422
+
+    if 'format' in request.args and request.args.get('format') not in profile_formats:
+        return jsonify({
+            'success': False,
+            'message': 'format url parameter must be \'collapsed\' or \'speedscope\''
+        }), 422
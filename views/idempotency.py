@@ -0,0 +1,101 @@
+import datetime
+import hashlib
+from functools import wraps
+
+from flask import request, jsonify, make_response, Response, current_app
+
+from database import db
+
+from logic.idempotency_key import claim_idempotency_key, finish_idempotency_key, release_idempotency_key
+from logic.user import get_user
+
+# the methods an Idempotency-Key header is honoured on, other requests ignore it
+idempotent_methods = {'POST', 'PUT', 'DELETE'}
+max_idempotency_key_length = 255
+
+
+def idempotent(f):
+    """
+    idempotent lets a client retry a write to a user's url safely, by sending the same Idempotency-Key header with each
+    try. The first request with a key runs and its response is stored, retries get the stored response replayed, with
+    an Idempotent-Replayed header, without running the write again. Responses with a 5xx status aren't stored, so
+    their retries run again. Retries of a request that is still running, or whose worker stopped before its response
+    was stored, get a 409 rather than running the write again. Keys are per user, and kept for IDEMPOTENCY_KEY_TTL.
+    Requests without the header, with another method, and streamed PUTs, which are read as they run, are run as usual.
+    It goes under login_required, and takes the same (logged_in_user, username) arguments as the view it wraps.
+    """
+    @wraps(f)
+    def decorated_function(logged_in_user, username, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None or request.method not in idempotent_methods or request.args.get('stream') == 'true':
+            return f(logged_in_user, username, *args, **kwargs)
+
+        if not 0 < len(key) <= max_idempotency_key_length:
+            return jsonify({
+                'success': False,
+                'message': 'Idempotency-Key header must be 1 to {} characters'.format(max_idempotency_key_length)
+            }), 422
+
+        user = get_user(username)
+        if user is None or (logged_in_user is not None and logged_in_user.id != user.id):
+            # the view responds with the validation error, there is nothing to store
+            return f(logged_in_user, username, *args, **kwargs)
+
+        stored, claimed = claim_idempotency_key(user.id, key, hash_request())
+        if not claimed:
+            return replay_response(stored)
+
+        try:
+            response = make_response(f(logged_in_user, username, *args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            release_idempotency_key(stored)
+            raise
+
+        if response.status_code >= 500:
+            release_idempotency_key(stored)
+        else:
+            finish_idempotency_key(stored, response.status_code, response.get_data(as_text=True))
+
+        return response
+
+    return decorated_function
+
+
+def hash_request():
+    """
+    hash_request returns a hash of the request's method, path, url parameters and body
+    """
+    request_hash = hashlib.sha256()
+    request_hash.update(request.method.encode('utf-8') + b'\n' + request.full_path.encode('utf-8') + b'\n')
+    request_hash.update(request.get_data())
+
+    return request_hash.hexdigest()
+
+
+def replay_response(stored):
+    """
+    replay_response returns the response to a retry of a request whose Idempotency-Key is stored
+    """
+    if stored.request_hash != hash_request():
+        return jsonify({
+            'success': False,
+            'message': 'Idempotency-Key was already used for a different request'
+        }), 422
+
+    if stored.status_code is None:
+        if stored.created_on < datetime.datetime.now() - current_app.config['IDEMPOTENCY_KEY_TIMEOUT']:
+            return jsonify({
+                'success': False,
+                'message': 'a request with this Idempotency-Key didn\'t finish, and may have been applied'
+            }), 409
+
+        return jsonify({
+            'success': False,
+            'message': 'a request with this Idempotency-Key is still in progress'
+        }), 409
+
+    response = Response(stored.response, status=stored.status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+
+    return response
@@ -1,2 +1,15 @@
+from flask import jsonify
+
+from auth_keys import get_keyring
+
+
 def index():
     return 'Hello World'
+
+
+def jwks():
+    """
+    jwks returns the public keys that verify auth tokens as a JSON Web Key Set, so other services can verify tokens
+    without calling this app
+    """
+    return jsonify(get_keyring().jwks())
@@ -0,0 +1,32 @@
+from flask import jsonify
+
+from logic.job import get_job
+from logic.user import get_user
+from logic.login import login_required
+
+from views.media import validate_url_username
+
+
+@login_required
+def job(logged_in_user, username, job_id):
+    """
+    job accepts a GET request and returns the status of a background job queued by the user specified by username,
+    along with its result once it has finished, or its error if it failed
+    """
+    user = get_user(username)
+    validation_result = validate_url_username(logged_in_user, user)
+    if validation_result is not None:
+        return validation_result
+
+    queued_job = get_job(job_id)
+    if queued_job is None or queued_job.user != user.id:
+        return jsonify({
+            'success': False,
+            'message': 'job does not exist'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'message': 'successfully retrieved job',
+        'data': queued_job.as_dict()
+    })
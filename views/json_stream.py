@@ -0,0 +1,98 @@
+import codecs
+import json
+
+# number of bytes read from the request body at a time
+read_size = 64 * 1024
+
+# most characters one array element can take, a malformed element is reported once this much of it is buffered
+# instead of reading the rest of the body looking for its end
+max_element_size = 1024 * 1024
+
+whitespace = ' \t\n\r'
+
+
+class ElementTooLargeError(ValueError):
+    """
+    ElementTooLargeError results when an element of a streamed JSON array is longer than max_element_size
+    usually results in 422 HTTP response
+    """
+    pass
+
+
+def parse_json_array_rows(stream):
+    """
+    parse_json_array_rows reads a JSON array from a binary stream a piece at a time, and yields its elements as they
+    are parsed, so only the element being parsed (and the rest of the last piece read) is held in memory
+    @return: a generator of (array index, element) tuples
+    @raise ValueError: if the stream isn't a JSON array, once the elements before the problem have been yielded
+    @raise ElementTooLargeError: if an element, valid or not, is longer than max_element_size characters
+    """
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def read_more():
+        nonlocal buffer, position, eof
+        data = stream.read(read_size)
+        eof = not data
+        # drop what has already been parsed so the buffer doesn't grow with the document
+        buffer = buffer[position:] + utf8_decoder.decode(data, final=eof)
+        position = 0
+
+    def skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in whitespace:
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            read_more()
+
+    skip_whitespace()
+    if buffer[position:position + 1] != '[':
+        raise ValueError('request body must be a JSON array')
+    position += 1
+
+    skip_whitespace()
+    if buffer[position:position + 1] == ']':
+        return
+
+    def read_more_of_element():
+        if len(buffer) - position > max_element_size:
+            raise ElementTooLargeError('element {} of the request body must be at most {} characters'.format(
+                index, max_element_size))
+        read_more()
+
+    index = 0
+    while True:
+        while True:
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise ValueError('element {} of the request body isn\'t valid JSON'.format(index))
+                read_more_of_element()
+                continue
+
+            if end == len(buffer) and not eof:
+                # a number at the end of the buffer may continue in the next piece
+                read_more_of_element()
+                continue
+
+            position = end
+            break
+
+        yield index, element
+        index += 1
+
+        skip_whitespace()
+        separator = buffer[position:position + 1]
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError('request body must be a JSON array')
+
+        skip_whitespace()
@@ -1,11 +1,59 @@
+import itertools
+
 from flask import request, jsonify, current_app
 
-from models.media import mediums, consumed_states
+from models.media import mediums, consumed_states, media_fields
 
-from logic.media import get_media, add_media, update_media, remove_media, get_media_by_id
+from logic.media import get_media_records, get_media_json, add_media, add_media_rows, update_media, remove_media, \
+    get_media_by_id, move_media, reorder_media, count_media_owned_by_user, count_user_media, \
+    get_media_owned_by_user, suggest_media_names, get_media_stats, upsert_media, upsert_media_rows, remove_media_list, \
+    commit_media
+from logic.job import enqueue_job
 from logic.user import get_user
 from logic.login import login_required
 
+from database import no_expire_on_commit
+
+from views.json_stream import parse_json_array_rows, ElementTooLargeError
+from views.idempotency import idempotent
+
+# number of media elements validated and written at a time by a streamed PUT
+put_stream_batch_size = 1000
+
+# the most operations a batch request can have
+max_batch_operations = 1000
+batch_operations = ('create', 'update', 'delete', 'move')
+
+# the longest name and description a media element can have, the lengths of their columns
+max_name_length = 80
+max_description_length = 500
+
+# the messages put_body_errors returns for each kind of error
+put_body_messages = {
+    'missing': 'missing parameter \'name\' or parameter \'id\'',
+    'body': 'media element must be a JSON object',
+    'id': 'id parameter must be type integer',
+    'name': 'name parameter must be type string',
+    'name_length': 'name parameter must be at most {} characters'.format(max_name_length),
+    'medium': 'medium parameter must be \'film\', \'audio\', \'literature\', or \'other\'',
+    'consumed_state': 'consumed_state parameter must be \'not started\', \'started\', or \'finished\'',
+    'description': 'description parameter must be type string',
+    'description_length': 'description parameter must be at most {} characters'.format(max_description_length),
+    'order': 'order parameter must be type integer'
+}
+
+# the messages batch_operation_errors returns for each kind of error, besides those of put_body_errors
+batch_messages = {
+    'body': 'operation must be a JSON object',
+    'op': 'op parameter must be \'create\', \'update\', \'delete\', or \'move\'',
+    'create_id': 'create operation must not have an id parameter',
+    'missing_id': 'missing parameter \'id\'',
+    'id': 'id parameter must be type integer',
+    'position': 'position parameter must be type integer',
+    'position_negative': 'position parameter must not be negative',
+    'deleted': 'media element was deleted by an earlier operation'
+}
+
 # Note: It may seem like pluggable view with method based dispatching would make sense here. But because of how
 # I implement login_required, and add a parameter logged_in_user, it would not work. The ViewMethod class would
 # have methods that need to accept self as the first argument, which would screw up the login_required implementation
@@ -20,12 +68,13 @@ class UnauthorizedError(Exception):
 
 
 @login_required
+@idempotent
 def media(logged_in_user, username):
     """
     media accepts a PUT request with JSON that matches
         {
             'id': a number representing the id of an existing media element to update
-            'name': a string representing the name of the media to insert/update
+            'name': a string representing the name of the media to insert/update (maximum 80 characters)
             'medium': a string indicating the type of this media
                 represents an Enum of possible values ('film', 'audio', 'literature', 'other')
             'consumed_state': a string indicating the current consumed state of this media
@@ -34,21 +83,32 @@ def media(logged_in_user, username):
             'order': an integer indicating the order this media should be displayed on the frontend
         }
     or an array of JSON objects that matches the above (to update multiple items in one request)
+        a request arg 'stream' can be set to 'true' to have an array parsed as it is read, and added/updated
+            put_stream_batch_size elements at a time, so large arrays don't have to fit in memory. Each batch is
+            written before the next is read, so the batches before an invalid element stay written.
 
     media accepts a GET request and returns all the media associated with the user specified by username
         a request arg 'consumed-state' can be set to 'not-started', 'started', or 'finished', and only media with the
             same consumed state will be returned
         a request arg 'medium' can be set to 'film', 'audio', 'literature', or 'other' and only media with the same
             medium will be returned
+        a request arg 'q' can be set to a search string, and only media whose name or description matches every word
+            of the search string will be returned, best matches first
+        a request arg 'fields' can be set to a comma separated list of 'id', 'name', 'medium', 'consumed_state',
+            'description', and 'order', and only those fields of each media element will be loaded and returned
         if no request arg is present, all media will be returned
 
     media accepts a DELETE request with formdata that matches
         {
             'id': a number representing the id of the media to delete
         }
+    or
+        {
+            'ids': an array of numbers representing the ids of the media to delete
+        }
+        a request arg 'async' can be set to 'true' to queue the delete as a background job, the response is then a 202
+            with the job
     """
-    body = request.get_json()
-
     # This user is the one specified in url parameters, must match the auth token user
     user = get_user(username)
     validation_result = validate_url_username(logged_in_user, user)
@@ -67,40 +127,72 @@ def media(logged_in_user, username):
         if consumed_state == 'not-started':
             consumed_state = 'not started'
 
-        media_list = get_media(username, medium, consumed_state)
+        q = request.args.get('q')
+
+        fields = None
+        if 'fields' in request.args:
+            fields = request.args.get('fields').split(',')
+
+        if current_app.config['MEDIA_JSON_AGG']:
+            # the database builds the data array, so it is passed through to the response without being decoded
+            return current_app.response_class(
+                '{"success": true, "message": "successfully got media for the logged in user", "data": ' +
+                get_media_json(username, medium, consumed_state, q, fields) + '}',
+                mimetype='application/json')
+
+        media_records = get_media_records(username, medium, consumed_state, q, fields)
 
         return jsonify({
             'success': True,
             'message': 'successfully got media for the logged in user',
-            'data': [media.as_dict() for media in media_list]
+            'data': [record.as_dict(fields) for record in media_records]
         })
     elif request.method == 'PUT':
+        if request.args.get('stream') == 'true':
+            return put_media_stream(user)
+
+        body = request.get_json()
         if isinstance(body, list):
             # validate each media element in list before adding any of them
-            for body_segment in body:
-                validation_result = validate_put_body_parameters(body_segment)
-                if validation_result is not None:
+            errors = put_body_list_errors(body)
+            if errors:
+                return jsonify({
+                    'success': False,
+                    'message': errors[0]['messages'][0],
+                    'errors': errors
+                }), 422
+
+            # commits don't expire the loaded media, so each element is serialized from the values it was written
+            # with, and the elements loaded for the ownership check are updated without loading them again. Every
+            # element is written in one transaction, so either the whole array is written or none of it is.
+            with no_expire_on_commit():
+                # loads every media element being updated with one query, and checks they all belong to this user
+                ids = {body_segment['id'] for body_segment in body if 'id' in body_segment}
+                owned_media = get_media_owned_by_user(user.id, ids) if ids else []
+                if len(owned_media) != len(ids):
+                    # If there is no media with one of the ids, or it belongs to another user
                     return jsonify({
                         'success': False,
-                        'message': validation_result
-                    }), 422
+                        'message': 'logged in user doesn\'t have media with given id'
+                    }), 401
 
-                if 'id' in body_segment:
-                    media = get_media_by_id(body_segment['id'])
-                    if media is None or media.user != user.id:
-                        # If there is no media with this id, or it belongs to another user
-                        return jsonify({
-                            'success': False,
-                            'message': 'logged in user doesn\'t have media with given id'
-                        }), 401
+                # with the natural key, the new elements are upserted together, usually with one statement
+                upserted = {}
+                if current_app.config['MEDIA_UPSERT_NATURAL_KEY']:
+                    upserted = upsert_media_rows(user.id, [body_segment for body_segment in body
+                                                           if 'id' not in body_segment], commit=False)
 
-            media_list = []
+                media_list = []
 
-            for body_segment in body:
-                # the validation in upsert_media_from_body is done above, so it can't throw an error
-                media = upsert_media_from_body(body_segment, user)
+                for body_segment in body:
+                    if 'id' in body_segment or not current_app.config['MEDIA_UPSERT_NATURAL_KEY']:
+                        media = upsert_media_from_body(body_segment, user, commit=False)
+                    else:
+                        media = upserted[body_segment['name']]
 
-                media_list.append(media.as_dict())
+                    media_list.append(media.as_dict())
+
+                commit_media(user.id)
 
             return jsonify({
                 'success': True,
@@ -108,49 +200,294 @@ def media(logged_in_user, username):
                 'data': media_list
             })
         else:
-            try:
-                media = upsert_media_from_body(body, user)
-            except ValueError as e:
+            errors = put_body_errors(body)
+            if errors:
                 return jsonify({
                     'success': False,
-                    'message': str(e)
+                    'message': errors[0],
+                    'errors': errors
                 }), 422
-            except UnauthorizedError as e:
-                return jsonify({
-                    'success': False,
-                    'message': str(e)
-                }), 401
 
-            return jsonify({
-                'success': True,
-                'message': 'successfully added/updated media element',
-                'data': media.as_dict()
-            })
+            with no_expire_on_commit():
+                try:
+                    media = upsert_media_from_body(body, user)
+                except UnauthorizedError as e:
+                    return jsonify({
+                        'success': False,
+                        'message': str(e)
+                    }), 401
+
+                return jsonify({
+                    'success': True,
+                    'message': 'successfully added/updated media element',
+                    'data': media.as_dict()
+                })
     else:  # request.method == 'DELETE'
+        body = request.get_json()
         validation_result = validate_delete_body_parameters(body)
         if validation_result is not None:
             return validation_result
 
-        media = remove_media(body['id'])
+        ids = body['ids'] if 'ids' in body else [body['id']]
+        if request.args.get('async') == 'true':
+            job = enqueue_job(user.id, 'delete_media', {'ids': ids})
+            return jsonify({
+                'success': True,
+                'message': 'queued job to delete media elements',
+                'data': job.as_dict()
+            }), 202
+
+        if 'ids' in body:
+            remove_media_list(user.id, ids)
+            return jsonify({
+                'success': True,
+                'message': 'successfully deleted media elements'
+            })
+
+        media = remove_media(body['id'], user.id)
         return jsonify({
             'success': True,
             'message': 'successfully deleted media element'
         })
 
 
-def upsert_media_from_body(body, user):
+@login_required
+def media_order(logged_in_user, username):
+    """
+    media_order accepts a PUT request with JSON that matches
+        {
+            'id': a number representing the id of the media element to move
+            'position': a non-negative integer indicating the new order value of this media element, the media
+                elements in between the old and new positions are shifted by one
+        }
+    or JSON that matches
+        {
+            'ids': an array of the ids of all of the user's media in the order they should be displayed, the first id
+                gets order 0, the second gets order 1, and so on
+        }
+    either way the renumbering is done by the database in a single statement
+    """
+    body = request.get_json()
+
+    user = get_user(username)
+    validation_result = validate_url_username(logged_in_user, user)
+    if validation_result is not None:
+        return validation_result
+
+    validation_result = validate_order_body_parameters(body)
+    if validation_result is not None:
+        return validation_result
+
+    ids = body['ids'] if 'ids' in body else [body['id']]
+    if count_media_owned_by_user(user.id, ids) != len(set(ids)):
+        # If there is no media with one of these ids, or it belongs to another user
+        return jsonify({
+            'success': False,
+            'message': 'logged in user doesn\'t have media with given id'
+        }), 401
+
+    if 'ids' in body and count_user_media(user.id) != len(ids):
+        # a partial list would renumber its media into the orders the rest of the list already has
+        return jsonify({
+            'success': False,
+            'message': 'ids parameter must contain every media element of the user'
+        }), 422
+
+    if 'ids' in body:
+        reorder_media(user.id, body['ids'])
+    else:
+        move_media(user.id, body['id'], body['position'])
+
+    return jsonify({
+        'success': True,
+        'message': 'successfully reordered media'
+    })
+
+
+@login_required
+@idempotent
+def media_batch(logged_in_user, username):
+    """
+    media_batch accepts a POST request with JSON that matches
+        {
+            'operations': an array of up to max_batch_operations operations, each one of
+                {'op': 'create', and the parameters of a PUT media element without an 'id'}
+                {'op': 'update', and the parameters of a PUT media element with an 'id'}
+                {'op': 'delete', 'id': the id of the media element to delete}
+                {'op': 'move', 'id': the id of the media element to move, 'position': its new order value}
+        }
+    and applies the operations in order, in one transaction, so either all of them are written or none are. Every
+    operation is validated, and the ids of all of them are checked to belong to the user with one query, before any is
+    applied. The response data has a result for each operation, in the same order.
+    """
+    body = request.get_json()
+
+    user = get_user(username)
+    validation_result = validate_url_username(logged_in_user, user)
+    if validation_result is not None:
+        return validation_result
+
+    validation_result = validate_batch_body_parameters(body)
+    if validation_result is not None:
+        return validation_result
+
+    operations = body['operations']
+    errors = batch_operation_list_errors(operations)
+    if errors:
+        return jsonify({
+            'success': False,
+            'message': errors[0]['messages'][0],
+            'errors': errors
+        }), 422
+
+    # loads every media element the operations change with one query, and checks they all belong to this user. They
+    # are kept referenced, so they stay in the session and the operations don't load them again.
+    ids = {operation['id'] for operation in operations if operation['op'] != 'create'}
+    owned_media = get_media_owned_by_user(user.id, ids) if ids else []
+    if len(owned_media) != len(ids):
+        # If there is no media with one of the ids, or it belongs to another user
+        return jsonify({
+            'success': False,
+            'message': 'logged in user doesn\'t have media with given id'
+        }), 401
+
+    # each operation only flushes its writes, an error rolls back the whole transaction when the request ends
+    results = [apply_batch_operation(operation, user) for operation in operations]
+    commit_media(user.id)
+
+    return jsonify({
+        'success': True,
+        'message': 'successfully applied media operations',
+        'data': results
+    })
+
+
+@login_required
+def media_stats(logged_in_user, username):
+    """
+    media_stats accepts a GET request and returns how many media elements the user specified by username has for
+    every combination of medium and consumed_state
+    """
+    user = get_user(username)
+    validation_result = validate_url_username(logged_in_user, user)
+    if validation_result is not None:
+        return validation_result
+
+    return jsonify({
+        'success': True,
+        'message': 'successfully got media stats for the logged in user',
+        'data': get_media_stats(user.id)
+    })
+
+
+@login_required
+def media_suggestions(logged_in_user, username):
+    """
+    media_suggestions accepts a GET request and returns the media names of the user specified by username that best
+    match what the user has typed so far, for typeahead
+        a request arg 'q' is required and is the text typed so far, names starting with it come first followed by
+            names that are similar to it
+        a request arg 'limit' can be set to an integer between 1 and 50 to change the number of suggestions returned,
+            it defaults to 10
+    """
+    user = get_user(username)
+    validation_result = validate_url_username(logged_in_user, user)
+    if validation_result is not None:
+        return validation_result
+
+    validation_result = validate_suggestions_url_parameters()
+    if validation_result is not None:
+        return validation_result
+
+    suggestions = suggest_media_names(user.id, request.args.get('q'), request.args.get('limit', 10, type=int))
+
+    return jsonify({
+        'success': True,
+        'message': 'successfully got media suggestions for the logged in user',
+        'data': [{'id': id, 'name': name} for id, name in suggestions]
+    })
+
+
+def put_media_stream(user):
+    """
+    put_media_stream adds/updates the media elements of an array PUT body for the given user as the body is read.
+    Each batch of put_stream_batch_size elements is validated, has its media loaded and checked with one query, and is
+    written, with one INSERT for its new elements, and committed as one transaction before the next batch is parsed.
+    @return: a JSON response, whose data is how many media elements were added and updated, even if there was an error
+    """
+    written = {'added': 0, 'updated': 0}
+    rows = parse_json_array_rows(request.stream)
+
+    while True:
+        try:
+            batch = list(itertools.islice(rows, put_stream_batch_size))
+        except ElementTooLargeError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e),
+                'data': written
+            }), 422
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e),
+                'data': written
+            }), 400
+
+        if not batch:
+            break
+
+        elements = [element for index, element in batch]
+        errors = put_body_list_errors(elements, start=batch[0][0])
+        if errors:
+            return jsonify({
+                'success': False,
+                'message': errors[0]['messages'][0],
+                'errors': errors,
+                'data': written
+            }), 422
+
+        # the loaded media stay in the session, so update_media finds them again without a query
+        ids = {element['id'] for element in elements if 'id' in element}
+        owned_media = get_media_owned_by_user(user.id, ids) if ids else []
+        if len(owned_media) != len(ids):
+            return jsonify({
+                'success': False,
+                'message': 'logged in user doesn\'t have media with given id',
+                'data': written
+            }), 401
+
+        # the INSERT goes first, since a failed one rolls the transaction back
+        added = add_media_rows(user.id, [element for element in elements if 'id' not in element], commit=False)
+        updated = 0
+        for element in elements:
+            if 'id' in element:
+                update_media(element['id'], element.get('name'), element.get('medium'), element.get('consumed_state'),
+                             element.get('description'), element.get('order'), user.id, commit=False)
+                updated += 1
+        commit_media(user.id)
+
+        written['added'] += added
+        written['updated'] += updated
+
+    return jsonify({
+        'success': True,
+        'message': 'successfully added/updated media elements',
+        'data': written
+    })
+
+
+def upsert_media_from_body(body, user, commit=True):
     """
     upsert_media_from_body takes some dict that represents a media element and the user the media is for, and
     inserts/updates the media
-    @param body: a python dict representing a media element
+    @param body: a python dict representing a media element, already checked with put_body_errors
     @param user: the currently logged in user
-    @return: The newly inserted/updated media element if there was no error, or a JSON response if there was an issue
-        validating/inserting/updating the media
+    @param commit: if False the write is only flushed, and the caller finishes the transaction with commit_media
+    @return: The newly inserted/updated media element. With MEDIA_UPSERT_NATURAL_KEY enabled a body without an id is
+        upserted on the user's medianame, and a MediaRecord is returned.
+    @raise UnauthorizedError: if the body's id isn't the id of one of the user's media elements
     """
-    validation_result = validate_put_body_parameters(body)
-    if validation_result is not None:
-        raise ValueError(validation_result)
-
     medianame = None
     if 'name' in body:
         medianame = body['name']
@@ -172,22 +509,47 @@ def upsert_media_from_body(body, user):
         order = body['order']
 
     if 'id' in body:
-        media = get_media_by_id(body['id'])
-        if media is None or media.user != user.id:
+        media = get_media_by_id(body['id'], user.id)
+        if media is None:
             # If there is no media with this id, or it belongs to another user
             raise UnauthorizedError('logged in user doesn\'t have media with given id')
 
-        media = update_media(body['id'], medianame, medium, consumed_state, description, order)
+        media = update_media(body['id'], medianame, medium, consumed_state, description, order, user.id, commit)
+    elif current_app.config['MEDIA_UPSERT_NATURAL_KEY']:
+        media = upsert_media(user.id, medianame, medium, consumed_state, description, order, commit)
     else:
         media = add_media(user.id, medianame,
                           medium if medium is not None else 'other',
                           consumed_state if consumed_state is not None else 'not started',
                           description if description is not None else '',
-                          order if order is not None else 0)
+                          order if order is not None else 0,
+                          commit)
 
     return media
 
 
+def apply_batch_operation(operation, user):
+    """
+    apply_batch_operation applies one operation of a batch request for the given user, without committing it
+    @param operation: a python dict representing an operation, already checked with batch_operation_errors, whose id
+        belongs to the user
+    @return: a dict of the operation's result, {'op': the operation, 'data': the media element written for create and
+        update, or {'id': id} for delete, or {'id': id, 'order': position} for move}
+    """
+    kind = operation['op']
+
+    if kind == 'delete':
+        remove_media(operation['id'], user.id, commit=False)
+        data = {'id': operation['id']}
+    elif kind == 'move':
+        move_media(user.id, operation['id'], operation['position'], commit=False)
+        data = {'id': operation['id'], 'order': operation['position']}
+    else:
+        data = upsert_media_from_body(operation, user, commit=False).as_dict()
+
+    return {'op': kind, 'data': data}
+
+
 def validate_url_username(logged_in_user, url_user):
     """
 
@@ -228,40 +590,173 @@ def validate_get_url_parameters():
             'message': 'medium url parameter must be \'film\', \'audio\', \'literature\', or \'other\''
         }), 422
 
+    if 'fields' in request.args and not set(request.args.get('fields').split(',')) <= set(media_fields):
+        return jsonify({
+            'success': False,
+            'message': 'fields url parameter must be a comma separated list of \'id\', \'name\', \'medium\', '
+                       '\'consumed_state\', \'description\', or \'order\''
+        }), 422
+
+
+def validate_suggestions_url_parameters():
+    """
+    validate_suggestions_url_parameters checks the url parameters specified on a suggestions GET request
+    @return: None if there is no issue, otherwise a JSON response with a detailed message on what was wrong
+    """
+    if not request.args.get('q'):
+        return jsonify({
+            'success': False,
+            'message': 'missing url parameter \'q\''
+        }), 422
+
+    limit = request.args.get('limit', type=int)
+    if 'limit' in request.args and (limit is None or not 1 <= limit <= 50):
+        return jsonify({
+            'success': False,
+            'message': 'limit url parameter must be an integer between 1 and 50'
+        }), 422
+
 
 def validate_put_body_parameters(body):
     """
     validate_put_body_parameters checks the body JSON, and makes sure the parameters are the correct type
     @return: None if there is no issue, otherwise a string with a detailed message on what was wrong
     """
-    if 'id' not in body and 'name' not in body:
-        # If id isn't in body, then this must be a new media element, and name is required
-        return 'missing parameter \'name\' or parameter \'id\''
+    errors = put_body_errors(body)
+    if errors:
+        return errors[0]
+
+
+def put_body_errors(body):
+    """
+    put_body_errors checks a media element of a PUT body in one pass, without stopping at the first error. The checks
+    are written out rather than looped over, since this runs once for every element of an array PUT.
+    @return: a list of detailed messages on everything that was wrong, empty if there is no issue
+    """
+    if not isinstance(body, dict):
+        return [put_body_messages['body']]
 
-    if 'id' in body and not isinstance(body['id'], int):
-        # return malformed parameters response if 'id' is not of type integer
-        return 'id parameter must be type integer'
+    errors = []
+    if 'id' in body:
+        if not isinstance(body['id'], int):
+            errors.append(put_body_messages['id'])
+    elif 'name' not in body:
+        # If id isn't in body, then this must be a new media element, and name is required
+        errors.append(put_body_messages['missing'])
 
-    if 'name' in body and not isinstance(body['name'], str):
-        # return malformed parameters response if 'name' is not of type string
-        return 'name parameter must be type string'
+    if 'name' in body:
+        if not isinstance(body['name'], str):
+            errors.append(put_body_messages['name'])
+        elif len(body['name']) > max_name_length:
+            errors.append(put_body_messages['name_length'])
 
-    if 'medium' in body and body['medium'] not in mediums:
-        # return malformed parameters response if 'medium' isn't a valid medium type
-        return 'medium parameter must be \'film\', \'audio\', \'literature\', or \'other\''
+    if 'medium' in body and (not isinstance(body['medium'], str) or body['medium'] not in mediums):
+        errors.append(put_body_messages['medium'])
 
-    if 'consumed_state' in body and body['consumed_state'] not in consumed_states:
-        # return malfromed parameters response if 'consumed_state' isn't a valid consumed state
-        return 'consumed_state parameter must be \'not started\', \'started\', or \'finished\''
+    if 'consumed_state' in body and (not isinstance(body['consumed_state'], str) or
+                                     body['consumed_state'] not in consumed_states):
+        errors.append(put_body_messages['consumed_state'])
 
-    if 'description' in body and not isinstance(body['description'], str):
-        # return malformed parameters response if 'description' isn't of type string
-        return 'description parameter must be type string'
+    if 'description' in body:
+        if not isinstance(body['description'], str):
+            errors.append(put_body_messages['description'])
+        elif len(body['description']) > max_description_length:
+            errors.append(put_body_messages['description_length'])
 
     if 'order' in body and not isinstance(body['order'], int):
         # TODO validate the range of this number?
-        # return malformed parameters response if 'order' isn't of type int
-        return 'order parameter must be type integer'
+        errors.append(put_body_messages['order'])
+
+    return errors
+
+
+def put_body_list_errors(body, start=0):
+    """
+    put_body_list_errors checks every media element of an array PUT body, each one only once
+    @param start: the array index of the first element of body, when body is only part of the array
+    @return: a list of {'index': position in the array, 'messages': list of messages} dicts, one for each media element
+        that was wrong, empty if there is no issue
+    """
+    return [{'index': index, 'messages': errors}
+            for index, errors in enumerate(map(put_body_errors, body), start=start) if errors]
+
+
+def validate_batch_body_parameters(body):
+    """
+    validate_batch_body_parameters checks the body JSON of a batch request holds an array of operations
+    @return: None if there is no issue, otherwise a JSON response with a detailed message on what was wrong
+    """
+    if not isinstance(body, dict) or 'operations' not in body:
+        return jsonify({
+            'success': False,
+            'message': 'missing parameter \'operations\''
+        }), 422
+
+    operations = body['operations']
+    if not isinstance(operations, list) or not 0 < len(operations) <= max_batch_operations:
+        return jsonify({
+            'success': False,
+            'message': 'operations parameter must be an array of 1 to {} operations'.format(max_batch_operations)
+        }), 422
+
+
+def batch_operation_errors(operation, deleted_ids):
+    """
+    batch_operation_errors checks an operation of a batch request in one pass, without stopping at the first error.
+    The parameters of create and update operations are checked with put_body_errors.
+    @param deleted_ids: the ids deleted by the operations before this one, which no later operation can use
+    @return: a list of detailed messages on everything that was wrong, empty if there is no issue
+    """
+    if not isinstance(operation, dict):
+        return [batch_messages['body']]
+
+    kind = operation.get('op')
+    if kind not in batch_operations:
+        return [batch_messages['op']]
+
+    if kind == 'create':
+        if 'id' in operation:
+            return [batch_messages['create_id']]
+        return put_body_errors(operation)
+
+    if 'id' not in operation:
+        return [batch_messages['missing_id']]
+
+    if kind == 'update':
+        errors = put_body_errors(operation)
+    elif not isinstance(operation['id'], int):
+        errors = [batch_messages['id']]
+    else:
+        errors = []
+
+    if kind == 'move' and not isinstance(operation.get('position'), int):
+        errors.append(batch_messages['position'])
+    elif kind == 'move' and operation['position'] < 0:
+        errors.append(batch_messages['position_negative'])
+
+    if isinstance(operation['id'], int) and operation['id'] in deleted_ids:
+        errors.append(batch_messages['deleted'])
+
+    return errors
+
+
+def batch_operation_list_errors(operations):
+    """
+    batch_operation_list_errors checks every operation of a batch request, each one only once
+    @return: a list of {'index': position in the array, 'messages': list of messages} dicts, one for each operation
+        that was wrong, empty if there is no issue
+    """
+    errors = []
+    deleted_ids = set()
+
+    for index, operation in enumerate(operations):
+        messages = batch_operation_errors(operation, deleted_ids)
+        if messages:
+            errors.append({'index': index, 'messages': messages})
+        elif operation['op'] == 'delete':
+            deleted_ids.add(operation['id'])
+
+    return errors
 
 
 def validate_delete_body_parameters(body):
@@ -269,6 +764,15 @@ def validate_delete_body_parameters(body):
     validate_delete_body_parameters checks the body JSON, and makes sure the parameters are the correct type
     @return: None if there is no issue, otherwise a JSON response with a detailed message on what was wrong
     """
+    if 'ids' in body:
+        if not isinstance(body['ids'], list) or not all(isinstance(id, int) for id in body['ids']):
+            # return malformed parameters response if 'ids' isn't a list of integers
+            return jsonify({
+                'success': False,
+                'message': 'ids parameter must be an array of integers'
+            }), 422
+        return None
+
     if 'id' not in body:
         # return malformed parameters response if 'id' isn't present
         return jsonify({
@@ -281,3 +785,46 @@ def validate_delete_body_parameters(body):
             'success': False,
             'message': 'id parameter must be type integer'
         }), 422
+
+
+def validate_order_body_parameters(body):
+    """
+    validate_order_body_parameters checks the body JSON of a reorder request, and makes sure the parameters are the
+    correct type
+    @return: None if there is no issue, otherwise a JSON response with a detailed message on what was wrong
+    """
+    if 'ids' in body:
+        if not isinstance(body['ids'], list) or not all(isinstance(id, int) for id in body['ids']):
+            # return malformed parameters response if 'ids' isn't a list of integers
+            return jsonify({
+                'success': False,
+                'message': 'ids parameter must be an array of integers'
+            }), 422
+        if len(set(body['ids'])) != len(body['ids']):
+            return jsonify({
+                'success': False,
+                'message': 'ids parameter must not contain duplicates'
+            }), 422
+        return None
+
+    if 'id' not in body or 'position' not in body:
+        # return malformed parameters response if neither form of reorder request is present
+        return jsonify({
+            'success': False,
+            'message': 'missing parameter \'ids\' or parameters \'id\' and \'position\''
+        }), 422
+    elif not isinstance(body['id'], int):
+        return jsonify({
+            'success': False,
+            'message': 'id parameter must be type integer'
+        }), 422
+    elif not isinstance(body['position'], int):
+        return jsonify({
+            'success': False,
+            'message': 'position parameter must be type integer'
+        }), 422
+    elif body['position'] < 0:
+        return jsonify({
+            'success': False,
+            'message': 'position parameter must not be negative'
+        }), 422
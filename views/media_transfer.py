@@ -0,0 +1,310 @@
+import csv
+import io
+import json
+
+from flask import request, jsonify, Response, stream_with_context
+
+from logic.media import add_media_rows, iter_media_records, commit_media
+from logic.job import enqueue_job
+from logic.user import get_user
+from logic.login import login_required
+
+from views.media import validate_url_username, validate_put_body_parameters
+
+# the mimetype of each import/export file format
+transfer_formats = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+# the media fields in an exported file, ids are exported for reference but ignored on import
+transfer_fields = ['id', 'name', 'medium', 'consumed_state', 'description', 'order']
+
+# number of rows written with each INSERT during an import, and each chunk of an export
+transfer_batch_size = 1000
+# an import stops listing row errors after this many, so a bad file can't make the response unbounded
+max_reported_errors = 100
+# the longest line in bytes an imported file can have, far longer than any valid row, so a file without line breaks is
+# rejected rather than read into memory as one line
+max_import_line_length = 64 * 1024
+
+
+class ImportFileError(Exception):
+    """
+    ImportFileError results when an imported file can't be read past some point, the rows before it stay imported
+    usually results in 422 HTTP response
+    """
+    pass
+
+
+@login_required
+def media_import(logged_in_user, username):
+    """
+    media_import accepts a POST request whose body is a file of media elements to add for the user specified by
+    username. The file is parsed as it is read, and written in batches, so large files are imported with bounded memory.
+        a request arg 'format' can be set to 'csv' or 'ndjson' (the default)
+        a csv file has a header row naming its columns, out of 'name', 'medium', 'consumed_state', 'description', and
+            'order', and an ndjson file has one JSON object per line with the same keys as a media PUT body
+        every element needs a 'name', and any 'id' is ignored, so imported elements are always added
+    Rows that fail validation are skipped and reported with their row number, the rest are imported.
+        a request arg 'async' can be set to 'true' to queue the import as a background job, the response is then a 202
+            with the job, and the job's result is the import report
+    """
+    user = get_user(username)
+    validation_result = validate_url_username(logged_in_user, user)
+    if validation_result is not None:
+        return validation_result
+
+    validation_result = validate_format_url_parameter()
+    if validation_result is not None:
+        return validation_result
+
+    if request.args.get('async') == 'true':
+        # the file is copied into the database in chunks as it is read, for any worker to import
+        job = enqueue_job(user.id, 'import_media', {'format': request.args.get('format', 'ndjson')},
+                          stream=request.stream)
+
+        return jsonify({
+            'success': True,
+            'message': 'queued job to import media elements',
+            'data': job.as_dict()
+        }), 202
+
+    if request.args.get('format', 'ndjson') == 'csv':
+        rows = parse_csv_rows(read_lines(request.stream))
+    else:
+        rows = parse_ndjson_rows(read_lines(request.stream))
+
+    try:
+        report = import_media_rows(user.id, rows)
+    except ImportFileError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'data': {'imported': e.imported}
+        }), 422
+
+    return jsonify({
+        'success': True,
+        'message': 'successfully imported media elements',
+        'data': report
+    })
+
+
+@login_required
+def media_export(logged_in_user, username):
+    """
+    media_export accepts a GET request and returns a file of all the media of the user specified by username, in
+    display order. The file is streamed from a server side cursor as it is written.
+        a request arg 'format' can be set to 'csv' or 'ndjson' (the default)
+    """
+    user = get_user(username)
+    validation_result = validate_url_username(logged_in_user, user)
+    if validation_result is not None:
+        return validation_result
+
+    validation_result = validate_format_url_parameter()
+    if validation_result is not None:
+        return validation_result
+
+    file_format = request.args.get('format', 'ndjson')
+    records = iter_media_records(user.id, transfer_batch_size)
+    chunks = format_csv_chunks(records) if file_format == 'csv' else format_ndjson_chunks(records)
+
+    return Response(stream_with_context(chunks),
+                    mimetype=transfer_formats[file_format],
+                    headers={'Content-Disposition': 'attachment; filename=media.{}'.format(file_format)})
+
+
+def import_media_rows(userid, rows, checkpoint=None, save_checkpoint=None):
+    """
+    import_media_rows validates parsed import rows and adds the valid ones for the user with the given userid, in
+    batches of transfer_batch_size, each committed on its own
+    @param rows: an iterable of (row number, PUT body) tuples, like the ones parse_csv_rows and parse_ndjson_rows return
+    @param checkpoint: the last checkpoint an earlier run of the same import, which stopped partway, saved. The rows up
+        to its 'row' were written or reported then, so they are skipped, and its counts are carried on from.
+    @param save_checkpoint: a function called with the import report so far and the number of the last row it covers,
+        in each batch's transaction before it commits, so a run that stops partway can be carried on exactly
+    @return: a dict with the number of media elements imported, the number of rows with errors, and the first
+        max_reported_errors of those errors
+    @raise ImportFileError: if the rest of the file can't be read, with the number of media elements imported before
+        it as its imported attribute
+    """
+    report = {'imported': 0, 'error_count': 0, 'errors': []}
+    skipped_rows = 0
+    if checkpoint is not None:
+        report = {key: checkpoint[key] for key in report}
+        skipped_rows = checkpoint['row']
+    batch = []
+
+    def write_batch(last_row_number):
+        report['imported'] += add_media_rows(userid, batch, commit=False)
+        if save_checkpoint is not None:
+            save_checkpoint(dict(report, row=last_row_number))
+        commit_media(userid)
+
+    row_number = skipped_rows
+    try:
+        for row_number, body in rows:
+            if row_number <= skipped_rows:
+                continue
+
+            validation_result = validate_import_row(body)
+            if validation_result is not None:
+                report['error_count'] += 1
+                if len(report['errors']) < max_reported_errors:
+                    report['errors'].append({'row': row_number, 'message': validation_result})
+                continue
+
+            batch.append(body)
+            if len(batch) == transfer_batch_size:
+                write_batch(row_number)
+                batch = []
+    except ImportFileError as e:
+        e.imported = report['imported']
+        raise
+
+    write_batch(row_number)
+
+    return report
+
+
+def read_lines(stream):
+    """
+    read_lines reads the lines of a binary stream, like a request's body, reading at most max_import_line_length + 1
+    bytes at a time, so a line that is too long comes out in pieces rather than being read into memory whole
+    """
+    while True:
+        line = stream.readline(max_import_line_length + 1)
+        if not line:
+            return
+        yield line
+
+
+def number_lines(lines):
+    """
+    number_lines numbers the lines of an imported file, and checks their length
+    @param lines: the file's lines as bytes, with a line longer than max_import_line_length in pieces of at most
+        max_import_line_length + 1 bytes, like read_lines and iter_job_file_lines return them
+    @return: a generator of (line number, line) tuples
+    @raise ImportFileError: if a line is longer than max_import_line_length
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if len(line) > max_import_line_length and not line.endswith(b'\n'):
+            raise ImportFileError('line {} of the file is longer than {} bytes'.format(line_number,
+                                                                                     max_import_line_length))
+        yield line_number, line
+
+
+def parse_csv_rows(lines):
+    """
+    parse_csv_rows parses a csv file one line at a time
+    @param lines: the file's lines as bytes, see number_lines
+    @return: a generator of (row number, PUT body dict) tuples, with empty columns left out of the body
+    @raise ImportFileError: if a line isn't UTF-8, since the csv rows after it can't be told apart, or is too long
+    """
+    reader = csv.DictReader(decode_lines(lines))
+
+    for row_number, row in enumerate(reader, start=1):
+        body = {key: value for key, value in row.items() if key in transfer_fields and value}
+        if 'order' in body:
+            try:
+                body['order'] = int(body['order'])
+            except ValueError:
+                # left as a string so validation reports it
+                pass
+
+        yield row_number, body
+
+
+def decode_lines(lines):
+    """
+    decode_lines decodes the lines of an imported file as UTF-8
+    @raise ImportFileError: if a line isn't UTF-8, or is too long
+    """
+    for line_number, line in number_lines(lines):
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            raise ImportFileError('line {} of the file isn\'t UTF-8'.format(line_number))
+
+
+def parse_ndjson_rows(lines):
+    """
+    parse_ndjson_rows parses an ndjson file one line at a time, skipping blank lines
+    @param lines: the file's lines as bytes, see number_lines
+    @return: a generator of (row number, PUT body) tuples, where the body is None if the line isn't valid JSON
+    @raise ImportFileError: if a line is too long
+    """
+    for row_number, line in number_lines(lines):
+        if not line.strip():
+            continue
+
+        try:
+            body = json.loads(line.decode('utf-8'))
+        except ValueError:
+            body = None
+
+        yield row_number, body
+
+
+def format_csv_chunks(records):
+    """
+    format_csv_chunks writes media records as a csv file with a header row
+    @return: a generator of strings, each holding up to transfer_batch_size rows
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(transfer_fields)
+
+    for count, record in enumerate(records, start=1):
+        writer.writerow([record.id, record.name, record.medium, record.consumed_state, record.description,
+                         record.order])
+        if count % transfer_batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def format_ndjson_chunks(records):
+    """
+    format_ndjson_chunks writes media records as an ndjson file
+    @return: a generator of strings, each holding up to transfer_batch_size lines
+    """
+    lines = []
+
+    for record in records:
+        lines.append(json.dumps(record.as_dict()) + '\n')
+        if len(lines) == transfer_batch_size:
+            yield ''.join(lines)
+            lines = []
+
+    yield ''.join(lines)
+
+
+def validate_import_row(body):
+    """
+    validate_import_row checks one element of an imported file, and drops its id since imports always add media
+    @return: None if there is no issue, otherwise a string with a detailed message on what was wrong
+    """
+    if not isinstance(body, dict):
+        return 'row must be a JSON object'
+
+    body.pop('id', None)
+    if 'name' not in body:
+        return 'missing parameter \'name\''
+
+    return validate_put_body_parameters(body)
+
+
+def validate_format_url_parameter():
+    """
+    validate_format_url_parameter checks the format url parameter of an import or export request
+    @return: None if there is no issue, otherwise a JSON response with a detailed message on what was wrong
+    """
+    if 'format' in request.args and request.args.get('format') not in transfer_formats:
+        return jsonify({
+            'success': False,
+            'message': 'format url parameter must be \'csv\' or \'ndjson\''
+        }), 422
@@ -1,9 +1,12 @@
+import jwt
 from flask import request, jsonify, session
 from database import db
 
 from models.blacklisted_token import BlacklistedToken
 
-from logic.user import add_user, get_user
+from logic.user import add_user, get_user, get_user_by_id
+from logic.refresh_token import issue_refresh_token, get_refresh_token, rotate_refresh_token, \
+    revoke_refresh_token_family
 from logic.login import login_required
 
 
@@ -37,11 +40,13 @@ def register():
     user = add_user(username, password)
 
     auth_token = user.encode_auth_token()
+    refresh_token = issue_refresh_token(user.id)
 
     return jsonify({
         'success': True,
         'message': 'user successfully registered',
-        'auth_token': auth_token
+        'auth_token': auth_token,
+        'refresh_token': refresh_token
     }), 201
 
 
@@ -74,11 +79,13 @@ def login():
             db.session.commit()
 
             auth_token = user.encode_auth_token()
+            refresh_token = issue_refresh_token(user.id)
 
             return jsonify({
                 'success': True,
                 'message': 'user successfully logged in',
-                'auth_token': auth_token
+                'auth_token': auth_token,
+                'refresh_token': refresh_token
             })
         else:
             return jsonify({
@@ -92,15 +99,65 @@ def login():
     }), 422
 
 
+def refresh():
+    """
+    refresh accepts a POST request containing a refresh token, and returns a new auth token along with the refresh
+    token to use next time, the given refresh token can't be used again
+    """
+    body = request.get_json()
+
+    if not isinstance(body, dict) or 'refresh_token' not in body:
+        return jsonify({
+            'success': False,
+            'message': 'missing parameter \'refresh_token\''
+        }), 422
+    if not isinstance(body['refresh_token'], str):
+        return jsonify({
+            'success': False,
+            'message': 'refresh_token parameter must be type string'
+        }), 422
+
+    result = rotate_refresh_token(body['refresh_token'])
+    # rotate_refresh_token returns a string if the refresh token can't be used
+    if isinstance(result, str):
+        return jsonify({
+            'success': False,
+            'message': result
+        }), 401
+
+    user_id, refresh_token = result
+    user = get_user_by_id(user_id)
+
+    return jsonify({
+        'success': True,
+        'message': 'auth token refreshed',
+        'auth_token': user.encode_auth_token(),
+        'refresh_token': refresh_token
+    })
+
+
 @login_required
 def logout(logged_in_user):
     """
-    logout logs the current user out
+    logout logs the current user out, revoking the refresh token given in the body (and every refresh token it was
+    rotated from or into), so no new auth tokens can be made from this login. Auth tokens already made stop working
+    when they expire. The body is optional, and ignored if it isn't a JSON object.
     """
+    body = request.get_json(silent=True)
+    refresh_token = body.get('refresh_token') if isinstance(body, dict) else None
+
+    if isinstance(refresh_token, str):
+        stored_token = get_refresh_token(refresh_token)
+        if stored_token is not None and (logged_in_user is None or stored_token.user == logged_in_user.id):
+            revoke_refresh_token_family(stored_token.family)
+
     auth_token = request.headers.get('Authorization').split(' ')[1]
-    blacklisted_token = BlacklistedToken(auth_token)
-    db.session.add(blacklisted_token)
-    db.session.commit()
+    # login_required has already verified the token, only tokens from before access tokens are checked against the
+    # blacklist
+    if jwt.decode(auth_token, verify=False).get('typ') != 'access':
+        blacklisted_token = BlacklistedToken(auth_token)
+        db.session.add(blacklisted_token)
+        db.session.commit()
 
     return jsonify({
         'success': True,
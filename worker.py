@@ -0,0 +1,89 @@
+import time
+
+from flask import current_app
+
+from app import create_app
+from logic.job import enqueue_job, has_queued_job, run_next_job, requeue_stale_jobs, iter_job_file_lines, \
+    get_job_checkpoint, set_job_checkpoint
+from logic.media import remove_media_list
+from models.blacklisted_token import BlacklistedToken
+from models.idempotency_key import IdempotencyKey
+from models.refresh_token import RefreshToken
+from models.user import legacy_auth_token_lifetime
+from views.media_transfer import import_media_rows, parse_csv_rows, parse_ndjson_rows, max_import_line_length
+
+
+def delete_media_job(userid, payload):
+    """
+    delete_media_job removes the user's media elements listed in the payload's 'ids'
+    @return: the number of media elements removed
+    """
+    return {'deleted': remove_media_list(userid, payload['ids'])}
+
+
+def import_media_job(userid, payload):
+    """
+    import_media_job imports the file of the job with the id in the payload's 'file', in the payload's 'format', like a
+    media import request. Each batch saves a checkpoint on the job, so when a worker stops partway through, the run
+    that picks the job up again carries on after the last batch that was written.
+    @return: the import report
+    """
+    # a job's file has the job's id
+    job_id = payload['file']
+    lines = iter_job_file_lines(job_id, max_import_line_length + 1)
+    if payload['format'] == 'csv':
+        rows = parse_csv_rows(lines)
+    else:
+        rows = parse_ndjson_rows(lines)
+
+    return import_media_rows(userid, rows, get_job_checkpoint(job_id),
+                             lambda checkpoint: set_job_checkpoint(job_id, checkpoint))
+
+
+def purge_blacklist_job(userid, payload):
+    """
+    purge_blacklist_job deletes blacklisted tokens that are older than the longest an auth token could live, expired
+    refresh tokens, and expired idempotency keys
+    @return: the number of blacklisted tokens, refresh tokens and idempotency keys deleted
+    """
+    return {
+        'purged': BlacklistedToken.purge_blacklist(max(legacy_auth_token_lifetime,
+                                                       current_app.config['AUTH_TOKEN_LIFETIME'])),
+        'refresh_tokens_purged': RefreshToken.purge_expired(),
+        'idempotency_keys_purged': IdempotencyKey.purge_expired(current_app.config['IDEMPOTENCY_KEY_TTL'])
+    }
+
+
+# the functions that run each kind of job
+job_handlers = {
+    'delete_media': delete_media_job,
+    'import_media': import_media_job,
+    'purge_blacklist': purge_blacklist_job
+}
+
+
+def work():
+    """
+    work runs queued jobs until the process is stopped, and queues a blacklist purge every BLACKLIST_PURGE_INTERVAL
+    seconds. Every JOB_HEARTBEAT_INTERVAL seconds it also requeues the jobs of workers that stopped while running them.
+    Several workers can run at once against PostgreSQL.
+    """
+    last_purge = None
+    last_requeue = None
+    while True:
+        if last_purge is None or time.monotonic() - last_purge > current_app.config['BLACKLIST_PURGE_INTERVAL']:
+            if not has_queued_job('purge_blacklist'):
+                enqueue_job(None, 'purge_blacklist', {})
+            last_purge = time.monotonic()
+
+        if last_requeue is None or time.monotonic() - last_requeue > current_app.config['JOB_HEARTBEAT_INTERVAL']:
+            requeue_stale_jobs(current_app.config['JOB_TIMEOUT'], current_app.config['JOB_MAX_ATTEMPTS'])
+            last_requeue = time.monotonic()
+
+        if run_next_job(job_handlers, current_app.config['JOB_HEARTBEAT_INTERVAL']) is None:
+            time.sleep(current_app.config['JOB_POLL_INTERVAL'])
+
+
+if __name__ == '__main__':
+    with create_app().app_context():
+        work()
@@ -0,0 +1,5 @@
+# the app gunicorn serves (see the Procfile), made here rather than in app.py, so importing app.py, as the tests, the
+# worker and the benchmarks do, doesn't need the production config
+from app import create_app
+
+app = create_app()